@@ -38,6 +38,7 @@ Dependencies:
 - yaml: Loads configuration from YAML files.
 - shutil: Enables removal of directories and their contents.
 - subprocess: Allows execution of external commands.
+- lib.asset_sync: Writes the manifest of the default files.
 
 Usage:
 Run this script directly using Python:
@@ -50,6 +51,7 @@ import os
 import yaml
 import shutil
 import subprocess
+from lib.asset_sync import write_manifest
 import esptool; 
 esp_stub_data= os.path.join(os.path.dirname(esptool.__file__),"targets","stub_flasher")
 
@@ -103,6 +105,7 @@ def build_pyinstaller():
 # Entry point of the script
 if __name__ == "__main__":
     clean_old_builds([config['dist_dir'], config['temp_dir']])
+    print(f"📋 Manifest of {write_manifest(config['defaults'])} default files written")
     build_pyinstaller()
     clean_old_builds([config['temp_dir']]) # remove temp build directory
     print("✅ Build completed successfully!")
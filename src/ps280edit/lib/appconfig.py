@@ -0,0 +1,160 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module loads the application configuration shared by the graphical editor and the
+command-line interface: the settings in ps280edit.yaml, the working directories in the user's
+documents with their defaults, the application data files and the backend arguments.
+Missing working directories are copied from the defaults; new and updated defaults of an
+existing installation are synced by lib.asset_sync.
+
+Dependencies:
+    - os: File system operations
+    - sys: Detect PyInstaller bundles
+    - yaml: Load the configuration file
+    - shutil: Copy default files
+    - platformdirs: User directories
+"""
+
+import os
+import sys
+import yaml
+import shutil
+import platformdirs
+
+
+def get_yaml_path(name):
+    """Finds the correct path to ps280edit.yaml, whether running as a script or a PyInstaller EXE."""
+    if getattr(sys, 'frozen', False):
+        # Running in PyInstaller bundle
+        base_path = sys._MEIPASS  # Temp directory where PyInstaller extracts files
+    else:
+        # Running as a normal script
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, name)
+
+
+def load_config(yaml_path=None):
+    """
+    Load the application configuration.
+
+    Args:
+        yaml_path (str, optional): Path of the configuration file, ps280edit.yaml by default.
+
+    Returns:
+        dict: The configuration.
+    """
+    with open(yaml_path or get_yaml_path("ps280edit.yaml"), "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
+def app_dirs(config):
+    """
+    Return the working directories and the defaults they are created from.
+
+    Returns:
+        dict: {name: {'workdir': path, 'default': path}}
+    """
+    def entry(*parts):
+        return {
+            'workdir': os.path.abspath(os.path.join(platformdirs.user_documents_dir(), config['app_name'], *parts)),
+            'default': os.path.abspath(os.path.join(get_yaml_path(config['defaults']), *parts)),
+        }
+
+    return {
+        'databaseroot': entry(config['database']['root']),
+        'firmware_dir': entry(config['firmwares']),
+        'template_dir': entry(config['templates']),
+        'stickertool': entry(config['stickertool']['root']),
+        'stickertool_templates': entry(config['stickertool']['root'], config['stickertool']['templates']),
+    }
+
+
+def data_dir(config):
+    """
+    Return the directory for data the application maintains itself, creating it if needed.
+    """
+    path = platformdirs.user_data_dir(config['app_name'], config['app_author'])
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def app_files(config, dirs, data_dir):
+    """
+    Return the files for stickertool and application data.
+    """
+    return {
+        'stickertool_config': os.path.join(dirs['stickertool']['workdir'], config['stickertool']['config']),
+        'stickertool_template': os.path.join(dirs['stickertool_templates']['workdir'], config['stickertool']['active_template']),
+        'flash_baudrates': os.path.join(data_dir, config['flash']['baudrates']),
+        'database_index': os.path.join(data_dir, config['database']['index']),
+        'snapshots': os.path.join(data_dir, config['database']['snapshots']),
+        'asset_state': os.path.join(data_dir, config['asset_state']),
+    }
+
+
+def defaults_root(config):
+    """
+    Return the directory of the default files shipped with the application.
+    """
+    return os.path.abspath(get_yaml_path(config['defaults']))
+
+
+def ensure_workdirs(dirs, verbose=True):
+    """
+    Ensure all working directories exist, copying the defaults into missing ones.
+    """
+    for d in dirs.values():
+        if verbose:
+            print(d['workdir'])
+        if not os.path.exists(d['workdir']):
+            shutil.copytree(d['default'], d['workdir'], ignore=shutil.ignore_patterns('*.tmp', '*.log'))
+
+
+def backend_kwargs(config, dirs, files):
+    """
+    Return the arguments of PS280EditorBackend for a configuration.
+    """
+    return dict(
+        database_root=dirs['databaseroot']['workdir'],
+        firmware_dir=dirs['firmware_dir']['workdir'],
+        template_dir=dirs['template_dir']['workdir'],
+        sticker_config_file=files['stickertool_config'],
+        sticker_template_file=files['stickertool_template'],
+        parameters_ignore=config['ps280']['ignore'],
+        parameters_superuser=config['ps280']['superuser'],
+        parameters_readonly=config['ps280']['readonly'],
+        lint_before_write=config['ps280']['lint_before_write'],
+        flash_baudrate_file=files['flash_baudrates'],
+        skip_current_firmware=config['flash']['skip_current'],
+        verify_current_firmware=config['flash']['verify_current'],
+        ota_config=config['ota'],
+        index_file=files['database_index'],
+        storage=config['database']['storage'],
+        storage_file=config['database']['storage_file'],
+        save_delay=config['database']['save_delay'],
+        snapshot_dir=files['snapshots'],
+        watch_debounce=config['watcher']['debounce'],
+        watch_interval=config['watcher']['interval'],
+    )
+# -
@@ -0,0 +1,215 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module keeps the working directories in the user's documents in step with the default
+templates, firmware and sticker assets shipped with the application.
+The defaults are hashed once at build time into a manifest. At startup the manifest is compared
+with a state file recording the hash, size and modification time of every file delivered so
+far, so unchanged copies are recognized without reading them. Only new or updated defaults are
+copied; files the user changed or deleted are left alone.
+
+Dependencies:
+    - os: File system operations
+    - json: Manifest and state files
+    - shutil: Copy files
+    - hashlib: File hashes
+    - tempfile: Atomic copies
+    - threading: Background sync
+    - atomic_writer: Write manifest and state
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from .atomic_writer import atomic_write
+
+# Manifest of the defaults, written by build.py
+MANIFEST_FILE = "manifest.json"
+
+# Files never synced
+IGNORED_SUFFIXES = ('.tmp', '.log')
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """
+    Return the SHA-256 of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(defaults_root):
+    """
+    Hash all files of the defaults directory.
+
+    Returns:
+        dict: {relative path with '/' separators: SHA-256}
+    """
+    manifest = {}
+    for root, _, files in os.walk(defaults_root):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, defaults_root).replace(os.sep, "/")
+            if relative == MANIFEST_FILE or name.endswith(IGNORED_SUFFIXES):
+                continue
+            manifest[relative] = hash_file(path)
+    return dict(sorted(manifest.items()))
+
+
+def write_manifest(defaults_root):
+    """
+    Hash the defaults directory and store the manifest in it.
+
+    Returns:
+        int: Number of files in the manifest.
+    """
+    manifest = build_manifest(defaults_root)
+    atomic_write(os.path.join(defaults_root, MANIFEST_FILE), json.dumps(manifest, indent=1))
+    return len(manifest)
+
+
+def load_manifest(defaults_root):
+    """
+    Load the manifest of the defaults directory, hashing the directory if there is none,
+    e.g. when running from the source tree.
+    """
+    try:
+        with open(os.path.join(defaults_root, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return build_manifest(defaults_root)
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _copy(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    os.close(handle)
+    try:
+        shutil.copy2(source, temp_file)
+        os.replace(temp_file, target)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+
+def sync_assets(dirs, defaults_root, state_file):
+    """
+    Copy new and updated defaults into the working directories.
+
+    A working copy is only replaced if it is still the copy delivered before. Copies the user
+    modified are kept, and files the user deleted are not delivered again unless the default
+    changed.
+
+    Args:
+        dirs (dict): Working directories as returned by lib.appconfig.app_dirs,
+            {name: {'workdir': path, 'default': path}}.
+        defaults_root (str): Defaults directory holding the manifest.
+        state_file (str): JSON file recording the delivered copies.
+
+    Returns:
+        dict: Relative paths of the 'copied', 'updated', 'kept' (modified by the user) and
+            'failed' files.
+    """
+    try:
+        with open(state_file, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        state = {}
+    manifest = load_manifest(defaults_root)
+    summary = {'copied': [], 'updated': [], 'kept': [], 'failed': []}
+
+    targets = {}
+    for d in dirs.values():
+        prefix = os.path.relpath(d['default'], defaults_root).replace(os.sep, "/") + "/"
+        for relative in manifest:
+            if relative.startswith(prefix):
+                targets[relative] = os.path.join(d['workdir'], *relative[len(prefix):].split("/"))
+
+    for relative, target in targets.items():
+        digest = manifest[relative]
+        delivered = state.get(target)
+        try:
+            if not os.path.exists(target):
+                if delivered and delivered['sha256'] == digest:
+                    continue
+                _copy(os.path.join(defaults_root, *relative.split("/")), target)
+                summary['copied'].append(relative)
+            elif delivered and delivered['stamp'] == _stamp(target):
+                if delivered['sha256'] == digest:
+                    continue
+                _copy(os.path.join(defaults_root, *relative.split("/")), target)
+                summary['updated'].append(relative)
+            else:
+                current = hash_file(target)
+                if current == digest:
+                    pass
+                elif delivered and current == delivered['sha256']:
+                    _copy(os.path.join(defaults_root, *relative.split("/")), target)
+                    summary['updated'].append(relative)
+                else:
+                    summary['kept'].append(relative)
+                    continue
+            state[target] = {'sha256': digest, 'stamp': _stamp(target)}
+        except OSError as e:
+            print(f"Could not sync {relative}: {e}")
+            summary['failed'].append(relative)
+
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+    atomic_write(state_file, json.dumps(state, indent=1, sort_keys=True))
+    return summary
+
+
+def start_asset_sync(dirs, defaults_root, state_file, on_done=None):
+    """
+    Run sync_assets in a background thread.
+
+    Args:
+        on_done (callable, optional): Called with the summary when the sync is finished.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def run():
+        try:
+            summary = sync_assets(dirs, defaults_root, state_file)
+        except Exception as e:
+            print(f"Syncing default assets failed: {e}")
+            return
+        if on_done:
+            on_done(summary)
+
+    thread = threading.Thread(target=run, name="asset-sync", daemon=True)
+    thread.start()
+    return thread
+# -
@@ -0,0 +1,236 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module writes configuration files atomically.
+Content goes to a temporary file in the target directory, is flushed to disk and then renamed
+over the target, so a crash leaves either the old or the new file but never a truncated one.
+Writes that would not change the file are skipped and replaced files keep their permissions.
+The CoalescingWriter collects saves of the same file arriving within a short window and writes
+only the last one, but never holds a save back longer than a maximum delay. Failed background
+writes are reported and retried until they succeed or the writer is closed.
+
+Dependencies:
+    - os: File system operations
+    - stat: Permissions of replaced files
+    - sys: Report failed background writes
+    - time: Maximum delay of held back writes
+    - tempfile: Temporary files next to the target
+    - threading: Delayed background writes
+"""
+
+import os
+import stat
+import sys
+import time
+import tempfile
+import threading
+
+
+def _file_mode(path):
+    """
+    Return the permissions a written file gets: those of the file it replaces, or the
+    default for new files under the current umask.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path, content, encoding="utf-8"):
+    """
+    Write a text file atomically, skipping the write if the content is unchanged.
+
+    Args:
+        path (str): Path of the file.
+        content (str): New file content.
+        encoding (str): Text encoding.
+
+    Returns:
+        bool: True if the file was written, False if it already had this content.
+    """
+    data = content.encode(encoding)
+    try:
+        with open(path, "rb") as file:
+            if file.read() == data:
+                return False
+    except OSError:
+        pass
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    mode = _file_mode(path)
+    handle, temp_file = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp creates the file private to the user
+        os.chmod(temp_file, mode)
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Persist the rename itself
+        directory_handle = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_handle)
+        finally:
+            os.close(directory_handle)
+    return True
+
+
+class CoalescingWriter:
+    """
+    Delays atomic writes and merges repeated writes of the same file into one.
+    """
+
+    def __init__(self, delay=0.5, on_write=None, max_delay=None, on_error=None):
+        """
+        Initialize the writer.
+
+        Args:
+            delay (float): Seconds to wait for further writes before writing, 0 writes immediately.
+            on_write (callable, optional): Called with the path after a file was written.
+            max_delay (float, optional): Seconds after the first held back write when the pending
+                writes are written even if more keep arriving, 4 times the delay if None.
+            on_error (callable, optional): Called with the path and the error when a held back
+                write failed. The write stays pending and is retried.
+        """
+        self.delay = delay
+        self.max_delay = max_delay if max_delay is not None else 4 * delay
+        self.on_write = on_write
+        self.on_error = on_error
+        self.closed = False
+        self.pending = {}
+        self.lock = threading.RLock()
+        self.timer = None
+        # Monotonic time the oldest pending write arrived
+        self.first_pending = None
+
+    def write(self, path, content):
+        """
+        Schedule a write, replacing a pending write of the same file.
+
+        Args:
+            path (str): Path of the file.
+            content (str): New file content.
+        """
+        path = os.path.abspath(path)
+        if self.delay <= 0:
+            self._write(path, content)
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_pending = now
+            self.pending[path] = content
+            self._schedule(max(0.0, min(self.delay, self.first_pending + self.max_delay - now)))
+
+    def _schedule(self, delay):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            # Not a daemon thread, pending writes are finished before the interpreter exits
+            self.timer = threading.Timer(delay, self._flush_pending)
+            self.timer.start()
+
+    def pending_content(self, path):
+        """
+        Return the content waiting to be written to a file, or None.
+        """
+        with self.lock:
+            return self.pending.get(os.path.abspath(path))
+
+    def is_pending(self, path):
+        """
+        Return True if a write of the file is held back or failed and waits for a retry.
+        """
+        return self.pending_content(path) is not None
+
+    def flush(self):
+        """
+        Write all pending files now. Files that could not be written stay pending.
+
+        The write callbacks run after the lock is released, they may take locks of their own
+        whose holders wait for this writer.
+
+        Raises:
+            OSError: The first error if a file could not be written.
+        """
+        written, failed = [], []
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            for path, content in list(self.pending.items()):
+                try:
+                    if atomic_write(path, content):
+                        written.append(path)
+                except OSError as e:
+                    print(f"Error writing {path}: {e}", file=sys.stderr)
+                    failed.append((path, e))
+                    continue
+                del self.pending[path]
+            self.first_pending = time.monotonic() if self.pending else None
+        self._notify(written)
+        if self.on_error is not None:
+            for path, error in failed:
+                self.on_error(path, error)
+        if failed:
+            raise failed[0][1]
+
+    def close(self):
+        """
+        Write all pending files and stop retrying failed writes.
+
+        Raises:
+            OSError: The first error if a file could not be written, it is lost.
+        """
+        with self.lock:
+            self.closed = True
+        self.flush()
+
+    def _flush_pending(self):
+        # Background flush, the error was reported and the files are retried after the delay
+        try:
+            self.flush()
+        except OSError:
+            with self.lock:
+                if not self.closed and self.pending:
+                    self._schedule(max(self.delay, 1.0))
+
+    def _write(self, path, content):
+        self._notify([path] if atomic_write(path, content) else [])
+
+    def _notify(self, paths):
+        if self.on_write is not None:
+            for path in paths:
+                self.on_write(path)
+# -
@@ -32,10 +32,11 @@ Dependencies:
     - subprocess: Execute system commands
     - platform: Detect operating system
     - webbrowser: Open web pages
-    - PIL (Pillow): Image processing
-    - toml: Handle TOML configuration files
-    - yaml: Handle YAML configuration files
+    - PIL (Pillow): Image processing, imported when stickers are created
+    - toml_loader: Parse TOML configuration files
     - logging: Logging operations
+    - threading: Device sessions used from several threads
+    - collections: Count warnings of bulk template runs
 
 """
 
@@ -44,20 +45,38 @@ import sys
 import time
 import subprocess
 import platform
+import json
 import webbrowser
 import logging
-import yaml
-from PIL import Image
-import toml
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 ## Define the toolbox root path and ensure it's in sys.path
 #TOOLBOXROOT = os.path.join(os.path.abspath("../.."), 'src')
 #if TOOLBOXROOT not in sys.path:
 #    sys.path = [TOOLBOXROOT] + sys.path
 
-from .ps280_toolbox import PS280#, flash_firmware, configure_for_udk
+from .ps280_toolbox import PS280, FlashBaudRates, esp_ports#, flash_firmware, configure_for_udk
+from .ps280_toolbox import ParameterTable, IGNORE, READONLY, RUNTIME_GROUPS
+
+from .database_index import DatabaseIndex
+from .storage import open_storage, import_tree, export_tree
+from .toml_loader import invalidate
+from .export import export_records
+from .manifest import read_manifest, build_record
+from .snapshots import SnapshotStore, settings_fingerprint
+from .drift import detect_drift
+from .lint import lint_settings, lint_records
+from .atomic_writer import atomic_write
+from .watcher import DirectoryWatcher
+from .topic_trie import TopicTrie
+from .session import DeviceSession, DEFAULT_SESSION
+from .templates import TemplateCatalog, merge_template, apply_template, convert_value
+# Parameter specification stored with each firmware version
+PARAMETER_SPEC_FILE = "parameters.json"
 
-from .stickertool import Sticker
 # Define standard output and error streams
 stdoutstream = sys.stdout
 stderrstream = sys.stderr
@@ -159,8 +178,11 @@ class PS280EditorBackend:
                  topic_upload="MQTT.TOPIC_UP", topic_download="MQTT.TOPIC_DOWN", 
                  topic_client_id="MQTT.CLIENT_ID",
                  topic_serial="CORE.SERIAL", topic_version="CORE.VERSION",
-                 topic_broker_ip="HUB.REMOTE_IP", parameters_ignore=[],
-                 parameters_superuser=[]):
+                 topic_broker_ip="HUB.REMOTE_IP", topic_broker_port="HUB.REMOTE_PORT", parameters_ignore=[],
+                 parameters_superuser=[], parameters_readonly=[], lint_before_write=False, flash_baudrate_file=None,
+                 skip_current_firmware=False, verify_current_firmware=False,
+                 ota_config=None, index_file=None, storage="directory", storage_file=None, save_delay=0.0,
+                 snapshot_dir=None, watch_debounce=0.5, watch_interval=2.0):
         """
         Initialize the backend with file paths and MQTT configuration settings.
         
@@ -175,15 +197,44 @@ class PS280EditorBackend:
             topic_serial (str): MQTT topic for serial communication.
             topic_version (str): MQTT topic for firmware versioning.
             topic_broker_ip (str): MQTT broker IP configuration topic.
+            topic_broker_port (str): MQTT broker port configuration topic.
             parameters_ignore (list): List of ignored parameters.
             parameters_superuser (list): List of superuser parameters.
+            parameters_readonly (list): List of parameters that can not be set.
+            lint_before_write (bool): Refuse to write configurations with problems to a device, see lib.lint.
+            flash_baudrate_file (str, optional): File storing the flash baud rate per port.
+            skip_current_firmware (bool): Skip erase and flash if the device runs the selected version.
+            verify_current_firmware (bool): Confirm a running version by a flash hash check before skipping.
+            ota_config (dict, optional): OTA rollout settings (host, port, concurrency, timeout,
+                commands, result_pattern, mqtt_user, mqtt_password).
+            index_file (str, optional): SQLite file indexing the configuration database.
+            storage (str): Storage backend of the records, 'directory' (default) or 'sqlite'.
+            storage_file (str, optional): SQLite file of the 'sqlite' backend, relative to the database root.
+            save_delay (float): Seconds saves are held back to merge quick successive edits into one write.
+            snapshot_dir (str, optional): Directory of the history of settings read from devices.
+            watch_debounce (float): Seconds directories have to be quiet before changes are handled.
+            watch_interval (float): Seconds between scans where directories are watched by polling.
         """
         self.database_root = database_root
         self.firmware_dir = firmware_dir
         self.template_dir = template_dir
         self.sticker_template_file = sticker_template_file
         self.sticker_config_file = sticker_config_file
-        self.current_file_path = ""
+        self.parameters_ignore = parameters_ignore
+        self.parameters_superuser = parameters_superuser
+        self.parameters_readonly = parameters_readonly
+        self.lint_before_write = lint_before_write
+        # Parameter specifications by file, sessions may have different firmware selected
+        self._parameter_specs = {}
+        self._sessions = {}
+        self._sessions_lock = threading.RLock()
+        # Port detection claims one free port at a time
+        self._connect_lock = threading.Lock()
+        self._thread_session = threading.local()
+        # The default session holds the firmware and template selection from the start, the
+        # parameter tables of the sessions depend on it
+        self._selected_session = DeviceSession(DEFAULT_SESSION, None)
+        self._sessions[DEFAULT_SESSION] = self._selected_session
         self.toml_data = {}
         self.temp_toml_data = {}
         self.topic_upload = topic_upload
@@ -192,11 +243,29 @@ class PS280EditorBackend:
         self.topic_client_id = topic_client_id
         self.topic_version = topic_version
         self.topic_broker_ip = topic_broker_ip
-        self.parameters_ignore = parameters_ignore
-        self.parameters_superuser = parameters_superuser
-        self.firmware = {'version': '', 'bootloader': '', 'partitiontable': '', 'firmwarebin': ''}
+        self.topic_broker_port = topic_broker_port
+        self.flash_baudrates = FlashBaudRates(flash_baudrate_file)
+        self.skip_current_firmware = skip_current_firmware
+        self.verify_current_firmware = verify_current_firmware
+        self.ota_config = ota_config or {}
+        self.index_file = index_file
+        self._index = None
+        self._topic_trie = (None, None)
+        self._template_catalog = None
+        self.storage_kind = storage
+        self.storage_file = storage_file
+        self.save_delay = save_delay
+        self._storage = None
+        # Saves still held back by the storage, and the callback told when they were written
+        # or failed, called from the writer thread with the path and the error or None
+        self._saving = set()
+        self._saving_lock = threading.RLock()
+        self.on_record_saved = None
+        self.snapshots = SnapshotStore(snapshot_dir) if snapshot_dir else None
+        self.watch_debounce = watch_debounce
+        self.watch_interval = watch_interval
+        self.watcher = None
         self.cfg_template = None
-        self.PS280 = None
         self.data = None
         self.success = False
 
@@ -214,6 +283,639 @@ class PS280EditorBackend:
         """
         return os.path.basename(self.database_root)
 
+    def parameter_table(self, data=None):
+        """
+        Create a parameter table flagged with the ignored, superuser and read-only parameters.
+        
+        Args:
+            data (Mapping, optional): Settings as {group: {parameter: value}}.
+        
+        Returns:
+            ParameterTable: The table.
+        """
+        return ParameterTable(data, self.parameters_ignore, self.parameters_superuser,
+                              self.parameters_readonly, self.parameter_spec)
+
+    @property
+    def session(self):
+        """
+        Returns the device session of the calling thread, see use_session, or the selected one.
+        """
+        return getattr(self._thread_session, 'session', None) or self._selected_session
+
+    @property
+    def sessions(self):
+        """
+        Returns the open device sessions by name.
+        """
+        with self._sessions_lock:
+            return dict(self._sessions)
+
+    def open_session(self, port=None):
+        """
+        Open the session of a device, or return it if it is already open.
+        
+        Args:
+            port (str, optional): Serial port of the device, the first PS-280 found if None.
+        
+        Returns:
+            DeviceSession: The session, named by its port.
+        """
+        name = port or DEFAULT_SESSION
+        with self._sessions_lock:
+            session = self._sessions.get(name)
+            if session is None:
+                # A new device starts with the firmware and template selected for the current one
+                current = self.session
+                session = DeviceSession(name, port, current.firmware, current.template)
+                session.config = self.parameter_table({})
+                session.snapshot = self.parameter_table({})
+                self._sessions[name] = session
+            return session
+
+    def close_session(self, port=None):
+        """
+        Close the connection of a device and forget its session.
+        
+        The default session is kept without connection.
+        """
+        name = port or DEFAULT_SESSION
+        with self._sessions_lock:
+            session = self._sessions.get(name)
+            if session is None:
+                return
+            with session.lock:
+                session.close()
+            if name != DEFAULT_SESSION:
+                del self._sessions[name]
+                if self._selected_session is session:
+                    self._selected_session = self.open_session()
+
+    def select_session(self, port=None):
+        """
+        Select the device session used by threads without one of their own, e.g. the editor.
+        
+        Returns:
+            DeviceSession: The selected session.
+        """
+        self._selected_session = self.open_session(port)
+        return self._selected_session
+
+    @contextmanager
+    def use_session(self, port=None):
+        """
+        Use the session of a device in the calling thread, e.g. in a script working on several
+        devices at once. Other threads wait until the session is free.
+        
+            with backend.use_session('/dev/ttyUSB1'):
+                backend.connect()
+                backend.read_settings()
+        
+        Yields:
+            DeviceSession: The session.
+        """
+        session = self.open_session(port)
+        with session.lock:
+            previous = getattr(self._thread_session, 'session', None)
+            self._thread_session.session = session
+            try:
+                yield session
+            finally:
+                self._thread_session.session = previous
+
+    @contextmanager
+    def lock_session(self):
+        """
+        Hold the lock of the current session, e.g. while the editor works on the selected device,
+        so neither the watcher nor other threads change the session meanwhile.
+        
+        Yields:
+            DeviceSession: The session.
+        """
+        session = self.session
+        with session.lock:
+            yield session
+
+    def run_sessions(self, function, ports=None, workers=None):
+        """
+        Run a function for several devices at the same time, each in its own session.
+        
+        Args:
+            function (callable): Called without arguments inside use_session, e.g.
+                lambda: backend.connect() and backend.write_configuration().
+            ports (list, optional): Serial ports of the devices, all connected PS-280 by default.
+            workers (int, optional): Number of threads, one per device by default.
+        
+        Returns:
+            dict: {port: result}, the exception for devices the function failed on.
+        """
+        ports = list(ports if ports is not None else self.device_ports())
+        if not ports:
+            return {}
+
+        def run(port):
+            try:
+                with self.use_session(port):
+                    return function()
+            except Exception as e:
+                print(f"{port}: {e}", file=sys.stderr)
+                return e
+
+        with ThreadPoolExecutor(max_workers=workers or len(ports)) as executor:
+            return dict(zip(ports, executor.map(run, ports)))
+
+    def device_ports(self):
+        """
+        List the serial ports with a USB bridge of an ESP board, without talking to them.
+        
+        Returns:
+            dict: {port: bridge}
+        """
+        return esp_ports()
+
+    @property
+    def PS280(self):
+        """
+        The connection to the device of the current session, None if not connected.
+        """
+        return self.session.device
+
+    @PS280.setter
+    def PS280(self, device):
+        self.session.device = device
+
+    @PS280.deleter
+    def PS280(self):
+        self.session.device = None
+
+    @property
+    def current_file_path(self):
+        """
+        The record of the current session.
+        """
+        return self.session.record_path
+
+    @current_file_path.setter
+    def current_file_path(self, path):
+        self.session.record_path = path
+
+    @property
+    def _file_content(self):
+        return self.session.record_content
+
+    @_file_content.setter
+    def _file_content(self, content):
+        self.session.record_content = content
+
+    @property
+    def firmware(self):
+        """
+        The firmware version and files selected for the device of the current session.
+        """
+        return self.session.firmware
+
+    @firmware.setter
+    def firmware(self, firmware):
+        self.session.firmware = firmware
+
+    @property
+    def template(self):
+        """
+        The template selected for the device of the current session.
+        """
+        return self.session.template
+
+    @template.setter
+    def template(self, template):
+        self.session.template = template
+
+    @property
+    def firmware_check(self):
+        return self.session.firmware_check
+
+    @firmware_check.setter
+    def firmware_check(self, check):
+        self.session.firmware_check = check
+
+    @property
+    def toml_data(self):
+        """
+        The configuration of the current session as parameter table.
+        """
+        return self.session.config
+
+    @toml_data.setter
+    def toml_data(self, data):
+        self.session.config = self.parameter_table(data)
+
+    @property
+    def temp_toml_data(self):
+        """
+        The settings read from the device of the current session before writing, as parameter table.
+        """
+        return self.session.snapshot
+
+    @temp_toml_data.setter
+    def temp_toml_data(self, data):
+        self.session.snapshot = self.parameter_table(data)
+
+    @property
+    def parameter_spec_file(self):
+        """
+        Returns the parameter specification file of the selected firmware version.
+        """
+        return os.path.join(self.firmware_dir, self.firmware['version'], PARAMETER_SPEC_FILE)
+
+    @property
+    def parameter_spec(self):
+        """
+        Returns the parameter specification of the selected firmware version, empty if there is none.
+        """
+        if not self.firmware['version']:
+            return {}
+        path = self.parameter_spec_file
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        cached = self._parameter_specs.get(path)
+        if cached is None or cached[0] != stamp:
+            spec = {}
+            if stamp is not None:
+                try:
+                    with open(path, "r", encoding="utf-8") as file:
+                        spec = json.load(file)
+                except (OSError, ValueError) as e:
+                    print(f"Could not read parameter specification {path}: {e}")
+            cached = (stamp, spec)
+            self._parameter_specs[path] = cached
+        return cached[1]
+
+    def save_parameter_spec(self):
+        """
+        Query the specification of all parameters from the connected device and store it
+        with the selected firmware version.
+        
+        Returns:
+            tuple: (bool, str) indicating success and message.
+        """
+        if self.PS280 is None:
+            return False, "No connection to PS-280"
+        try:
+            spec = self.PS280.parameter_spec()
+            atomic_write(self.parameter_spec_file, json.dumps(spec, indent=2, ensure_ascii=False))
+            self.toml_data = self.toml_data
+            return True, f"Specification of {len(spec)} parameters stored in {self.parameter_spec_file}"
+        except Exception as e:
+            return False, f"Error storing the parameter specification: {e}"
+
+    @property
+    def storage(self):
+        """
+        Returns the storage backend of the current database root, opened on first use.
+        """
+        if self._storage is None or self._storage.database_root != os.path.abspath(self.database_root):
+            if self._storage is not None:
+                self._storage.close()
+            self._storage = open_storage(self.database_root, self.storage_kind, self.storage_file,
+                                         save_delay=self.save_delay, on_write=self._record_written,
+                                         on_error=self._record_write_failed)
+        return self._storage
+
+    def _record_written(self, path):
+        """
+        Keep the index up to date once a record was written and report held back saves.
+        """
+        if self._index is not None:
+            self._index.refresh_record(path)
+        with self._saving_lock:
+            saving = path in self._saving
+            self._saving.discard(path)
+        if saving and self.on_record_saved is not None:
+            self.on_record_saved(path, None)
+
+    def _record_write_failed(self, path, error):
+        """
+        Report a held back save that could not be written, the storage retries it.
+        """
+        if self.on_record_saved is not None:
+            self.on_record_saved(path, error)
+
+    def close(self):
+        """
+        Stop watching and write the held back saves before the application exits.
+        """
+        self.stop_watching()
+        if self._storage is not None:
+            self._storage.close()
+
+    def start_watching(self, on_change=None):
+        """
+        Watch database, templates and firmware for changes made by other stations or tools.
+        
+        Changed records are reindexed, and the records open in device sessions are reloaded if
+        their content changed on disk. Templates come from the template catalog, which keeps them
+        compiled until the watcher reports a change of the template directory and invalidates
+        it. The firmware list is read from disk on every access, and the parameter specification
+        of the selected firmware is reloaded when its file changes, so both need no update.
+        
+        Args:
+            on_change (callable, optional): Called from the watcher thread with the names of the
+                changed directories, 'database', 'templates' and 'firmware', and whether a record
+                was reloaded.
+        """
+        self.stop_watching()
+        roots = {'database': self.database_root, 'templates': self.template_dir, 'firmware': self.firmware_dir}
+
+        def changed(batch):
+            reloaded = self._files_changed(batch)
+            if on_change:
+                on_change(set(batch), reloaded)
+
+        self.watcher = DirectoryWatcher(roots, changed, debounce=self.watch_debounce, interval=self.watch_interval)
+        self.watcher.start()
+        print(f"Watching {', '.join(self.watcher.roots)} ({self.watcher.mode})")
+
+    def stop_watching(self):
+        """
+        Stop watching the directories.
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _files_changed(self, batch):
+        """
+        Update caches and the index after files changed on disk.
+        
+        Args:
+            batch (dict): Changed paths by directory name, see lib.watcher.DirectoryWatcher.
+        
+        Returns:
+            bool: True if the record of a device session was reloaded.
+        """
+        for paths in batch.values():
+            for path in paths:
+                invalidate(path)
+        if 'templates' in batch:
+            invalidate()
+            self.template_catalog.invalidate()
+        # Writes of the index itself are no changes of records
+        index_file = os.path.abspath(self._index.index_file) if self._index is not None else None
+        records = {path for path in batch.get('database', ()) if path != index_file}
+        if not records:
+            return False
+        if None in records or hasattr(self.storage, 'scan'):
+            self.refresh_index()
+        elif self._index is not None:
+            for path in records:
+                if path.endswith(".toml"):
+                    self._index.refresh_record(path)
+        reloaded = False
+        for session in self.sessions.values():
+            # Never wait here, e.g. behind a flash, and never reload a record while it is edited
+            if not session.lock.acquire(blocking=False):
+                if session.record_path:
+                    print(f"{session.record_path} not checked for changes on disk, "
+                          f"the session of {session.name} is busy", file=sys.stderr)
+                continue
+            try:
+                with self.use_session(session.port):
+                    reloaded = self._reload_record(records) or reloaded
+            finally:
+                session.lock.release()
+        return reloaded
+
+    def _reload_record(self, records):
+        """
+        Reload the record of the current session if it changed on disk, see _files_changed.
+        """
+        current = self.current_file_path and os.path.abspath(self.current_file_path)
+        if not current or not (None in records or current in records or hasattr(self.storage, 'scan')):
+            return False
+        try:
+            content = self.storage.load(current)
+        except Exception:
+            # Deleted or half written, the next change reports it again
+            return False
+        if content == self._file_content:
+            return False
+        if self.toml_data.to_dict() != self._file_content:
+            print(f"{current} was changed on disk, not reloaded to keep the unsaved changes", file=sys.stderr)
+            self._file_content = content
+            return False
+        self.toml_data = content
+        self._file_content = self.toml_data.to_dict()
+        print(f"Reloaded {current}, it was changed on disk")
+        return True
+
+    def import_database(self, source_root):
+        """
+        Import a '.ps280' directory tree into the current storage backend.
+        
+        Args:
+            source_root (str): Root of the directory tree.
+        
+        Returns:
+            tuple: (bool, str) indicating success and message.
+        """
+        try:
+            count = import_tree(self.storage, source_root)
+            return True, f"{count} records imported from {source_root}"
+        except Exception as e:
+            return False, f"Error importing records: {e}"
+
+    def export_database(self, target_root):
+        """
+        Export the current storage backend into a '.ps280' directory tree.
+        
+        Args:
+            target_root (str): Root of the directory tree.
+        
+        Returns:
+            tuple: (bool, str) indicating success and message.
+        """
+        try:
+            count = export_tree(self.storage, target_root)
+            return True, f"{count} records exported to {target_root}"
+        except Exception as e:
+            return False, f"Error exporting records: {e}"
+
+    @property
+    def index(self):
+        """
+        Returns the index of the current database root, opened on first use.
+        """
+        if (self._index is None or self._index.database_root != os.path.abspath(self.database_root)
+                or self._index.storage is not self.storage):
+            if self._index is not None:
+                self._index.close()
+            index_file = self.index_file or os.path.join(self.database_root, ".ps280index.sqlite")
+            self._index = DatabaseIndex(self.database_root, index_file,
+                                        topic_upload=self.topic_upload, topic_download=self.topic_download,
+                                        topic_serial=self.topic_serial, topic_version=self.topic_version,
+                                        topic_broker_ip=self.topic_broker_ip, storage=self.storage,
+                                        fingerprint_exclude=self.fingerprint_exclude)
+        return self._index
+
+    def refresh_index(self):
+        """
+        Incrementally update the database index.
+        
+        Returns:
+            dict: Number of added, updated, removed and unchanged records.
+        """
+        self.storage.flush()
+        return self.index.refresh()
+
+    @property
+    def topic_trie(self):
+        """
+        Returns the trie of the upload topics of all records, built from the index on first use
+        and kept up to date as the index changes.
+        """
+        index = self.index
+        if self._topic_trie[0] is not index:
+            trie = TopicTrie()
+            # Refreshing flushes the storage, which must not wait for its writer under the index lock
+            self.refresh_index()
+            with index.lock:
+                index.listeners.append(lambda path, values: trie.set(path, values['topic_up'] if values else None))
+                for record in index.query():
+                    trie.set(record['path'], record['topic_up'])
+            self._topic_trie = (index, trie)
+        return self._topic_trie[1]
+
+    def topic_collisions(self, topic, file_path=None):
+        """
+        Find other records using an upload topic.
+        
+        Args:
+            topic (str): The MQTT topic.
+            file_path (str, optional): Record to leave out, the current file by default.
+        
+        Returns:
+            list: Paths of the records using the topic.
+        """
+        file_path = file_path if file_path is not None else self.current_file_path
+        return self.topic_trie.collisions(topic, os.path.abspath(file_path) if file_path else None)
+
+    def complete_topic(self, prefix, limit=10):
+        """
+        Returns used upload topics starting with a prefix, e.g. for autocompletion.
+        """
+        return self.topic_trie.complete(prefix, limit)
+
+    def suggest_topics(self, topic, count=3):
+        """
+        Returns free upload topics next to a topic, the topic itself if it is free.
+        """
+        return self.topic_trie.suggest(topic, count)
+
+    def find_records(self, refresh=True, **filters):
+        """
+        Find configuration records by serial, topics, broker, version or path.
+        
+        Args:
+            refresh (bool): Update the index before querying.
+            filters: Column filters, glob patterns allowed, e.g. broker='194.94.110.169'.
+        
+        Returns:
+            list: Matching records as dicts with the record 'path'.
+        """
+        if refresh:
+            self.refresh_index()
+        return self.index.query(**filters)
+
+    def find_record_by_serial(self, serial, refresh=True):
+        """
+        Find the configuration record of a serial number.
+        
+        Returns:
+            str: Path of the record, empty if none is found.
+        """
+        records = self.find_records(refresh=refresh, serial=serial)
+        return records[0]['path'] if records else ''
+
+    def search_records(self, text, refresh=True):
+        """
+        Find configuration records whose serial, topics or broker contain the given text.
+        
+        Returns:
+            list: Matching records as dicts with the record 'path'.
+        """
+        if refresh:
+            self.refresh_index()
+        return self.index.search(text)
+
+    def export_records(self, filename, format=None, text=None, **filters):
+        """
+        Export all records matching a database query into a JSONL or CSV file.
+        
+        Args:
+            filename (str): Output file, the format follows its extension if not given.
+            format (str, optional): 'jsonl' or 'csv'.
+            text (str, optional): Search text as in search_records, all records if neither text nor filters are given.
+            filters: Column filters as in find_records.
+        
+        Returns:
+            tuple: (bool, str) indicating success and message.
+        """
+        format = format or os.path.splitext(filename)[1].lstrip('.').lower()
+        if format == 'json':
+            format = 'jsonl'
+        try:
+            records = self.search_records(text) if text else self.find_records(**filters)
+            start = time.time()
+            with open(filename, "w", encoding="utf-8", newline="") as file:
+                count = export_records(self.storage, [record['path'] for record in records], file, format)
+            return True, f"{count} records exported to {filename} in {time.time() - start:.1f} s"
+        except Exception as e:
+            return False, f"Error exporting records: {e}"
+
+    def import_manifest(self, filename, template=None, overwrite=False):
+        """
+        Create configuration records for all devices of a CSV manifest.
+        
+        Every record starts from the template of its manifest row, or the given template, and
+        gets serial number, topics, client ID and broker set. Records are saved under the path
+        of their topic as set_file_path_to_topic does.
+        
+        Args:
+            filename (str): Path of the CSV manifest, see lib.manifest.
+            template (str, optional): Template for rows without one, the selected template by default.
+            overwrite (bool): Replace existing records instead of skipping them.
+        
+        Returns:
+            tuple: (bool, dict) indicating success and the paths of 'created', 'skipped' and 'failed' records.
+        """
+        summary = {'created': [], 'skipped': [], 'failed': []}
+        try:
+            rows = read_manifest(filename)
+        except Exception as e:
+            print(f"Error reading manifest {filename}:\n{e}", file=sys.stderr)
+            return False, summary
+        parameters = {
+            'serial': self.topic_serial,
+            'topic_up': self.topic_upload,
+            'topic_down': self.topic_download,
+            'broker': self.topic_broker_ip,
+            'client_id': self.topic_client_id,
+        }
+        for row in rows:
+            path = os.path.join(self.database_root, add_ps280_extensions(row['topic']), "config.toml")
+            try:
+                if not overwrite and self.storage.exists(path):
+                    summary['skipped'].append(path)
+                    continue
+                base = self.template_catalog.template(row.get('template') or template or self.template)
+                self.storage.save(path, build_record(base, row, parameters))
+                summary['created'].append(path)
+            except Exception as e:
+                print(f"Line {row['line']} ({row['serial']}): {e}", file=sys.stderr)
+                summary['failed'].append(path)
+        self.refresh_index()
+        print(f"Manifest {filename}: {len(summary['created'])} records created, "
+              f"{len(summary['skipped'])} existing skipped, {len(summary['failed'])} failed")
+        return not summary['failed'], summary
+
     def load_toml_file(self, file_path):
         """
         Loads a TOML configuration file into memory.
@@ -225,9 +927,9 @@ class PS280EditorBackend:
             tuple: (bool, str) indicating success and message.
         """
         try:
-            with open(file_path, "r") as file:
-                self.toml_data = toml.load(file)
+            self.toml_data = self.storage.load(file_path)
             self.current_file_path = file_path
+            self._file_content = self.toml_data.to_dict()
             return True, "File loaded successfully!"
         except Exception as e:
             return False, f"Error loading file: {e}"
@@ -241,10 +943,14 @@ class PS280EditorBackend:
         """
         if self.current_file_path:
             try:
-                targetpath = os.path.dirname(os.path.join(self.current_file_path))
-                os.makedirs(targetpath, exist_ok=True)
-                with open(os.path.join(self.current_file_path), "w") as file:
-                    toml.dump(self.toml_data, file)
+                self._file_content = self.toml_data.to_dict()
+                path = os.path.abspath(self.current_file_path)
+                # The writer thread reports the save only after it was registered here
+                with self._saving_lock:
+                    self.storage.save(path, self._file_content)
+                    if self.storage.is_pending(path):
+                        self._saving.add(path)
+                        return True, "Saving file..."
                 return True, "File saved successfully!"
             except Exception as e:
                 return False, f"Error saving file: {e}"
@@ -261,31 +967,70 @@ class PS280EditorBackend:
             bool: True if update was successful, False otherwise.
         """
         try:
-            with open(os.path.join(self.template_dir, templatefile), "r") as file:
-                self.template_data = toml.load(file)
+            self.template_data = self.template_catalog.template(templatefile)
         except Exception as e:
             print(f"Error loading template {templatefile}:\n{e}", file=sys.stderr)
             return False
+        for problem in self.template_compatibility(templatefile):
+            print(f"Template does not fit firmware {self.firmware['version']}: {problem}")
         
-        errors_occurred = False
-        for section in self.template_data:
-            for row in self.template_data[section]:
-                try:
-                    if self.toml_data[section][row] != self.template_data[section][row]:
-                        print(f"Updating {section}.{row} from {self.toml_data[section][row]} to {self.template_data[section][row]}")
-                    else:
-                        print(f"Keeping {section}.{row} at {self.toml_data[section][row]}")
-                    self.update_toml_data(section, row, self.template_data[section][row])
-                except Exception as e:
-                    print(f"Error updating {section}.{row}:\n{e}")
-                    errors_occurred = True
-        
-        if errors_occurred:
+        self.toml_data, changes, errors, warnings = merge_template(self.toml_data, self.template_data)
+        for change in changes:
+            print(f"Updated {change}")
+        for warning in warnings:
+            print(f"Skipped from template: {warning}")
+        for error in errors:
+            print(f"Error updating from template: {error}")
+        
+        if errors:
             print(f"Configuration update from template {templatefile} completed with errors!", file=sys.stderr)
         else:
-            print(f"Configuration update from template {templatefile} successfully completed!")
+            print(f"Configuration update from template {templatefile} successfully completed, {len(changes)} parameters changed!")
         return True
 
+    def apply_template_to_records(self, templatefile, text=None, workers=None, force=False, **filters):
+        """
+        Apply a configuration template to all records matching a database query.
+        
+        Records are processed in worker processes and saved atomically. Records the template
+        does not fit are left untouched.
+        
+        Args:
+            templatefile (str): Name of the template file.
+            text (str, optional): Search text as in search_records, all records if neither text nor filters are given.
+            workers (int, optional): Number of worker processes.
+            force (bool): Apply the template even if it does not fit the selected firmware.
+            filters: Column filters as in find_records.
+        
+        Returns:
+            tuple: (bool, dict) indicating success and the summary of changed, unchanged and failed records.
+        """
+        try:
+            template = self.template_catalog.template(templatefile)
+        except Exception as e:
+            print(f"Error loading template {templatefile}:\n{e}", file=sys.stderr)
+            return False, {}
+        problems = self.template_compatibility(templatefile)
+        if problems and not force:
+            for problem in problems:
+                print(problem)
+            print(f"Template {templatefile} does not fit firmware {self.firmware['version']}, no records changed",
+                  file=sys.stderr)
+            return False, {}
+        records = self.search_records(text) if text else self.find_records(**filters)
+        start = time.time()
+        summary = apply_template(self.storage, [record['path'] for record in records], template, workers)
+        self.refresh_index()
+        print(f"Template {templatefile} applied to {len(records)} records in {time.time() - start:.1f} s: "
+              f"{len(summary['changed'])} changed, {len(summary['unchanged'])} unchanged, {len(summary['failed'])} failed")
+        skipped = Counter(warning for status in ('changed', 'unchanged') for result in summary[status]
+                          for warning in result['warnings'])
+        for warning, count in skipped.items():
+            print(f"Skipped from template in {count} records: {warning}")
+        for result in summary['failed']:
+            print(f"{result['path']}: {'; '.join(result['errors'])}", file=sys.stderr)
+        return not summary['failed'], summary
+
     def set_file_path_to_topic(self):
         """
         Set the file path based on the MQTT topic.
@@ -301,12 +1046,13 @@ class PS280EditorBackend:
         except Exception as e:
             return False, f"Error setting file path: {e}"
     
-    def set_configuration_topics(self, topic):
+    def set_configuration_topics(self, topic, force=False):
         """
         Set the MQTT configuration topics.
         
         Args:
             topic (str): The MQTT topic to set.
+            force (bool): Set the topic even if another record uses it.
         
         Returns:
             tuple: (bool, str) Success status and message.
@@ -314,6 +1060,10 @@ class PS280EditorBackend:
         u_section, u_key = self.topic_upload.split(".")
         d_section, d_key = self.topic_download.split(".")
         try:
+            collisions = self.topic_collisions(topic) if topic else []
+            if collisions and not force:
+                return False, (f"Topic {topic} is already used by {', '.join(collisions)}. "
+                               f"Free topics: {', '.join(self.suggest_topics(topic))}")
             self.toml_data[u_section][u_key] = topic
             self.toml_data[d_section][d_key] = f'{topic}/dl'
             return True, f"Configuration topics set to: {topic}"
@@ -380,10 +1130,7 @@ class PS280EditorBackend:
             key (str): The key to update.
             value: The new value to set.
         """
-        if section:
-            self.toml_data[section][key] = self.parse_value(value, self.toml_data[section][key])
-        else:
-            self.toml_data[key] = self.parse_value(value, self.toml_data[key])
+        self.toml_data.set_value(section, key, value)
     
     def parse_value(self, value, original):
         """
@@ -396,13 +1143,7 @@ class PS280EditorBackend:
         Returns:
             Converted value in the correct type.
         """
-        if isinstance(original, bool):
-            return value.lower() in ("true", "1", "yes")
-        elif isinstance(original, int):
-            return int(value)
-        elif isinstance(original, float):
-            return float(value)
-        return value
+        return convert_value(value, original)
     
     def scan_firmware(self):
         """
@@ -410,42 +1151,233 @@ class PS280EditorBackend:
         """
         pass
     
+    @property
+    def template_catalog(self):
+        """
+        Returns the catalog of the templates in the template directory.
+        """
+        if self._template_catalog is None or self._template_catalog.template_dir != os.path.abspath(self.template_dir):
+            self._template_catalog = TemplateCatalog(self.template_dir)
+        return self._template_catalog
+
     @property
     def templates(self):
         """
         Retrieve a list of available TOML templates.
         
         Returns:
-            list: List of template filenames.
+            list: Sorted list of template filenames.
+        """
+        return self.template_catalog.names()
+
+    def template_compatibility(self, templatefile=None):
+        """
+        Check templates against the parameter specification of the selected firmware version.
+        
+        Args:
+            templatefile (str, optional): Name of a template, all templates if omitted.
+        
+        Returns:
+            list or dict: Problems of the template, or {template: problems} for all templates.
+                Empty if the firmware version has no parameter specification.
         """
-        return [i for i in os.listdir(os.path.abspath(self.template_dir)) if i.endswith('.toml')]
+        spec = self.parameter_spec
+        if templatefile is not None:
+            return self.template_catalog.check(templatefile, spec) if spec else []
+        return self.template_catalog.compatibility(spec) if spec else {}
     
     def set_template(self, selection):
         """
-        Set the template to be used.
+        Set the template to be used for the device of the current session.
         
         Args:
             selection (str): The name of the template to use.
         """
         self.template = selection 
         
-    def write_configuration(self):
+    @property
+    def fingerprint_exclude(self):
+        """
+        Returns the parameters and groups left out of settings fingerprints, the ignored
+        parameters and the runtime groups.
+        """
+        return frozenset(self.parameters_ignore) | frozenset(RUNTIME_GROUPS)
+
+    def fingerprint(self, settings=None):
+        """
+        Returns the fingerprint of settings, see lib.snapshots.settings_fingerprint.
+        
+        Args:
+            settings (Mapping, optional): Settings as {group: {parameter: value}}, the current configuration by default.
+        """
+        return settings_fingerprint(self.toml_data if settings is None else settings, self.fingerprint_exclude)
+
+    def write_fingerprint(self, settings):
+        """
+        Returns the fingerprint of the values settings hold for the parameters write_configuration
+        writes, the configurable parameters of the current configuration, runtime ones included.
+        
+        Args:
+            settings (Mapping): Settings as {group: {parameter: value}}.
+        """
+        selected = {}
+        for parameter in self.toml_data.parameters(exclude=IGNORE | READONLY):
+            values = settings.get(parameter.group) or {}
+            if parameter.name in values:
+                selected.setdefault(parameter.group, {})[parameter.name] = values[parameter.name]
+        return settings_fingerprint(selected)
+
+    def store_snapshot(self, settings, event="read"):
+        """
+        Add settings of the connected device to the history of its serial number.
+        
+        Args:
+            settings (dict): Settings as {group: {parameter: value}}.
+            event (str): What the snapshot was taken at, 'read' or 'write'.
+        
+        Returns:
+            dict or None: The timeline entry, None if there is no history or no serial number.
+        """
+        if self.snapshots is None:
+            return None
+        if isinstance(settings, ParameterTable):
+            settings = settings.to_dict()
+        section, key = self.topic_serial.split(".")
+        serial = settings.get(section, {}).get(key, '')
+        if not serial:
+            return None
+        section, key = self.topic_version.split(".")
+        try:
+            return self.snapshots.record(serial, settings, event, version=settings.get(section, {}).get(key, ''),
+                                         fingerprint=self.fingerprint(settings))
+        except Exception as e:
+            print(f"Could not store settings snapshot of {serial}: {e}")
+            return None
+
+    def device_history(self, serial=None):
+        """
+        List the changes of the settings of a device over all snapshots.
+        
+        Args:
+            serial (str, optional): Serial number, the one of the current configuration by default.
+        
+        Returns:
+            list: One dict per change with 'time', 'event' and 'changes' as (parameter, old, new).
+        """
+        if self.snapshots is None:
+            return []
+        return self.snapshots.history(serial or self.serial_number, self.parameters_ignore)
+
+    def lint_reference(self):
+        """
+        Returns the selected template as reference for value types, None if there is none.
+        """
+        try:
+            return self.template_catalog.template(self.template) if self.template else None
+        except ValueError:
+            return None
+
+    def lint_database(self, text=None, workers=None, top=20, **filters):
+        """
+        Check all records matching a database query before they are written to devices.
+        
+        Values are checked against the selected template and the parameter specification of
+        the selected firmware version, topics against the record paths and each other.
+        
+        Args:
+            text (str, optional): Search text as in search_records, all records if neither text nor filters are given.
+            workers (int, optional): Number of worker processes.
+            top (int): Number of records whose problems are printed.
+            filters: Column filters as in find_records.
+        
+        Returns:
+            tuple: (bool, dict) indicating whether all records are clean and the report, see lib.lint.lint_records.
+        """
+        records = self.search_records(text) if text else self.find_records(**filters)
+        start = time.time()
+        report = lint_records(self.storage, [record['path'] for record in records], self.parameter_spec or None,
+                              self.lint_reference(), self.parameters_ignore, self.database_root,
+                              self.topic_upload, self.topic_download, workers=workers)
+        print(f"{report['checked']} records checked in {time.time() - start:.1f} s: "
+              f"{len(report['records'])} with problems"
+              f"{'' if self.parameter_spec else ', no parameter specification for the selected firmware'}")
+        for parameter, count in report['problems'][:top]:
+            print(f"{parameter}: {count} problems")
+        for result in report['records'][:top]:
+            print(f"{result['path']}:\n    " + "\n    ".join(result['problems']), file=sys.stderr)
+        return not report['records'], report
+
+    def drift_report(self, text=None, top=20, **filters):
+        """
+        Compare the records of the deployed devices with their latest settings snapshots.
+        
+        Args:
+            text (str, optional): Search text as in search_records, all records if neither text nor filters are given.
+            top (int): Number of devices and parameters printed.
+            filters: Column filters as in find_records.
+        
+        Returns:
+            dict: Drift report, see lib.drift.detect_drift.
+        """
+        if self.snapshots is None:
+            print("No settings history configured", file=sys.stderr)
+            return {}
+        records = self.search_records(text) if text else self.find_records(**filters)
+        start = time.time()
+        report = detect_drift(self.storage, self.snapshots,
+                              [(record['serial'], record['path'], record['fingerprint'])
+                               for record in records if record['serial']],
+                              self.parameters_ignore)
+        print(f"Drift of {len(records)} records checked in {time.time() - start:.1f} s: "
+              f"{len(report['devices'])} drifted, {len(report['in_sync'])} in sync, "
+              f"{len(report['without_snapshot'])} without snapshot")
+        for parameter, count in report['parameters'][:top]:
+            print(f"{parameter}: drifted on {count} devices")
+        for device in report['devices'][:top]:
+            print(f"{device['serial']}: {', '.join(f'{name} {intended} != {actual}' for name, intended, actual in device['drift'])}")
+        for serial, error in report['failed']:
+            print(f"{serial}: {error}", file=sys.stderr)
+        return report
+
+    def write_configuration(self, force=False):
         """
         Write the current configuration to the device.
+        
+        The configuration is checked first, see lib.lint, and its problems are reported. With
+        lint_before_write nothing is written if it has problems. Nothing is written either if the
+        settings read from the device hold the values of every parameter that would be written,
+        see write_fingerprint.
+        
+        Args:
+            force (bool): Write even if lint_before_write is set and the check finds problems.
         """
+        problems = lint_settings(self.toml_data, self.parameter_spec or None, self.lint_reference(),
+                                 self.parameters_ignore)
+        if problems:
+            for problem in problems:
+                print(problem)
+            if self.lint_before_write and not force:
+                print("The configuration has problems, nothing written to the device", file=sys.stderr)
+                return False
+            print(f"Writing the configuration despite {len(problems)} problems")
         self.read_settings_to_temp()
-        for group in self.toml_data.keys():
-            for parameter in self.toml_data[group].keys():
-                if f"{group}.{parameter}" not in self.parameters_ignore:
-                    if group in self.temp_toml_data and parameter in self.temp_toml_data[group]:
-                        if self.toml_data[group][parameter] != self.temp_toml_data[group][parameter]:
-                            superuser = f"{group}.{parameter}" in self.parameters_superuser
-                            print(f"Setting parameter '{group}.{parameter}' to '{self.toml_data[group][parameter]}'")
-                            print(f'Result: {self.set(group, parameter, self.toml_data[group][parameter], superuser)}')
-                            print(f"Parameter '{group}.{parameter}' is now set to {self.get(group, parameter)}")
-                    else:
-                        print(f"Parameter '{group}.{parameter}' is not available in this firmware!")
+        if self.write_fingerprint(self.temp_toml_data) == self.write_fingerprint(self.toml_data):
+            print("The PS-280 already holds this configuration, nothing to write")
+            return True
+        written = self.temp_toml_data.to_dict()
+        for parameter in self.toml_data.parameters(exclude=IGNORE | READONLY):
+            group, name = parameter.group, parameter.name
+            if self.temp_toml_data.has_parameter(group, name):
+                if parameter.value != self.temp_toml_data[group][name]:
+                    print(f"Setting parameter '{parameter.key}' to '{parameter.value}'")
+                    print(f'Result: {self.set(group, name, parameter.value, parameter.superuser)}')
+                    value = self.get(group, name)
+                    written[group][name] = value
+                    print(f"Parameter '{parameter.key}' is now set to {value}")
+            else:
+                print(f"Parameter '{parameter.key}' is not available in this firmware!")
         #time.sleep(1)
+        self.store_snapshot(written, "write")
         return True
     
     def get(self,group, parameter):
@@ -469,22 +1401,38 @@ class PS280EditorBackend:
         """
         return [i for i in os.listdir(os.path.abspath(self.firmware_dir)) if os.path.isdir(os.path.abspath(os.path.join(self.firmware_dir, i)))]
     
-    def set_firmware_version(self, selection):
+    def firmware_files(self, selection):
         """
-        Set the desired firmware version and assign associated files.
+        Assign the image files of a firmware version.
         
         Args:
             selection (str): Firmware version directory.
+        
+        Returns:
+            dict: Firmware version with its bootloader, partition table and application image.
         """
-        self.firmware['version'] = selection
+        firmware = {'version': selection, 'bootloader': '', 'partitiontable': '', 'firmwarebin': ''}
         bin_files = [i for i in os.listdir(os.path.abspath(os.path.join(self.firmware_dir, selection))) if i.endswith('.bin')]
         for bf in bin_files:
             if bf.startswith('boot'):
-                self.firmware['bootloader'] = bf
+                firmware['bootloader'] = bf
             elif bf.startswith('partition'):
-                self.firmware['partitiontable'] = bf
+                firmware['partitiontable'] = bf
             elif bf.startswith('pikk-sense-'):
-                self.firmware['firmwarebin'] = bf
+                firmware['firmwarebin'] = bf
+        return firmware
+
+    def set_firmware_version(self, selection):
+        """
+        Set the desired firmware version for the device of the current session and assign
+        associated files.
+        
+        Args:
+            selection (str): Firmware version directory.
+        """
+        self.firmware = self.firmware_files(selection)
+        # Take up the parameter specification of the version
+        self.toml_data = self.toml_data
     
     def connect(self):
         """
@@ -493,7 +1441,16 @@ class PS280EditorBackend:
         #del self.PS280
         #time.sleep(5)
         print("Connecting to PS-280")
-        self.PS280 = PS280('', 115200, timeout=1, stdout=stdoutstream, stderr=stderrstream)
+        session = self.session
+        session.close()
+        with self._connect_lock:
+            # Ports held by the other sessions are neither probed nor taken over
+            in_use = {other.device.port for other in self.sessions.values()
+                      if other is not session and other.connected and other.device.port}
+            if session.port in in_use:
+                raise Exception(f"{session.port} is used by another session")
+            self.PS280 = PS280(session.port or '', 115200, timeout=1, stdout=stdoutstream, stderr=stderrstream,
+                               baudrates=self.flash_baudrates, exclude_ports=in_use)
         print("------",self.PS280.connection)
         if self.PS280.connection is None:
             print('No connection to PS-280', file=sys.stderr)
@@ -521,11 +1478,14 @@ class PS280EditorBackend:
 #            print(f'No connection to PS-280: {e}', file=sys.stderr)
 #            return False
         try:
+            if self.skip_firmware_stage("erase"):
+                return True
             result = self.PS280.firmware_erase()
+            self.firmware_check = None
             time.sleep(1)
         except Exception as e:
             print(f'Error erasing firmware: {e}', file=sys.stderr)
-        return not result
+        return result
 
     def firmware_flash(self):
         """
@@ -545,27 +1505,184 @@ class PS280EditorBackend:
 #            print(f'No connection to PS-280: {e}', file=sys.stderr)
 #            return False
         try:
+            if self.skip_firmware_stage("flash"):
+                return True
             # Update firmware with the corresponding files
             result = self.PS280.firmware_update(
                 bootloader_file=f"{os.path.join(os.path.abspath(self.firmware_dir), self.firmware['version'], self.firmware['bootloader'])}",
                 partition_table_file=f"{os.path.join(os.path.abspath(self.firmware_dir), self.firmware['version'], self.firmware['partitiontable'])}",
                 firmware_file=f"{os.path.join(os.path.abspath(self.firmware_dir), self.firmware['version'], self.firmware['firmwarebin'])}"
             )
+            self.firmware_check = None
             time.sleep(1)
         except Exception as e:
             print(f'Error flashing firmware: {e}', file=sys.stderr)
-        return not result
+        return result
+
+    def firmware_is_current(self):
+        """
+        Check whether the device already runs the selected firmware version.
+        
+        A device that does not report its version in time, e.g. a blank or boot-looping one,
+        does not run it. With verify_current_firmware set, a matching version is confirmed by
+        comparing the flash regions with the selected firmware files by their hash.
+        The result is kept until the device is reconnected or flashed.
+        
+        Returns:
+            bool: True if the selected firmware is already running.
+        """
+        key = (self.firmware['version'], self.verify_current_firmware)
+        if self.firmware_check and self.firmware_check[0] == key:
+            return self.firmware_check[1]
+        running, version = self.PS280.version, self.firmware['version']
+        # The running version may carry further fields, e.g. a build stamp, but 0.12.0.3 is not 0.12.0.35
+        current = bool(version) and (running == version or running.startswith(version + '.'))
+        print(f"Running firmware: {running or 'unknown'}, selected firmware: {self.firmware['version']}")
+        if current and self.verify_current_firmware:
+            current = self.PS280.firmware_verify(self.firmware_images)
+            print(f"Flash hash check {'passed' if current else 'failed'}")
+        self.firmware_check = (key, current)
+        return current
+
+    def skip_firmware_stage(self, stage):
+        """
+        Decide whether a firmware stage can be skipped because the firmware is already current.
+        
+        Args:
+            stage (str): Name of the stage for the console output.
+        
+        Returns:
+            bool: True if the stage should be skipped.
+        """
+        if not self.skip_current_firmware:
+            return False
+        if self.firmware_is_current():
+            print(f"Firmware {self.firmware['version']} is already running, skipping {stage}")
+            return True
+        return False
+
+    @property
+    def firmware_images(self):
+        """
+        Flash offsets and files of the selected firmware version.
+        
+        Returns:
+            list: (offset, file) pairs in flash order.
+        """
+        version_dir = os.path.join(os.path.abspath(self.firmware_dir), self.firmware['version'])
+        return [
+            ("0x0000", os.path.join(version_dir, self.firmware['bootloader'])),
+            ("0x8000", os.path.join(version_dir, self.firmware['partitiontable'])),
+            ("0x10000", os.path.join(version_dir, self.firmware['firmwarebin'])),
+        ]
+
+    def firmware_provision(self, erase=True):
+        """
+        Identify, erase, flash and verify the PS-280 device in a single bootloader session
+        and reset it into the new firmware afterwards.
+        
+        Args:
+            erase (bool): Erase the whole flash before writing.
+        
+        Returns:
+            bool: True if provisioning was successful, False otherwise.
+        """
+        print("Provisioning firmware on PS-280")
+        if self.PS280 is None:
+            print('No connection to PS-280', file=sys.stderr)
+            return False
+        try:
+            if self.skip_firmware_stage("erase and flash"):
+                return True
+            chip_info = self.PS280.firmware_provision(self.firmware_images, erase=erase)
+            self.firmware_check = None
+            for key, value in chip_info.items():
+                print(f"{key}: {value}")
+            time.sleep(1)
+        except Exception as e:
+            print(f'Error provisioning firmware: {e}', file=sys.stderr)
+            return False
+        return True
+
+    def ota_rollout(self, record_paths, version=None):
+        """
+        Roll out a firmware version over the air to the devices of the given configuration records.
+        
+        The application image is served from the firmware directory by a local HTTP server and the
+        update is triggered on the download topic of every device. Devices are grouped by the broker
+        configured in their records, devices without broker or topics in their records fail.
+        
+        Args:
+            record_paths (list): Paths of the configuration records of the devices.
+            version (str, optional): Firmware version, the selected one by default. The selection
+                of the session is kept.
+        
+        Returns:
+            tuple: (bool, list) indicating whether every device reported a successful update and
+                the OTA result record per device, see lib.ota.OTARollout.update_device.
+        """
+        from .ota import FirmwareServer, OTARollout, OTA_COMMANDS, OTA_RESULT_PATTERN
+        firmware = self.firmware_files(version) if version else self.firmware
+        topics = {name: topic.split(".") for name, topic in (
+            ('topic_up', self.topic_upload), ('topic_down', self.topic_download),
+            ('broker', self.topic_broker_ip), ('port', self.topic_broker_port))}
+        s_section, s_key = self.topic_serial.split(".")
+        brokers = {}
+        results = []
+        for path in record_paths:
+            data = self.storage.load(path)
+            values = {name: data.get(section, {}).get(key) for name, (section, key) in topics.items()}
+            device = {'serial': data.get(s_section, {}).get(s_key, ''),
+                      'topic_up': values['topic_up'], 'topic_down': values['topic_down']}
+            missing = [name for name in ('broker', 'topic_up', 'topic_down') if not values[name]]
+            if missing:
+                # Not a reason to hold back the update of the other devices
+                print(f"{path}: no {', '.join(missing)} configured", file=sys.stderr)
+                results.append({'serial': device['serial'], 'topic': device['topic_up'], 'request': None,
+                                'status': 'not configured', 'result': None, 'seconds': 0})
+                continue
+            brokers.setdefault((values['broker'], values['port'] or '1883'), []).append(device)
+        with FirmwareServer(self.firmware_dir, self.ota_config.get('host', ''), self.ota_config.get('port', 8280)) as server:
+            url = server.url_for(firmware['version'], firmware['firmwarebin'])
+            for (broker, port), devices in brokers.items():
+                print(f"Rolling out {url} to {len(devices)} devices on {broker}:{port}")
+                rollout = OTARollout(broker, port,
+                                     username=self.ota_config.get('mqtt_user', ''),
+                                     password=self.ota_config.get('mqtt_password', ''),
+                                     concurrency=self.ota_config.get('concurrency', 4),
+                                     timeout=self.ota_config.get('timeout', 900),
+                                     commands=self.ota_config.get('commands', OTA_COMMANDS),
+                                     result_pattern=self.ota_config.get('result_pattern', OTA_RESULT_PATTERN))
+                results += rollout.run(devices, url)
+        failed = [result for result in results
+                  if result['status'] != 'reported' or not str(result['result']).lstrip('-').isdigit()
+                  or int(result['result']) <= 0]
+        for result in failed:
+            print(f"{result['serial']}: OTA update failed ({result['status']}, result {result['result']})",
+                  file=sys.stderr)
+        return not failed, results
+
+    def flash_throughput(self):
+        """
+        Retrieve the recorded flash throughput per port and baud rate.
+        
+        Returns:
+            dict: {port: {baud: average bytes per second}}
+        """
+        return self.flash_baudrates.throughput()
 
     def read_settings(self):
         print("Reading settings from PS-280\nPlese be patient...")
         if self.PS280 is None:
             print('No connection to PS-280', file=sys.stderr)
+            return False
         else:
             print( 'Reading')
             config_data= self.PS280.settings
             #time.sleep(1)
             if config_data:
                 self.toml_data= config_data
+                self.store_snapshot(config_data)
                 return True
             return False
 
@@ -573,12 +1690,14 @@ class PS280EditorBackend:
         print("Reading settings from PS-280\nPlese be patient...")
         if self.PS280 is None:
             print('No connection to PS-280', file=sys.stderr)
+            return False
         else:
             print( 'Reading')
             config_data= self.PS280.settings
             #time.sleep(1)
             if config_data:
                 self.temp_toml_data= config_data
+                self.store_snapshot(config_data)
                 return True
             return False
     
@@ -639,13 +1758,22 @@ class PS280EditorBackend:
         except KeyError:
             return ''
     
-    def create_stickers(self):
+    def create_stickers(self, open_viewer=True):
         """
         Generate a sticker with a QR code based on device configuration data.
         
         The sticker contains relevant device information including serial number and sensor ID,
         and is saved as a high-resolution image.
+        
+        Args:
+            open_viewer (bool): Show QR code and sticker in the default image viewer.
+        
+        Returns:
+            str: Path of the combined sticker image.
         """
+        # Pillow, segno and the sticker tool are only loaded when the first sticker is created
+        from PIL import Image
+        from .stickertool import Sticker
 
         def open_file(filepath):
             
@@ -690,7 +1818,9 @@ class PS280EditorBackend:
         # Save the final high-resolution image
         filepath = os.path.join(sticker.output_path, f"{sticker.serial}_qr_and_sticker.png")
         merged_image.save(filepath, dpi=(300, 300))
-        open_file(sticker.qr_code_file)
-        open_file(sticker.image_file)
+        if open_viewer:
+            open_file(sticker.qr_code_file)
+            open_file(sticker.image_file)
+        return filepath
 
 
@@ -190,7 +190,7 @@ class LabeledTextfield(ft.Column):
     A labeled text input field component.
     """
     
-    def __init__(self, page, labeltext, on_blur=None):
+    def __init__(self, page, labeltext, on_blur=None, on_change=None):
         """
         Initialize the labeled text field.
         
@@ -198,6 +198,7 @@ class LabeledTextfield(ft.Column):
             page: The Flet page instance.
             labeltext (str): The label text.
             on_blur: Function to call when the field loses focus.
+            on_change: Function to call when the text changes.
         """
         self.textfield = ft.TextField(
             label="",
@@ -206,14 +207,28 @@ class LabeledTextfield(ft.Column):
             content_padding=ft.Padding(10, 5, 10, 5),
             bgcolor= page.theme.color_scheme.secondary_container,
             on_blur=on_blur,
+            on_change=on_change,
             height=38
         )
+        self.hint_text = ft.Text("", size=10, visible=False)
         
         super().__init__(spacing=3, controls=[
             Label(page, labeltext),
             self.textfield,
+            self.hint_text,
         ])
     
+    @property
+    def hint(self):
+        """Get the hint shown below the text field."""
+        return self.hint_text.value
+    
+    @hint.setter
+    def hint(self, value):
+        """Show a hint below the text field, hide it if empty."""
+        self.hint_text.value = value or ""
+        self.hint_text.visible = bool(value)
+    
     @property
     def value(self):
         """Get the text field value."""
@@ -0,0 +1,350 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module maintains an SQLite index of the PS-280 configuration database.
+For every config.toml below the database root the index stores serial number, MQTT topics,
+broker, firmware version, settings fingerprint and path. The index is refreshed incrementally: directories whose
+modification time did not change are not listed again and only records whose config.toml
+changed in modification time or size are parsed again. Records kept in a storage backend
+without directories are refreshed by their revision instead.
+
+Dependencies:
+    - os: File system operations
+    - json: Store directory listings
+    - sqlite3: Index storage
+    - threading: Serialize access from UI and worker threads
+    - toml_loader: Parse configuration records
+    - snapshots: Settings fingerprints
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from .toml_loader import load_toml
+from .snapshots import settings_fingerprint
+
+CONFIG_FILE = "config.toml"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    children TEXT,
+    has_config INTEGER
+);
+CREATE TABLE IF NOT EXISTS records (
+    path TEXT PRIMARY KEY,
+    serial TEXT,
+    topic_up TEXT,
+    topic_down TEXT,
+    broker TEXT,
+    version TEXT,
+    mtime_ns INTEGER,
+    size INTEGER,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS records_serial ON records (serial);
+CREATE INDEX IF NOT EXISTS records_topic_up ON records (topic_up);
+CREATE INDEX IF NOT EXISTS records_topic_down ON records (topic_down);
+CREATE INDEX IF NOT EXISTS records_broker ON records (broker);
+CREATE INDEX IF NOT EXISTS records_version ON records (version);
+CREATE INDEX IF NOT EXISTS records_fingerprint ON records (fingerprint);
+"""
+
+# Columns that can be used as query filters
+QUERY_COLUMNS = ('path', 'serial', 'topic_up', 'topic_down', 'broker', 'version', 'fingerprint')
+
+
+class DatabaseIndex:
+    """
+    SQLite index of the configuration records below a database root.
+    """
+
+    def __init__(self, database_root, index_file,
+                 topic_upload="MQTT.TOPIC_UP", topic_download="MQTT.TOPIC_DOWN",
+                 topic_serial="CORE.SERIAL", topic_version="CORE.VERSION",
+                 topic_broker_ip="HUB.REMOTE_IP", storage=None, fingerprint_exclude=()):
+        """
+        Open or create the index.
+
+        Args:
+            database_root (str): Root directory of the configuration database.
+            index_file (str): Path of the SQLite index file.
+            topic_upload (str): Parameter holding the upload topic.
+            topic_download (str): Parameter holding the download topic.
+            topic_serial (str): Parameter holding the serial number.
+            topic_version (str): Parameter holding the firmware version.
+            topic_broker_ip (str): Parameter holding the broker address.
+            storage (optional): Storage backend the records are loaded from, config.toml files otherwise.
+            fingerprint_exclude (collection): Parameters and groups left out of the settings
+                fingerprints, see snapshots.settings_fingerprint.
+        """
+        self.database_root = os.path.abspath(database_root)
+        self.index_file = index_file
+        self.columns = {
+            'serial': topic_serial,
+            'topic_up': topic_upload,
+            'topic_down': topic_download,
+            'broker': topic_broker_ip,
+            'version': topic_version,
+        }
+        self.storage = storage
+        self.fingerprint_exclude = frozenset(fingerprint_exclude)
+        # Called with (path, indexed values) for every added or updated record, values None if removed
+        self.listeners = []
+        source = f"{getattr(storage, 'kind', 'directory')}:{self.database_root}"
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(index_file)), exist_ok=True)
+        self.connection = sqlite3.connect(index_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        exclude = json.dumps(sorted(self.fingerprint_exclude))
+        with self.lock, self.connection:
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(records)")}
+            if columns and 'fingerprint' not in columns:
+                # Index of an earlier version, its records are parsed again
+                self.connection.execute("ALTER TABLE records ADD COLUMN fingerprint TEXT")
+                self.connection.execute("DELETE FROM records")
+            self.connection.executescript(SCHEMA)
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'database_root'").fetchone()
+            if row is None or row['value'] != source:
+                # The index belongs to another database, start over
+                self.connection.execute("DELETE FROM directories")
+                self.connection.execute("DELETE FROM records")
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('database_root', ?)", (source,))
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint_exclude'").fetchone()
+            if row is None or row['value'] != exclude:
+                # Fingerprints of other parameters, records are parsed again
+                self.connection.execute("DELETE FROM records")
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint_exclude', ?)", (exclude,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _notify(self, path, values):
+        for listener in self.listeners:
+            listener(path, values)
+
+    def parse_record(self, path):
+        """
+        Extract the indexed values from a configuration record.
+
+        Args:
+            path (str): Path of the config.toml file.
+
+        Returns:
+            dict: Indexed column values.
+        """
+        if self.storage is not None:
+            return self.values_from(self.storage.load(path))
+        return self.values_from(load_toml(path))
+
+    def values_from(self, data):
+        """
+        Extract the indexed values from configuration data.
+        """
+        values = {}
+        for column, parameter in self.columns.items():
+            section, key = parameter.split(".")
+            values[column] = str(data.get(section, {}).get(key, ''))
+        values['fingerprint'] = settings_fingerprint(data, self.fingerprint_exclude)
+        return values
+
+    def _list_directory(self, path):
+        children = []
+        has_config = False
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    children.append(entry.name)
+                elif entry.name == CONFIG_FILE:
+                    has_config = True
+        return children, has_config
+
+    def refresh(self):
+        """
+        Bring the index up to date with the database directory.
+
+        Returns:
+            dict: Number of added, updated, removed and unchanged records.
+        """
+        if hasattr(self.storage, 'scan'):
+            return self._refresh_from_storage()
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self.lock, self.connection:
+            directories = {row['path']: row for row in self.connection.execute("SELECT * FROM directories")}
+            records = {row['path']: (row['mtime_ns'], row['size'])
+                       for row in self.connection.execute("SELECT path, mtime_ns, size FROM records")}
+            seen_directories = set()
+            seen_records = set()
+            stack = [self.database_root] if os.path.isdir(self.database_root) else []
+            while stack:
+                directory = stack.pop()
+                seen_directories.add(directory)
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                cached = directories.get(directory)
+                if cached is not None and cached['mtime_ns'] == mtime_ns:
+                    children, has_config = json.loads(cached['children']), bool(cached['has_config'])
+                else:
+                    try:
+                        children, has_config = self._list_directory(directory)
+                    except OSError:
+                        continue
+                    self.connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)",
+                                            (directory, mtime_ns, json.dumps(children), int(has_config)))
+                stack.extend(os.path.join(directory, child) for child in children)
+                if has_config:
+                    path = os.path.join(directory, CONFIG_FILE)
+                    seen_records.add(path)
+                    self._refresh_record(path, records.get(path), counts)
+            for path in set(records) - seen_records:
+                self.connection.execute("DELETE FROM records WHERE path = ?", (path,))
+                self._notify(path, None)
+                counts['removed'] += 1
+            for path in set(directories) - seen_directories:
+                self.connection.execute("DELETE FROM directories WHERE path = ?", (path,))
+        return counts
+
+    def _refresh_from_storage(self):
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self.lock, self.connection:
+            records = {row['path']: (row['mtime_ns'], row['size'])
+                       for row in self.connection.execute("SELECT path, mtime_ns, size FROM records")}
+            seen_records = set()
+            for path, revision, size in self.storage.scan():
+                seen_records.add(path)
+                self._refresh_record(path, records.get(path), counts, (revision, size))
+            for path in set(records) - seen_records:
+                self.connection.execute("DELETE FROM records WHERE path = ?", (path,))
+                self._notify(path, None)
+                counts['removed'] += 1
+        return counts
+
+    def _refresh_record(self, path, stamp, counts, current=None):
+        if current is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return
+            current = (stat.st_mtime_ns, stat.st_size)
+        if stamp == current:
+            counts['unchanged'] += 1
+            return
+        try:
+            values = self.parse_record(path)
+        except Exception as e:
+            print(f"Could not index {path}: {e}")
+            values = {column: '' for column in (*self.columns, 'fingerprint')}
+        self.connection.execute(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, values['serial'], values['topic_up'], values['topic_down'], values['broker'],
+             values['version'], current[0], current[1], values['fingerprint']))
+        self._notify(path, values)
+        counts['added' if stamp is None else 'updated'] += 1
+
+    def refresh_record(self, path):
+        """
+        Update the index entry of a single record, e.g. right after it was saved.
+
+        Args:
+            path (str): Path of the config.toml file.
+        """
+        if hasattr(self.storage, 'scan'):
+            # Storage backends without files are refreshed by revision
+            self._refresh_from_storage()
+            return
+        path = os.path.abspath(path)
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self.lock, self.connection:
+            if not os.path.exists(path):
+                self.connection.execute("DELETE FROM records WHERE path = ?", (path,))
+                self._notify(path, None)
+                return
+            row = self.connection.execute("SELECT mtime_ns, size FROM records WHERE path = ?", (path,)).fetchone()
+            self._refresh_record(path, (row['mtime_ns'], row['size']) if row else None, counts)
+
+    def query(self, **filters):
+        """
+        Find records by indexed values.
+
+        Filter values containing '*' or '?' are matched as glob patterns, all others exactly.
+
+        Args:
+            filters: Column filters, e.g. serial='PS280-223476' or topic_up='udk.production/*'.
+
+        Returns:
+            list: Matching records as dicts, ordered by path.
+        """
+        clauses, arguments = [], []
+        for column, value in filters.items():
+            if column not in QUERY_COLUMNS:
+                raise ValueError(f"Unknown index column '{column}'")
+            if value is None:
+                continue
+            operator = 'GLOB' if any(c in str(value) for c in '*?[') else '='
+            clauses.append(f"{column} {operator} ?")
+            arguments.append(str(value))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.connection.execute(f"SELECT * FROM records {where} ORDER BY path", arguments).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text):
+        """
+        Find records whose serial, topics or broker contain the given text.
+
+        Args:
+            text (str): Text to search for.
+
+        Returns:
+            list: Matching records as dicts, ordered by path.
+        """
+        pattern = f"%{text}%"
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM records WHERE serial LIKE ? OR topic_up LIKE ? OR topic_down LIKE ? "
+                "OR broker LIKE ? ORDER BY path", (pattern,) * 4).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_by_serial(self, serial):
+        return self.query(serial=serial)
+
+    def find_by_topic(self, topic):
+        return self.query(topic_up=topic) or self.query(topic_down=topic)
+
+    def find_by_broker(self, broker):
+        return self.query(broker=broker)
+
+    def find_by_version(self, version):
+        """Find records whose firmware version starts with the given version."""
+        return self.query(version=f"{version}*")
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+# -
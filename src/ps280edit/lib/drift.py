@@ -0,0 +1,122 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module detects drift between the intended configuration of PS-280 devices, their
+database records, and what the devices actually hold, their latest settings snapshot.
+Records and snapshots are compared in parallel; ignored parameters and runtime-only groups
+are left out. Where record and snapshot have the same settings fingerprint the device is in
+sync without loading either. The report ranks devices by the number of drifted parameters and
+parameters by the number of devices they drifted on.
+
+Dependencies:
+    - collections: Count drifted parameters
+    - concurrent.futures: Parallel comparison
+    - ps280_toolbox: Runtime groups
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from .ps280_toolbox import RUNTIME_GROUPS
+
+
+def compare_settings(intended, actual, ignore=(), ignore_groups=RUNTIME_GROUPS):
+    """
+    List the intended parameters a device does not hold.
+
+    Parameters the device has but the record does not set are not drift.
+
+    Args:
+        intended (dict): Record as {group: {parameter: value}}.
+        actual (dict): Device settings in the same layout.
+        ignore (list): 'GROUP.PARAMETER' entries left out.
+        ignore_groups (list): Groups left out.
+
+    Returns:
+        list: (parameter, intended value, actual value) tuples, actual None if the device lacks it.
+    """
+    drift = []
+    for group, parameters in intended.items():
+        if group in ignore_groups or not hasattr(parameters, 'items'):
+            continue
+        device_group = actual.get(group) or {}
+        for parameter, value in parameters.items():
+            name = f"{group}.{parameter}"
+            if name in ignore:
+                continue
+            device_value = device_group.get(parameter)
+            if device_value is None or str(device_value) != str(value):
+                drift.append((name, value, device_value))
+    return drift
+
+
+def detect_drift(storage, snapshots, records, ignore=(), ignore_groups=RUNTIME_GROUPS, workers=8):
+    """
+    Compare the records of many devices with their latest snapshots.
+
+    Args:
+        storage: Storage backend of the records.
+        snapshots (SnapshotStore): Store of the device snapshots.
+        records (list): (serial, record path) pairs, or (serial, record path, fingerprint) triples
+            with the fingerprint of the record as stored in the index.
+        ignore (list): 'GROUP.PARAMETER' entries left out.
+        ignore_groups (list): Groups left out.
+        workers (int): Number of threads.
+
+    Returns:
+        dict: 'devices' with drift, most drifted first; 'parameters' as (parameter, device count),
+            most frequent first; 'in_sync' and 'without_snapshot' serials; 'failed' (serial, error) pairs.
+    """
+    ignore = frozenset(ignore)
+
+    def check(record):
+        serial, path, fingerprint = (*record, None)[:3]
+        try:
+            timeline = snapshots.timeline(serial)
+            if not timeline:
+                return serial, path, None, None
+            entry = timeline[-1]
+            if fingerprint and entry.get('fingerprint') == fingerprint:
+                return serial, path, entry, []
+            actual = snapshots.get(entry['id'])
+            return serial, path, entry, compare_settings(storage.load(path), actual, ignore, ignore_groups)
+        except Exception as e:
+            return serial, path, None, e
+
+    report = {'devices': [], 'parameters': [], 'in_sync': [], 'without_snapshot': [], 'failed': []}
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for serial, path, entry, drift in executor.map(check, records):
+            if isinstance(drift, Exception):
+                report['failed'].append((serial, str(drift)))
+            elif entry is None:
+                report['without_snapshot'].append(serial)
+            elif not drift:
+                report['in_sync'].append(serial)
+            else:
+                counts.update(name for name, _, _ in drift)
+                report['devices'].append({'serial': serial, 'path': path, 'snapshot_time': entry['time'],
+                                          'drift': drift})
+    report['devices'].sort(key=lambda device: (-len(device['drift']), device['serial']))
+    report['parameters'] = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return report
+# -
@@ -0,0 +1,128 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module exports PS-280 configuration records for analysis.
+Records are streamed into JSONL, one document per device, or into a flat CSV with one row per
+device and one column per GROUP.PARAMETER. Records are read in parallel with a bounded window
+of reads in flight, so the export runs in constant memory however large the fleet is.
+
+Dependencies:
+    - csv: CSV output
+    - json: JSONL output
+    - collections: Window of pending reads
+    - concurrent.futures: Parallel reads
+"""
+
+import csv
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+
+def iter_records(storage, paths, workers=8, window=64):
+    """
+    Read records in parallel and yield them in the order of the paths.
+
+    Args:
+        storage: Storage backend of the records.
+        paths (iterable): Paths of the records.
+        workers (int): Number of reader threads.
+        window (int): Maximum number of reads in flight.
+
+    Yields:
+        tuple: (path, data) with data None if the record could not be read.
+    """
+    def read(path):
+        try:
+            return storage.load(path)
+        except Exception as e:
+            print(f"Could not read {path}: {e}")
+            return None
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path in paths:
+            pending.append((path, executor.submit(read, path)))
+            if len(pending) >= window:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def flatten_record(data):
+    """
+    Flatten a record into {'GROUP.PARAMETER': value}.
+    """
+    return {f"{group}.{parameter}": value
+            for group, parameters in data.items() if isinstance(parameters, dict)
+            for parameter, value in parameters.items()}
+
+
+def export_records(storage, paths, output, format='jsonl', columns=None, workers=8):
+    """
+    Stream records into an open text file.
+
+    Args:
+        storage: Storage backend of the records.
+        paths (list): Paths of the records.
+        output: Text file opened for writing, with newline='' for CSV.
+        format (str): 'jsonl' or 'csv'.
+        columns (list, optional): CSV columns as 'GROUP.PARAMETER'. Without columns the records
+            are read twice, first to collect the columns of all records.
+        workers (int): Number of reader threads.
+
+    Returns:
+        int: Number of exported records.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{format}'")
+    count = 0
+    if format == 'jsonl':
+        for path, data in iter_records(storage, paths, workers):
+            if data is None:
+                continue
+            output.write(json.dumps({'path': path, **data}, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+    if columns is None:
+        collected = set()
+        for _, data in iter_records(storage, paths, workers):
+            if data is not None:
+                collected.update(flatten_record(data))
+        columns = sorted(collected)
+    writer = csv.DictWriter(output, fieldnames=['path'] + list(columns), extrasaction='ignore')
+    writer.writeheader()
+    for path, data in iter_records(storage, paths, workers):
+        if data is None:
+            continue
+        writer.writerow({'path': path, **flatten_record(data)})
+        count += 1
+    return count
+# -
@@ -20,21 +20,32 @@ import sys, os
 #
 #    sys.path = [TOOLBOXROOT]+sys.path
 #
-from .ps280_toolbox import PS280#, flash_firmware, configure_for_udk
 
 #STICKERTOOLPATH= os.path.join(os.path.dirname(os.getcwd()),'stickertool')
 #if STICKERTOOLPATH not in sys.path:
 #    sys.path= [STICKERTOOLPATH]+sys.path
 
-from .stickertool import Sticker
+import functools
 import flet as ft
-import toml
 from .backend import PS280EditorBackend
+from .session import DEFAULT_SESSION
 from .real_time_output_overlay import RealTimeOutputOverlay
 from .custom_elements import LabeledText, LabeledTextfield, Button, LabeledDropdown, LabeledContainer, Label
 import copy
 stdoutstream= sys.stdout
 stderrstream= sys.stderr
+
+
+def in_session(handler):
+    """
+    Run an editor handler holding the lock of the selected device session, so the watcher does
+    not reload the record while the handler changes it.
+    """
+    @functools.wraps(handler)
+    def locked(self, *args, **kwargs):
+        with self.backend.lock_session():
+            return handler(self, *args, **kwargs)
+    return locked
 class PS280EditorUI:
     """Handles the user interface for the TOML Editor application."""
 
@@ -64,7 +75,8 @@ class PS280EditorUI:
             'topic': LabeledTextfield(
                 page= page, 
                 labeltext= 'MQTT Topic', 
-                on_blur=lambda _: self.on_set_configuration_topics(page)
+                on_blur=lambda _: self.on_set_configuration_topics(page),
+                on_change=lambda _: self.on_topic_changed(page)
             ),
             'serial': LabeledTextfield(
                 page= page, 
@@ -76,6 +88,11 @@ class PS280EditorUI:
                 labeltext= 'MQTT Broker IP', 
                 on_blur=lambda _: self.on_set_configuration_mqtt_broker(page)
             ),
+            'find_record': LabeledTextfield(
+                page= page, 
+                labeltext= 'Find Record (Serial, Topic or Broker)', 
+                on_blur=lambda _: self.on_find_record(page)
+            ),
             }
 
         
@@ -101,6 +118,23 @@ class PS280EditorUI:
                 labeltext= "Set",  
                 callback= lambda _: self.on_set_from_template(page, output_overlay)
                 ),
+            'drift' : Button(
+                page= page,
+                labeltext= "Drift",  
+                callback= lambda _: output_overlay.run_function_with_realtime_output(
+                    lambda : self.backend.drift_report(text=self.textfields['find_record'].value))
+                ),
+            'lint' : Button(
+                page= page,
+                labeltext= "Lint",  
+                callback= lambda _: output_overlay.run_function_with_realtime_output(
+                    lambda : self.backend.lint_database(text=self.textfields['find_record'].value)[0])
+                ),
+            'apply_template_all' : Button(
+                page= page,
+                labeltext= "Set All",  
+                callback= lambda _: self.on_apply_template_all(page, output_overlay)
+                ),
             'load' : Button(
                 page= page,
                 labeltext= "Load",  
@@ -108,6 +142,19 @@ class PS280EditorUI:
                                                                              initial_directory=self.backend.database_root,
                                                                              dialog_title="Choose the configuration file")
                 ),
+            'export' : Button(
+                page= page,
+                labeltext= "Export",  
+                callback= lambda _: self.selectors['export_file'].save_file(allowed_extensions=["jsonl", "csv"],
+                                                                           file_name="ps280_records.csv",
+                                                                           dialog_title="Export the records matching the search text")
+                ),
+            'import_manifest' : Button(
+                page= page,
+                labeltext= "Import",  
+                callback= lambda _: self.selectors['manifest_file'].pick_files(allowed_extensions=["csv"],
+                                                                               dialog_title="Choose the CSV manifest of the new devices")
+                ),
             'erase_firmware' : Button(
                 page= page,
                 labeltext= "Erase",  
@@ -118,6 +165,11 @@ class PS280EditorUI:
                 labeltext= "Flash",  
                 callback= lambda _: self.on_firmware_update(page, output_overlay)
                 ),
+            'provision_firmware' : Button(
+                page= page,
+                labeltext= "Install",  
+                callback= lambda _: self.on_firmware_provision(page, output_overlay)
+                ),
             'set_path_to_topic' : Button(
                 page= page,
                 labeltext= "From topic", 
@@ -161,6 +213,12 @@ class PS280EditorUI:
                 'template_file' : copy.deepcopy(ft.FilePicker)(
                     on_result= lambda e: self.on_template_file_selected(e, page),
                     ),
+                'export_file' : ft.FilePicker(
+                    on_result= lambda e: self.on_export_file_selected(e, page)
+                    ),
+                'manifest_file' : ft.FilePicker(
+                    on_result= lambda e: self.on_manifest_file_selected(e, page, output_overlay)
+                    ),
                 }
 
 
@@ -173,17 +231,39 @@ class PS280EditorUI:
                 defaultoption= sorted(self.backend.firmware_versions)[0],
                 callback= lambda _: self.on_set_firmware_version(page)
                 ),
+            'device' : LabeledDropdown(
+                page= page,
+                labeltext= "Device",
+                options= [ft.dropdown.Option(port) for port in [DEFAULT_SESSION, *self.backend.device_ports()]],
+                defaultoption= DEFAULT_SESSION,
+                callback= lambda e: self.on_select_device(page, e.control.value)
+                ),
             'template' : LabeledDropdown(
                 page= page,
                 labeltext= "Configuration Template",
-                options= [ft.dropdown.Option(tpl) for tpl in self.backend.templates],
-                defaultoption= sorted(self.backend.templates)[-1],
-                callback= self.backend.set_template
+                options= [self.template_option(tpl) for tpl in self.backend.templates],
+                defaultoption= self.backend.templates[-1],
+                callback= lambda e: self.on_template_selected(e.control.value)
                 ),
             }
 
 
 
+        self.checkboxes = {
+            'skip_current_firmware': ft.Checkbox(
+                label="Skip if running",
+                value=self.backend.skip_current_firmware,
+                on_change=lambda e: setattr(self.backend, 'skip_current_firmware', e.control.value),
+                col={"xs": 6, "sm": 6, "md": 6, "lg": 6, "xl": 6},
+                ),
+            'verify_current_firmware': ft.Checkbox(
+                label="Verify by hash",
+                value=self.backend.verify_current_firmware,
+                on_change=lambda e: setattr(self.backend, 'verify_current_firmware', e.control.value),
+                col={"xs": 6, "sm": 6, "md": 6, "lg": 6, "xl": 6},
+                ),
+            }
+
                        # height=20,
                       #  )
         self.forms= {
@@ -211,12 +291,18 @@ class PS280EditorUI:
                 controls=
                     [       
                          self.dropdowns['firmware'],
-                        
+                        ft.ResponsiveRow(
+                            [
+                                self.checkboxes['skip_current_firmware'],
+                                self.checkboxes['verify_current_firmware'],
+                            ],
+                         ),
                         ft.ResponsiveRow(
                             [
                                 self.buttons['connect'],               
                                 self.buttons['erase_firmware'],
-                                self.buttons['flash_firmware']
+                                self.buttons['flash_firmware'],
+                                self.buttons['provision_firmware']
                             ],
                             alignment= ft.MainAxisAlignment.END
                          ),
@@ -234,7 +320,7 @@ class PS280EditorUI:
                             #alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                         ),
                     ],
-                height=360,
+                height=400,
             ),
            'database': LabeledContainer(
                 page= page,
@@ -252,6 +338,9 @@ class PS280EditorUI:
                     self.dropdowns['template'],
                     ft.ResponsiveRow(
                             [
+                                self.buttons['drift'],
+                                self.buttons['lint'],
+                                self.buttons['apply_template_all'],
                                 self.buttons['set_from_template'],                
                             ],
                             alignment= ft.MainAxisAlignment.END
@@ -259,16 +348,20 @@ class PS280EditorUI:
                             #alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                         ),
                     self.texts['path_as_topic'],
+                    self.textfields['find_record'],
                     ft.ResponsiveRow(
                         controls= 
                             [
                                 self.buttons['set_path_to_topic'],
                                  self.buttons['load'],                
+                                self.buttons['import_manifest'],
+                                self.buttons['export'],
                                 self.buttons['save'],
                             ],
                         alignment= ft.MainAxisAlignment.END
                     ),    
                      Label(page, "Configuration PS-280"),
+                        self.dropdowns['device'],
                         ft.ResponsiveRow(
                             [
                                 self.buttons['connect'],                
@@ -281,7 +374,7 @@ class PS280EditorUI:
                         ),
 
                     ],
-               height=360,
+               height=400,
             ),
        }
 
@@ -325,14 +418,16 @@ class PS280EditorUI:
         """Dynamically creates and updates the form container with expandable panels."""
         self.forms['form'].controls.clear()
 
-        def create_row(key, value, section=None):
+        def create_row(parameter):
             return ft.Row([
-                ft.Text(key, 
+                ft.Text(parameter.name, 
                         width=150,
                         height=20,
-                        size=12),
+                        size=12,
+                        italic=parameter.ignored,
+                        tooltip=parameter.description or None),
                 ft.TextField(
-                    value=str(value),
+                    value=str(parameter.value),
                     expand=True,
                     label= "",
                     border_width=0,
@@ -340,24 +435,23 @@ class PS280EditorUI:
                     content_padding=ft.Padding(10, 5, 10, 5),
                     bgcolor= page.theme.color_scheme.secondary,
                     height=20,
-                    on_change=lambda e: self.backend.update_toml_data(section, key, e.control.value),
+                    read_only=parameter.readonly,
+                    on_change=lambda e: self.on_parameter_changed(parameter.group, parameter.name, e.control.value),
                 ),
             ])
 
+        table = self.backend.toml_data
         panels = []
-        for section, values in self.backend.toml_data.items():
-            if isinstance(values, dict):  # Nested section
-                rows = [create_row(key, value, section) for key, value in values.items()]
-                panels.append(
-                    ft.ExpansionPanel(
-                        header=ft.Text(f"[{section}]"),
-                        content=ft.Column(controls=rows),
-                        expanded=False,
-                        height=20
-                    )
+        for section in table:
+            rows = [create_row(parameter) for parameter in table.parameters(section)]
+            panels.append(
+                ft.ExpansionPanel(
+                    header=ft.Text(f"[{section}]"),
+                    content=ft.Column(controls=rows),
+                    expanded=False,
+                    height=20
                 )
-            else:  # Top-level key-value pairs
-                self.forms['form'].controls.append(create_row(section, values))
+            )
 
         if panels:
             self.forms['form'].controls.append(ft.ExpansionPanelList(controls=panels))
@@ -365,11 +459,55 @@ class PS280EditorUI:
         self.forms['form'].update()
 
 
+    def sync_dropdown_options(self, name, available):
+        """Adds new and removes vanished options of a dropdown, keeping the others and the selection if possible."""
+        dropdown = self.dropdowns[name].dropdown
+        available = set(available)
+        current = {option.key for option in dropdown.options}
+        if current == available:
+            return False
+        dropdown.options = ([option for option in dropdown.options if option.key in available]
+                            + [ft.dropdown.Option(key) for key in sorted(available - current)])
+        if dropdown.value not in available:
+            dropdown.value = sorted(available)[0] if available else None
+        return True
+
+    def template_option(self, name, problems=None):
+        """Creates a template dropdown option, marked with the number of problems with the selected firmware."""
+        return ft.dropdown.Option(key=name, text=f"{name}  ⚠ {len(problems)}" if problems else name)
+
+    def refresh_template_options(self):
+        """Lists the templates with their compatibility with the selected firmware."""
+        compatibility = self.backend.template_compatibility()
+        dropdown = self.dropdowns['template'].dropdown
+        dropdown.options = [self.template_option(name, compatibility.get(name)) for name in self.backend.templates]
+        if dropdown.value not in self.backend.templates:
+            dropdown.value = self.backend.templates[-1] if self.backend.templates else None
+
+    def on_files_changed(self, page, names, reloaded):
+        """Updates dropdowns and the open record after files changed on disk."""
+        if 'firmware' in names:
+            self.sync_dropdown_options('firmware', self.backend.firmware_versions)
+        if 'templates' in names:
+            self.refresh_template_options()
+        if reloaded:
+            self.textfields['serial'].value= self.backend.serial_number
+            self.textfields['mqtt_broker'].value= self.backend.mqtt_broker_ip
+            self.update_ui(page)
+            self.show_snackbar(page, "The configuration was changed on disk and has been reloaded")
+        else:
+            page.update()
+
+    def start_watching(self, page):
+        """Watches database, templates and firmware of the backend for changes on disk."""
+        self.backend.start_watching(lambda names, reloaded: self.on_files_changed(page, names, reloaded))
+
     def sync_firmware_dropdown(self, page):
         active_fw= [tpl for tpl in self.backend.firmware_versions if  self.backend.firmware_version.startswith(tpl)]
         if active_fw:
             self.dropdowns['firmware'].value = active_fw[0]
         
+    @in_session
     def on_write_settings(self, page, output_overlay):
         
         if output_overlay.run_function_with_realtime_output(self.backend.write_configuration):
@@ -379,6 +517,7 @@ class PS280EditorUI:
 
         
         
+    @in_session
     def on_set_from_template(self, page, output_overlay):
         if output_overlay.run_function_with_realtime_output(lambda : self.backend.update_configuration_from_template(self.dropdowns['template'].value)):
             self.show_snackbar(page, f"Updated configuration from template {self.dropdowns['template'].value}!")
@@ -388,15 +527,43 @@ class PS280EditorUI:
         #self.render_form()
 
 
+    def on_apply_template_all(self, page, output_overlay):
+        """Applies the selected template to all records matching the search text."""
+        template = self.dropdowns['template'].value
+        text = self.textfields['find_record'].value
+        if output_overlay.run_function_with_realtime_output(lambda : self.backend.apply_template_to_records(template, text=text)[0]):
+            self.show_snackbar(page, f"Applied template {template} to {'records matching ' + repr(text) if text else 'all records'}!")
+        else:
+            self.show_snackbar(page, f"Could not apply template {template} to all records!")
+        self.update_ui(page)
+
+    @in_session
     def on_set_configuration_topics(self, page):
             success, message = self.backend.set_configuration_topics(self.textfields['topic'].value)
+            self.textfields['topic'].hint = ""
             self.update_ui(page)
             if success:
                 #self.render_form()  # Render the form based on the loaded TOML data
                 self.show_snackbar(page, message)
             else:
-                self.show_snackbar(page, f"Set topics in configuration to {self.dropdowns['template'].value}")
+                self.show_snackbar(page, message)
+
+    def on_topic_changed(self, page):
+        """Shows used topics completing the input, or the records already using it with free alternatives."""
+        topic = self.textfields['topic'].value
+        hint = ""
+        if topic:
+            collisions = self.backend.topic_collisions(topic)
+            if collisions:
+                hint = f"Used by {len(collisions)} other record(s), free: {', '.join(self.backend.suggest_topics(topic))}"
+            else:
+                completions = [t for t in self.backend.complete_topic(topic, 6) if t != topic][:5]
+                if completions:
+                    hint = "Used: " + " | ".join(completions)
+        self.textfields['topic'].hint = hint
+        self.textfields['topic'].update()
 
+    @in_session
     def on_set_configuration_serial(self, page):
             success, message = self.backend.set_configuration_serial(self.textfields['serial'].value)
             self.update_ui(page)
@@ -414,6 +581,7 @@ class PS280EditorUI:
                 self.show_snackbar(page, f"Set MQTT Client ID in configuration to {self.textfields['serial'].value}")
                 
 
+    @in_session
     def on_set_configuration_mqtt_broker(self, page):
             success, message = self.backend.set_configuration_mqtt_broker_ip(self.textfields['mqtt_broker'].value)
             self.update_ui(page)
@@ -423,6 +591,7 @@ class PS280EditorUI:
             else:
                 self.show_snackbar(page, f"Set MQTT broker in configuration to {self.textfields['mqtt_broker'].value}")
     #Erase Firmware
+    @in_session
     def on_firmware_erase(self, page, output_overlay):
         
         if output_overlay.run_function_with_realtime_output(self.backend.firmware_erase):
@@ -431,6 +600,7 @@ class PS280EditorUI:
             self.show_snackbar(page, "Error on erasing firmware from PS-280!") 
 
     #Erase Firmware
+    @in_session
     def on_firmware_update(self, page, output_overlay):
         
         if output_overlay.run_function_with_realtime_output(self.backend.firmware_flash):
@@ -438,16 +608,47 @@ class PS280EditorUI:
         else:
             self.show_snackbar(page, f"Error on updating firmware fto {self.dropdowns['firmware'].value}!")
  
+    #Erase, flash and verify in one bootloader session
+    @in_session
+    def on_firmware_provision(self, page, output_overlay):
+        
+        if output_overlay.run_function_with_realtime_output(self.backend.firmware_provision):
+            self.show_snackbar(page, f"Successfully installed firmware {self.dropdowns['firmware'].value}!")
+        else:
+            self.show_snackbar(page, f"Error on installing firmware {self.dropdowns['firmware'].value}!")
+ 
     #Connect    
+    @in_session
     def on_connect(self, page, output_overlay):
         
+        if self.sync_dropdown_options('device', [DEFAULT_SESSION, *self.backend.device_ports()]):
+            self.on_select_device(page, self.dropdowns['device'].dropdown.value)
         if output_overlay.run_function_with_realtime_output(self.backend.connect):
             self.show_snackbar(page, "Successfully connected to PS-280!")
         else:
             self.show_snackbar(page, "No connection to PS-280!")
             
          
+    @in_session
+    def on_select_device(self, page, port):
+        """Switches the editor to the session of another device, keeping the record, edits, firmware and template of each."""
+        self.backend.select_session(None if port == DEFAULT_SESSION else port)
+        self.textfields['serial'].value= self.backend.serial_number
+        self.textfields['mqtt_broker'].value= self.backend.mqtt_broker_ip
+        section,key= self.backend.topic_upload.split('.')
+        if self.backend.toml_data.has_parameter(section, key):
+            self.textfields['topic'].value= self.backend.toml_data[section][key]
+        else:
+            self.textfields['topic'].value= self.backend.path_as_topic
+        if self.backend.firmware['version']:
+            self.dropdowns['firmware'].value= self.backend.firmware['version']
+        self.refresh_template_options()
+        if self.backend.template in self.backend.templates:
+            self.dropdowns['template'].value= self.backend.template
+        self.update_ui(page)
+
     #read settings from device
+    @in_session
     def on_read_settings(self, page, output_overlay):
         
         if output_overlay.run_function_with_realtime_output(self.backend.read_settings):
@@ -461,9 +662,12 @@ class PS280EditorUI:
         else:
             self.show_snackbar(page, "Error reading settings from PS-280d!")
 
+    @in_session
     def on_set_firmware_version(self, page):
         
-        if self.backend.set_firmware_version(self.dropdowns['firmware'].value):
+        result = self.backend.set_firmware_version(self.dropdowns['firmware'].value)
+        self.refresh_template_options()
+        if result:
             self.update_ui(page)
             #self.render_form()
             self.show_snackbar(page, "Settings successfully read from PS-280!")
@@ -474,6 +678,22 @@ class PS280EditorUI:
     def on_file_folderselect(e, page):
         pass
     #load settings from file
+    def on_export_file_selected(self, result, page):
+        """Exports the records matching the search text into the selected file."""
+        if result.path:
+            success, message = self.backend.export_records(result.path, text=self.textfields['find_record'].value)
+            self.show_snackbar(page, message)
+
+    def on_manifest_file_selected(self, result, page, output_overlay):
+        """Creates the records of all devices in the selected CSV manifest."""
+        if result.files:
+            manifest = result.files[0].path
+            if output_overlay.run_function_with_realtime_output(lambda : self.backend.import_manifest(manifest, self.dropdowns['template'].value)[0]):
+                self.show_snackbar(page, f"Created the records of manifest {os.path.basename(manifest)}!")
+            else:
+                self.show_snackbar(page, f"Could not create all records of manifest {os.path.basename(manifest)}!")
+
+    @in_session
     def on_config_file_selected(self, result, page):
         """Handles file selection and updates the UI."""
         if result.files:
@@ -488,19 +708,59 @@ class PS280EditorUI:
             self.show_snackbar(page, message)
 
 
+    @in_session
+    def on_find_record(self, page):
+        """Loads the first record matching the search text."""
+        text = self.textfields['find_record'].value
+        if not text:
+            return
+        records = self.backend.search_records(text)
+        if not records:
+            self.show_snackbar(page, f"No record found for '{text}'")
+            return
+        success, message = self.backend.load_toml_file(records[0]['path'])
+        self.textfields['topic'].value= self.backend.path_as_topic
+        self.textfields['serial'].value= self.backend.serial_number
+        self.textfields['mqtt_broker'].value= self.backend.mqtt_broker_ip
+        self.sync_firmware_dropdown(page)
+        self.update_ui(page)
+        if len(records) > 1:
+            message = f"{message} ({len(records)} records match '{text}', showing the first)"
+        self.show_snackbar(page, message)
+
     def on_database_root_selected(self, result, page):
         """Handles directory selection and updates the UI."""
         if result.path:
             self.backend.database_root = result.path
+            self.start_watching(page)
             self.update_ui(page)
             self.show_snackbar(page, "Database root set successfully!")
 
                 
+    @in_session
+    def on_parameter_changed(self, group, name, value):
+        """Takes an edited parameter value into the configuration."""
+        self.backend.update_toml_data(group, name, value)
+
+    @in_session
+    def on_template_selected(self, template):
+        """Selects the template of the current device."""
+        self.backend.set_template(template)
+
+    @in_session
     def on_save_file(self, page):
         """Handles saving the TOML file."""
         success, message = self.backend.save_toml_file()
         self.show_snackbar(page, message)
 
+    def on_record_saved(self, page, path, error):
+        """Reports a held back save once it was written or failed."""
+        if error is None:
+            self.show_snackbar(page, f"File saved successfully! ({os.path.basename(os.path.dirname(path))})")
+        else:
+            self.show_snackbar(page, f"Error saving file, retrying: {error}")
+
+    @in_session
     def on_set_file_path_to_topic(self, page):
         """Handles saving the TOML file."""
         message = self.backend.set_file_path_to_topic()
@@ -540,12 +800,19 @@ class PS280EditorUI:
         
         page.overlay.append(self.selectors['database_root'])
         page.overlay.append(self.selectors['config_file'])
+        page.overlay.append(self.selectors['export_file'])
+        page.overlay.append(self.selectors['manifest_file'])
         
         # Add components to the page
         page.add(self.pagecomponents['header'])
         page.add(self.pagecomponents['forms'])
         #page.add(self.widgets['configuration_form'])
         self.backend.set_firmware_version(self.dropdowns['firmware'].value)
+        self.refresh_template_options()
+        self.backend.set_template(self.dropdowns['template'].value)
+        page.update()
+        self.backend.on_record_saved = lambda path, error: self.on_record_saved(page, path, error)
+        self.start_watching(page)
         #output_overlay.overlay_layout.visible = True
         
         
@@ -0,0 +1,215 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module checks PS-280 configuration records for values a device would reject or that do not
+fit the database, so problems are found before any device is touched:
+    - values of the wrong type compared to a reference, e.g. the selected template
+    - parameters unknown to a firmware and values outside its limits or allowed values
+    - malformed or unknown LTE bands in MODEM.BANDS_*
+    - lower thresholds above their upper counterpart, e.g. THRESH.AHT_TEM_LO > THRESH.AHT_TEM_HI
+    - upload topics not matching the record path, download topics not derived from the upload topic
+    - upload topics used by more than one record
+Records are checked in worker processes.
+
+Dependencies:
+    - os: File system operations and CPU count
+    - re: Band lists
+    - collections: Group records by topic
+    - concurrent.futures: Worker processes
+    - ps280_toolbox: Parameter limits of a firmware
+"""
+
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from .ps280_toolbox import ParameterTable, IGNORE
+
+# Parameters holding LTE band lists like "[8,20]"
+BAND_PARAMETERS = ('MODEM.BANDS', 'MODEM.BANDS_LTE', 'MODEM.BANDS_NB')
+
+# 3GPP bands of LTE-M and NB-IoT
+KNOWN_BANDS = frozenset((1, 2, 3, 4, 5, 8, 11, 12, 13, 14, 17, 18, 19, 20, 21, 25, 26, 27, 28, 31, 41, 65, 66,
+                         70, 71, 72, 73, 74, 85, 86, 87, 88, 90, 103, 106, 107, 108))
+
+BAND_LIST = re.compile(r"^\[\s*(\d+\s*(,\s*\d+\s*)*)?\]$")
+
+
+def _compatible(value, reference):
+    if isinstance(reference, bool) or isinstance(value, bool):
+        return type(value) is type(reference)
+    if isinstance(reference, float):
+        return isinstance(value, (int, float))
+    return type(value) is type(reference)
+
+
+def check_bands(key, value, known=KNOWN_BANDS):
+    """
+    Check an LTE band list like "[8,20]".
+
+    Returns:
+        list: Problems.
+    """
+    if not BAND_LIST.match(str(value).strip()):
+        return [f"{key}: {value!r} is not a band list like [8,20]"]
+    bands = [int(band) for band in re.findall(r"\d+", str(value))]
+    problems = []
+    if len(set(bands)) != len(bands):
+        problems.append(f"{key}: {value!r} lists bands more than once")
+    unknown = sorted(set(bands) - known)
+    if unknown:
+        problems.append(f"{key}: unknown band(s) {', '.join(map(str, unknown))}")
+    return problems
+
+
+def lint_settings(settings, spec=None, reference=None, ignore=(), known_bands=KNOWN_BANDS):
+    """
+    Check the values of one configuration.
+
+    Args:
+        settings (Mapping): Configuration as {group: {parameter: value}}.
+        spec (dict, optional): Parameter specification of a firmware, limits are not checked without.
+        reference (Mapping, optional): Configuration whose value types are expected, e.g. a template.
+        ignore (list): 'GROUP.PARAMETER' entries not written to devices and not checked.
+        known_bands (set): Valid LTE band numbers.
+
+    Returns:
+        list: Problems.
+    """
+    problems = []
+    for group, parameters in settings.items():
+        if not hasattr(parameters, 'items'):
+            problems.append(f"{group}: value outside of a group")
+    table = ParameterTable(settings, ignore=ignore, spec=spec)
+    for parameter in table.parameters(exclude=IGNORE):
+        key, value = parameter.key, parameter.value
+        if isinstance(value, (dict, list)):
+            problems.append(f"{key}: nested {type(value).__name__} values can not be written to a device")
+            continue
+        expected = (reference or {}).get(parameter.group, {}).get(parameter.name)
+        if expected is not None and not _compatible(value, expected):
+            problems.append(f"{key}: {type(value).__name__} value {value!r}, expected {type(expected).__name__}")
+        if spec:
+            if key not in spec:
+                problems.append(f"{key}: unknown to the firmware")
+            elif (problem := parameter.validate()):
+                problems.append(problem)
+        if key in BAND_PARAMETERS:
+            problems.extend(check_bands(key, value, known_bands))
+        if parameter.name.endswith('_LO') and table.has_parameter(parameter.group, parameter.name[:-3] + '_HI'):
+            high = table.parameter(parameter.group, parameter.name[:-3] + '_HI')
+            try:
+                if float(value) > float(high.value):
+                    problems.append(f"{key}: {value} is above {high.key} {high.value}")
+            except (TypeError, ValueError):
+                pass
+    return problems
+
+
+def topic_of_path(path, database_root):
+    """
+    Return the topic a record path stands for, e.g. 'a/b' for '<root>/a.ps280/b.ps280/config.toml'.
+    """
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(database_root))
+    return "/".join(level[:-len(".ps280")] if level.endswith(".ps280") else level
+                    for level in relative.replace(os.sep, "/").split("/"))
+
+
+def lint_record(storage, path, spec=None, reference=None, ignore=(), database_root=None,
+                topic_upload="MQTT.TOPIC_UP", topic_download="MQTT.TOPIC_DOWN", known_bands=KNOWN_BANDS):
+    """
+    Check one stored record, see lint_settings.
+
+    Args:
+        database_root (str, optional): Root of the database, topics are compared with paths below it.
+        topic_upload (str): Parameter holding the upload topic.
+        topic_download (str): Parameter holding the download topic.
+
+    Returns:
+        dict: 'path', 'topic' (upload topic) and 'problems'.
+    """
+    result = {'path': path, 'topic': '', 'problems': []}
+    try:
+        settings = storage.load(path)
+    except Exception as e:
+        result['problems'].append(f"Could not load record: {e}")
+        return result
+    result['problems'] = lint_settings(settings, spec, reference, ignore, known_bands)
+    u_section, u_key = topic_upload.split(".")
+    d_section, d_key = topic_download.split(".")
+    topic = str(settings.get(u_section, {}).get(u_key, '')).strip()
+    result['topic'] = topic
+    if not topic:
+        result['problems'].append(f"{topic_upload}: no topic set")
+        return result
+    download = settings.get(d_section, {}).get(d_key)
+    if download is not None and download != f"{topic}/dl":
+        result['problems'].append(f"{topic_download}: {download!r} does not belong to {topic_upload} {topic!r}")
+    if database_root and topic_of_path(path, database_root) != topic.strip("/"):
+        result['problems'].append(f"{topic_upload}: {topic!r} does not match the record path "
+                                  f"{topic_of_path(path, database_root)!r}")
+    return result
+
+
+def lint_records(storage, paths, spec=None, reference=None, ignore=(), database_root=None,
+                 topic_upload="MQTT.TOPIC_UP", topic_download="MQTT.TOPIC_DOWN", known_bands=KNOWN_BANDS,
+                 workers=None):
+    """
+    Check many stored records in worker processes, see lint_record.
+
+    Records sharing an upload topic are reported as well.
+
+    Args:
+        workers (int, optional): Number of worker processes, the CPU count by default.
+
+    Returns:
+        dict: 'checked' number of records, 'records' with problems as returned by lint_record,
+            'problems' as (parameter, number of problems) most frequent first.
+    """
+    paths = list(paths)
+    arguments = (spec, reference, tuple(ignore), database_root, topic_upload, topic_download, known_bands)
+    workers = min(workers or os.cpu_count() or 1, len(paths) or 1)
+    if workers == 1:
+        results = [lint_record(storage, path, *arguments) for path in paths]
+    else:
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lint_record, [storage] * len(paths), paths,
+                                        *[[argument] * len(paths) for argument in arguments], chunksize=chunksize))
+    by_topic = defaultdict(list)
+    for result in results:
+        if result['topic']:
+            by_topic[result['topic'].strip("/")].append(result)
+    for topic, records in by_topic.items():
+        if len(records) > 1:
+            for result in records:
+                others = [other['path'] for other in records if other is not result]
+                result['problems'].append(f"{topic_upload}: {topic!r} is also used by {', '.join(others)}")
+    counts = defaultdict(int)
+    for result in results:
+        for problem in result['problems']:
+            counts[problem.split(":")[0]] += 1
+    return {'checked': len(results),
+            'records': [result for result in results if result['problems']],
+            'problems': sorted(counts.items(), key=lambda item: (-item[1], item[0]))}
+# -
@@ -0,0 +1,109 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module reads CSV manifests for creating many PS-280 configuration records at once.
+Every row names a device by serial number and MQTT topic, optionally with broker, client ID
+and the template its record starts from:
+
+    serial,topic,broker,template
+    PSENSE-402B78,udk.playground/UdK/GA/HA33/RX45/Wall,194.94.110.169,udk_defaults.toml
+
+Dependencies:
+    - csv: Parse the manifest
+"""
+
+import csv
+
+MANIFEST_REQUIRED = ('serial', 'topic')
+MANIFEST_OPTIONAL = ('broker', 'template', 'client_id')
+
+
+def read_manifest(filename):
+    """
+    Read and check a CSV manifest.
+
+    Column names are case-insensitive, empty lines are skipped.
+
+    Args:
+        filename (str): Path of the CSV file.
+
+    Returns:
+        list: One dict per device with the manifest columns and its 'line' number.
+
+    Raises:
+        ValueError: If required columns are missing, or serials or topics are empty or repeated.
+    """
+    with open(filename, "r", encoding="utf-8-sig", newline="") as file:
+        reader = csv.DictReader(file)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        missing = [name for name in MANIFEST_REQUIRED if name not in fields]
+        if missing:
+            raise ValueError(f"Manifest {filename} lacks the columns {', '.join(missing)}")
+        rows = []
+        for line, raw in enumerate(reader, start=2):
+            row = {name: (raw.get(fields[name]) or '').strip()
+                   for name in MANIFEST_REQUIRED + MANIFEST_OPTIONAL if name in fields}
+            if not any(row.values()):
+                continue
+            row['topic'] = row['topic'].strip('/')
+            for name in MANIFEST_REQUIRED:
+                if not row[name]:
+                    raise ValueError(f"Line {line}: empty {name}")
+            row['line'] = line
+            rows.append(row)
+    for name in MANIFEST_REQUIRED:
+        seen = {}
+        for row in rows:
+            if row[name] in seen:
+                raise ValueError(f"Line {row['line']}: {name} {row[name]} repeats line {seen[row[name]]}")
+            seen[row[name]] = row['line']
+    return rows
+
+
+def build_record(base, row, parameters):
+    """
+    Build the configuration record of a manifest row.
+
+    Args:
+        base (dict): Configuration the record starts from, not modified.
+        row (dict): Manifest row.
+        parameters (dict): 'GROUP.PARAMETER' of 'serial', 'topic_up', 'topic_down', 'broker'
+            and 'client_id'.
+
+    Returns:
+        dict: The new configuration record.
+    """
+    record = {section: dict(values) if hasattr(values, 'items') else values for section, values in base.items()}
+    values = {
+        'serial': row['serial'],
+        'topic_up': row['topic'],
+        'topic_down': f"{row['topic']}/dl",
+        'client_id': row.get('client_id') or row['serial'],
+    }
+    if row.get('broker'):
+        values['broker'] = row['broker']
+    for name, value in values.items():
+        section, key = parameters[name].split(".")
+        record.setdefault(section, {})[key] = value
+    return record
+# -
@@ -0,0 +1,440 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module rolls out firmware to deployed PS-280 sensors over the air.
+Firmware images are served by a local HTTP server with range-request support. Updates are
+triggered through the MQTT download topic of every device, at most a given number at a time,
+and the OTA results the devices publish on their upload topics are collected. The update of a
+device is only triggered once the broker acknowledged the subscription of its upload topic.
+Results retained by the broker and results published before the update was triggered belong
+to earlier rollouts and are ignored. Every rollout also passes its own request id to the devices
+in the image URL and drops results echoing another one. Only the emulated device echoes it so
+far, results of real firmware carry no request id and are matched by their topic and time alone.
+An emulated device allows testing a rollout against a local broker without hardware.
+
+Dependencies:
+    - os: File system operations
+    - re: Parse OTA results
+    - time: Timeouts and durations
+    - socket: Determine the local address
+    - threading: Server thread and result events
+    - uuid: Rollout request ids
+    - urllib: Download in the emulated device
+    - http.server: Firmware HTTP server
+    - concurrent.futures: Controlled rollout concurrency
+    - paho.mqtt (paho-mqtt, optional): MQTT client
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import uuid
+import threading
+import urllib.request
+from urllib.parse import quote, urlsplit, parse_qs
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+# Commands published on the download topic of a device, {url} is replaced by the image URL
+OTA_COMMANDS = ["settings set OTA URL {url}", "settings set OTA UPDATE 1"]
+
+# Pattern of the OTA result a device publishes on its upload topic
+OTA_RESULT_PATTERN = r"OTA[ ._]RESULT\D*?(-?\d+)"
+
+# Pattern of the rollout request id echoed with a result
+OTA_REQUEST_PATTERN = re.compile(r"request[=: ](\w+)")
+
+# Seconds to wait for the broker to acknowledge the subscription of an upload topic
+SUBSCRIBE_TIMEOUT = 30
+
+
+def mqtt_client(client_id=""):
+    """
+    Create a paho MQTT client for paho-mqtt 1.x and 2.x.
+
+    Raises:
+        ImportError: If paho-mqtt is not installed.
+    """
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError as e:
+        raise ImportError("OTA rollouts require the 'paho-mqtt' package") from e
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+    return mqtt.Client(client_id=client_id)
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler answering 'Range: bytes=start-end' requests with partial content.
+    """
+
+    def send_head(self):
+        self.range_remaining = None
+        range_header = self.headers.get('Range')
+        path = self.translate_path(self.path)
+        if not range_header or not os.path.isfile(path):
+            return super().send_head()
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+        size = os.path.getsize(path)
+        if not match or not any(match.groups()):
+            return super().send_head()
+        start, end = match.groups()
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            start = max(size - int(end), 0)
+            end = size - 1
+        if start > end or start >= size:
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{size}")
+            self.end_headers()
+            return None
+        file = open(path, 'rb')
+        file.seek(start)
+        self.range_remaining = end - start + 1
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.send_header('Content-Length', str(self.range_remaining))
+        self.end_headers()
+        return file
+
+    def copyfile(self, source, outputfile):
+        remaining = self.range_remaining
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+    def end_headers(self):
+        self.send_header('Accept-Ranges', 'bytes')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        print(f"OTA server: {self.address_string()} {format % args}")
+
+
+class FirmwareServer:
+    """
+    Local HTTP server publishing the firmware directory to the devices.
+    """
+
+    def __init__(self, firmware_dir, host='', port=8280):
+        """
+        Initialize the server.
+
+        Args:
+            firmware_dir (str): Directory containing the firmware versions.
+            host (str): Address the devices reach this machine by, the local address if empty.
+            port (int): TCP port of the server, 0 picks a free port.
+        """
+        self.firmware_dir = os.path.abspath(firmware_dir)
+        self.host = host or local_address()
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        handler = partial(RangeRequestHandler, directory=self.firmware_dir)
+        self.httpd = ThreadingHTTPServer(('', self.port), handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"OTA server running on http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def url_for(self, version, filename):
+        """
+        Return the URL of a firmware image.
+        """
+        return f"http://{self.host}:{self.port}/{quote(version)}/{quote(filename)}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def local_address():
+    """
+    Return the address of the interface used for outgoing connections.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.connect(('192.0.2.1', 9))
+            return sock.getsockname()[0]
+        except OSError:
+            return '127.0.0.1'
+
+
+class OTARollout:
+    """
+    Trigger OTA updates on many devices connected to one MQTT broker and collect their results.
+    """
+
+    def __init__(self, broker, port=1883, username='', password='', concurrency=4, timeout=900,
+                 commands=OTA_COMMANDS, result_pattern=OTA_RESULT_PATTERN):
+        """
+        Initialize the rollout.
+
+        Args:
+            broker (str): Address of the MQTT broker.
+            port (int): Port of the MQTT broker.
+            username (str): MQTT user name.
+            password (str): MQTT password.
+            concurrency (int): Number of devices updating at the same time.
+            timeout (float): Seconds to wait for the OTA result of a device.
+            commands (list): Messages published on the download topic, {url} is replaced.
+            result_pattern (str): Regular expression capturing the OTA result.
+        """
+        self.broker = broker
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.commands = commands
+        self.result_pattern = re.compile(result_pattern)
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Message ids of the subscriptions acknowledged by the broker
+        self.subscribed = threading.Condition()
+        self.acknowledged = set()
+        self.client = None
+        self.request_id = uuid.uuid4().hex[:12]
+
+    def on_subscribe(self, client, userdata, mid, *args):
+        with self.subscribed:
+            self.acknowledged.add(mid)
+            self.subscribed.notify_all()
+
+    def subscribe(self, topics):
+        """
+        Subscribe to topics and wait until the broker acknowledged the subscription.
+
+        Returns:
+            bool: True if the subscription is active.
+        """
+        result, mid = self.client.subscribe(topics)
+        if result != 0:
+            return False
+        with self.subscribed:
+            acknowledged = self.subscribed.wait_for(lambda: mid in self.acknowledged, SUBSCRIBE_TIMEOUT)
+            self.acknowledged.discard(mid)
+        return acknowledged
+
+    def on_message(self, client, userdata, message):
+        if message.retain:
+            # Kept by the broker from an earlier rollout
+            return
+        payload = message.payload.decode('utf-8', errors='ignore')
+        match = self.result_pattern.search(payload)
+        if not match:
+            return
+        request = OTA_REQUEST_PATTERN.search(payload)
+        if request and request.group(1) != self.request_id:
+            return
+        with self.lock:
+            for topic, waiter in self.pending.items():
+                if waiter['armed'] and (message.topic == topic or message.topic.startswith(f"{topic}/")):
+                    waiter['result'] = match.group(1)
+                    waiter['event'].set()
+
+    def connect(self):
+        self.client = mqtt_client()
+        if self.username:
+            self.client.username_pw_set(self.username, self.password)
+        self.client.on_message = self.on_message
+        self.client.on_subscribe = self.on_subscribe
+        self.client.connect(self.broker, self.port)
+        self.client.loop_start()
+
+    def disconnect(self):
+        if self.client:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self.client = None
+
+    def request_url(self, url):
+        """
+        Return the image URL carrying the request id of the rollout.
+        """
+        return f"{url}{'&' if '?' in url else '?'}request={self.request_id}"
+
+    def update_device(self, device, url):
+        """
+        Trigger the update of one device and wait for its result.
+
+        Args:
+            device (dict): Device with 'serial', 'topic_up' and 'topic_down'.
+            url (str): URL of the firmware image.
+
+        Returns:
+            dict: Result record of the device.
+        """
+        waiter = {'event': threading.Event(), 'result': None, 'armed': False}
+        with self.lock:
+            self.pending[device['topic_up']] = waiter
+        start = time.time()
+        # A result published before the subscription is active would be missed
+        subscribed = self.subscribe([(device['topic_up'], 1), (f"{device['topic_up']}/#", 1)])
+        reported = False
+        if subscribed:
+            url = self.request_url(url)
+            with self.lock:
+                # Results published before the update is triggered are not the ones of this rollout
+                waiter['armed'] = True
+            for command in self.commands:
+                self.client.publish(device['topic_down'], command.format(url=url), qos=1)
+            reported = waiter['event'].wait(self.timeout)
+        self.client.unsubscribe([device['topic_up'], f"{device['topic_up']}/#"])
+        with self.lock:
+            self.pending.pop(device['topic_up'], None)
+        record = {
+            'serial': device['serial'],
+            'topic': device['topic_up'],
+            'request': self.request_id,
+            'status': 'reported' if reported else 'timeout' if subscribed else 'not subscribed',
+            'result': waiter['result'],
+            'seconds': round(time.time() - start, 1),
+        }
+        print(f"{record['serial']}: OTA {record['status']} result={record['result']} after {record['seconds']} s")
+        return record
+
+    def run(self, devices, url):
+        """
+        Roll out a firmware image to a list of devices.
+
+        Args:
+            devices (list): Devices with 'serial', 'topic_up' and 'topic_down'.
+            url (str): URL of the firmware image.
+
+        Returns:
+            list: Result record per device.
+        """
+        print(f"OTA rollout request {self.request_id}")
+        self.connect()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                return list(executor.map(lambda device: self.update_device(device, url), devices))
+        finally:
+            self.disconnect()
+
+
+class EmulatedDevice:
+    """
+    Emulated PS-280 answering OTA commands for rollout tests against a local broker.
+
+    The device downloads the announced image in range requests and publishes
+    'OTA.RESULT 1' on success and 'OTA.RESULT -1' on failure, followed by the request id
+    found in the image URL.
+    """
+
+    def __init__(self, broker, topic, port=1883, serial='PS280-EMULATED', chunk_size=16384):
+        """
+        Initialize the emulated device.
+
+        Args:
+            broker (str): Address of the MQTT broker.
+            topic (str): Upload topic of the device, the download topic is '<topic>/dl'.
+            port (int): Port of the MQTT broker.
+            serial (str): Serial number of the device.
+            chunk_size (int): Size of each range request.
+        """
+        self.broker = broker
+        self.port = int(port)
+        self.topic_up = topic
+        self.topic_down = f"{topic}/dl"
+        self.serial = serial
+        self.chunk_size = chunk_size
+        self.settings = {'OTA': {'URL': '', 'UPDATE': '0', 'RESULT': '0'}}
+        self.downloaded = 0
+        self.client = None
+
+    def start(self):
+        self.client = mqtt_client(self.serial)
+        self.client.on_message = self.on_message
+        self.client.connect(self.broker, self.port)
+        self.client.subscribe(self.topic_down, 1)
+        self.client.loop_start()
+        return self
+
+    def stop(self):
+        if self.client:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self.client = None
+
+    def on_message(self, client, userdata, message):
+        command = message.payload.decode('utf-8', errors='ignore').split()
+        if len(command) == 5 and command[:2] == ['settings', 'set']:
+            self.settings.setdefault(command[2], {})[command[3]] = command[4]
+            if command[2:4] == ['OTA', 'UPDATE'] and command[4] == '1':
+                threading.Thread(target=self.update, daemon=True).start()
+
+    def update(self):
+        """
+        Download the firmware image in range requests and report the result.
+        """
+        result = '1'
+        self.downloaded = 0
+        try:
+            while True:
+                request = urllib.request.Request(
+                    self.settings['OTA']['URL'],
+                    headers={'Range': f"bytes={self.downloaded}-{self.downloaded + self.chunk_size - 1}"})
+                with urllib.request.urlopen(request) as response:
+                    total = int(response.headers['Content-Range'].split('/')[-1])
+                    self.downloaded += len(response.read())
+                if self.downloaded >= total:
+                    break
+        except Exception as e:
+            print(f"{self.serial}: OTA download failed: {e}", file=sys.stderr)
+            result = '-1'
+        self.settings['OTA']['RESULT'] = result
+        request = parse_qs(urlsplit(self.settings['OTA']['URL']).query).get('request', [''])[0]
+        self.client.publish(self.topic_up, f"OTA.RESULT {result} request={request}" if request else f"OTA.RESULT {result}",
+                            qos=1)
+# -
@@ -102,13 +102,16 @@
 
 # +
 import sys, serial, time, json, logging, warnings, toml, copy
-from contextlib import redirect_stdout
+import serial.tools.list_ports
 #from benedict import benedict
-import esptool, time, os, io
-import subprocess
-import select
+# esptool takes long to load, it is imported on first use
+import time, os, io
+import contextlib
+import threading
 import glob
 import re
+from .baudrates import FlashBaudRates, is_baud_error
+from .parameters import ParameterTable
 
 # Clear any default root logger handlers
 for handler in logging.root.handlers[:]:
@@ -177,10 +180,148 @@ def clean_vt100(data):
 
     return data.strip()
 
+
+# USB serial bridges found on ESP boards, by USB vendor and product ID
+ESP_VIDS = {
+    "1A86:7523": "CH340",
+    "10C4:EA60": "Silabs CP2102N",
+    "0403:6001": "FT232",
+    "067B:2303": "PL2303",
+    "303A:1001": "Espressif USB JTAG/serial debug unit",
+}
+
+
+def esp_ports():
+    """
+    List the serial ports with a USB bridge used by ESP boards, without talking to them.
+
+    Returns:
+        dict: {port: bridge}
+    """
+    ports = {}
+    for port in serial.tools.list_ports.comports():
+        for vid, bridge in ESP_VIDS.items():
+            if vid in port.hwid:
+                ports[port.device] = bridge
+                break
+    return ports
+
+
+def parse_esptool_identity(lines):
+    """
+    Extract the chip identity from the lines esptool prints after connecting.
+    """
+    fields = {'Chip is ': 'chip', 'Features: ': 'features', 'Crystal is ': 'crystal',
+              'MAC: ': 'mac', 'Detected flash size: ': 'flash_size',
+              'Auto-detected Flash size: ': 'flash_size'}
+    identity = {}
+    for line in lines:
+        for prefix, key in fields.items():
+            if line.startswith(prefix):
+                identity[key] = line[len(prefix):].strip()
+    return identity
+
+
+class EsptoolError(Exception):
+    """
+    An esptool run that failed, with the lines it printed.
+    """
+
+    def __init__(self, message, lines=()):
+        super().__init__(message)
+        self.lines = list(lines)
+
+
+class ThreadOutput:
+    """
+    Stand-in for sys.stdout sending what is printed in a thread capturing esptool output to the
+    buffer of that thread and everything else to the original stream. Captured output of a thread
+    echoing it, e.g. the progress of a flash run, also goes to the original stream.
+    """
+    local = threading.local()
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def target(self):
+        buffer = getattr(self.local, 'buffer', None)
+        return self.stream if buffer is None else buffer
+
+    def write(self, text):
+        if getattr(self.local, 'buffer', None) is not None and getattr(self.local, 'echo', False):
+            self.stream.write(text)
+        return self.target().write(text)
+
+    def flush(self):
+        return self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+# Serializes esptool runs while sys.stdout is not a ThreadOutput
+esptool_output_lock = threading.Lock()
+
+
+def install_thread_output():
+    """
+    Replace sys.stdout by a ThreadOutput, so esptool can run in several threads at once.
+
+    Called once by applications running devices in parallel, before their threads start.
+    Without it esptool runs one at a time with sys.stdout redirected for the run.
+    """
+    if not isinstance(sys.stdout, ThreadOutput):
+        sys.stdout = ThreadOutput(sys.stdout)
+
+
+def esptool_output(*arguments, echo=False):
+    """
+    Run esptool in this process and return the lines it printed.
+
+    esptool is imported on first use. It runs in-process, as a frozen build has no interpreter to
+    start it as a child process. Its output goes to a buffer of the calling thread, so devices can
+    be identified from several threads while the console of the editor stays untouched. Runs are
+    only parallel once install_thread_output was called.
+
+    Args:
+        arguments: esptool arguments, e.g. '--port', port, 'read_mac'.
+        echo (bool): Also print the output while esptool runs.
+
+    Returns:
+        list: Output lines.
+
+    Raises:
+        EsptoolError: If esptool fails, with the lines printed up to the failure.
+    """
+    import esptool
+    buffer = io.StringIO()
+    ThreadOutput.local.buffer = buffer
+    ThreadOutput.local.echo = echo
+    try:
+        if isinstance(sys.stdout, ThreadOutput):
+            esptool.main(list(arguments))
+        else:
+            with esptool_output_lock, contextlib.redirect_stdout(ThreadOutput(sys.stdout)):
+                esptool.main(list(arguments))
+    except SystemExit as e:
+        if e.code:
+            raise EsptoolError(f"esptool {' '.join(arguments)} failed: exit code {e.code}",
+                               buffer.getvalue().split('\n')) from e
+    except Exception as e:
+        raise EsptoolError(f"esptool {' '.join(arguments)} failed: {e}",
+                           buffer.getvalue().split('\n') + [str(e)]) from e
+    finally:
+        ThreadOutput.local.buffer = None
+    return buffer.getvalue().split('\n')
+
     
 class PS280:
 
-    def __init__(self,port='', baudrate=115200, timeout=3, stdout= sys.stdout, stderr= sys.stderr):
+    # Seconds the running firmware version is waited for before the device counts as not running it
+    VERSION_TIMEOUT = 10
+
+    def __init__(self,port='', baudrate=115200, timeout=3, stdout= sys.stdout, stderr= sys.stderr, baudrates=None,
+                 exclude_ports=()):
         self.stdout= stdout
         self.stderr= stderr
         if port:
@@ -190,6 +331,12 @@ class PS280:
         self.baudrate= baudrate
         self.timeout= timeout
         self.connection= None
+        self.bridge= None
+        self.chip_info= {}
+        # Flash baud rates per port and bridge type
+        self.baudrates= baudrates if baudrates is not None else FlashBaudRates()
+        # Ports of devices in use by other connections, never probed
+        self.exclude_ports= set(exclude_ports)
         #self.check_serialport
         self.serial_reconnect()
     
@@ -219,10 +366,9 @@ class PS280:
         return False
     
     def check_chiptype(self):
-        with io.StringIO() as buf, redirect_stdout(buf):
-            esptool.main(['read_mac'])
-            output = buf.getvalue()
-        output= output.split('\n')
+        if self.chip_info.get('chip'):
+            return self.chip_info['chip']
+        output= esptool_output('read_mac')
         for n, sp in enumerate(output):
             print(n, sp )
             if sp.startswith('Detecting chip type'):
@@ -247,35 +393,29 @@ class PS280:
     def find_esp_port(self, retries=10):
         """
         Combines pySerial scanning and esptool detection to find ESP device.
+
+        If a port was given only that port is verified.
         """
-        esp_vids = {
-            "1A86:7523": "CH340",
-            "10C4:EA60": "CP210x",
-            "0403:6001": "FT232",
-            "067B:2303": "PL2303",
-            "303A:1001": "Espressif USB JTAG/serial debug unit",
-            "10C4:EA60": "Silabs CP2102N"
-        }
         logger.info("find_esp_port()")
+        requested = self.port
         startprogress("Trying to connect")
         while retries:
-            ports = serial.tools.list_ports.comports()
-            candidate_ports = []
-            #print(ports)
             # Step 1: Quick scan using pySerial
-            for port in ports:
-                #print(port.hwid, port.pid)
-                if any(vid in port.hwid for vid in esp_vids) :
-                    logger.info(f"Possible ESP device on port: {port.device}")
-                    candidate_ports.append(port.device)
+            bridges = esp_ports()
+            candidate_ports = [port for port in bridges
+                               if port not in self.exclude_ports and (not requested or port == requested)]
+            for port in candidate_ports:
+                logger.info(f"Possible ESP device on port: {port}")
         
             # Step 2: Validate with esptool
             for port in candidate_ports:
                 try:
                     logger.info(f"Verifying with esptool on port: {port}")
-                    esptool.main(["--port", port, "flash_id"])
-                    logger.info(f"ESP device confirmed on port: {port}")
+                    # The ROM loader answers the chip identification, no stub upload needed
+                    self.chip_info = parse_esptool_identity(esptool_output("--port", port, "--no-stub", "read_mac"))
+                    logger.info(f"ESP device confirmed on port: {port} ({self.chip_info.get('chip', 'unknown chip')})")
                     self.port=port
+                    self.bridge=bridges.get(port)
                     return True
                 except Exception:
                     logger.info(f"Port {port} did not respond as ESP.")
@@ -291,10 +431,7 @@ class PS280:
 
         
     def check_serialport(self):
-        with io.StringIO() as buf, redirect_stdout(buf):
-            esptool.main(['read_mac'])
-            output = buf.getvalue()
-        output= output.split('\n')
+        output= esptool_output('read_mac')
         for n, sp in enumerate(output):
             if sp.startswith('Detecting chip type'):
                 return(output[n-2].split(' ')[-1])
@@ -318,7 +455,8 @@ class PS280:
         Sends a command and reads the complete response.
         Args:
         command (str): The command to send.
-            starttoken (str): Optional token indicating the start of the response.
+            starttoken (str): Optional token indicating the start of the response, without it the
+                response starts after the echo of the command.
             endtoken (str): Optional token indicating the end of the response.
             timeout (int): Maximum time to wait for the complete response (seconds).
         Returns:
@@ -338,7 +476,7 @@ class PS280:
     
         start_time = time.time()
         response = []
-        start_found = False
+        start_found = not starttoken
     
         # Step 3: Read the response until end token or timeout
         while time.time() - start_time < timeout:
@@ -351,6 +489,9 @@ class PS280:
                 if errortoken and errortoken in data:
                     logger.error('Illegal value!')
                     return [errortoken]
+                if not starttoken and command in data:
+                    # Echo of the command
+                    continue
                 # Detect the start token if specified
                 if starttoken and starttoken in data:
                     start_found = True
@@ -383,13 +524,21 @@ class PS280:
         time.sleep(0.5)          
         for line in self.connection.readlines(-1):
             if '{"CORE":[' in line.decode('utf-8'):
-                settings = eval('{"CORE":['+line.decode('utf-8').split('{"CORE":[')[-1])
-        settings= eval({k:{p['name']:p['value'] for p in g} for k,g in settings.items()})
-        return (settings)
+                settings = json.loads('{"CORE":['+line.decode('utf-8').split('{"CORE":[')[-1])
+        settings= {k:{p['name']:p['value'] for p in g} for k,g in settings.items()}
+        return (ParameterTable(settings))
 
     def get(self,group,parameter):
         return(self.settings[group][parameter ])
 
+    @property
+    def version(self):
+        """
+        Firmware version reported by the running application, '' if the device does not answer
+        within VERSION_TIMEOUT seconds, e.g. when it is blank, erased or boot-looping.
+        """
+        return self.read_settings(timeout=self.VERSION_TIMEOUT).get('CORE', {}).get('VERSION', '')
+
     def set(self,group,parameter,value, superuser=False):
         group= group.upper()
         parameter= parameter.upper()
@@ -406,21 +555,27 @@ class PS280:
 
     def info(self,group,parameter):
         logger.info(f"Getting parameter info for '{group}.{parameter}'!")
-        self.connection.reset_input_buffer()
-        self.connection.reset_output_buffer()
-        self.connection.readlines(-1)
-        self.connection.write(f'settings info {group} {parameter}\r\n'.encode('utf_8'))
-        #logger.info('Waiting for Results...')
-        time.sleep(0.1)
-        #time.sleep(0.5)
-        
-        result= self.receive() #self.connection.readlines(-1)
-        return(result)   
+        # The response ends with the prompt of the shell
+        return self.send_command(f"settings info {group} {parameter}", endtoken='/ >')
 
     @property
     def settings(self):
-        
+        return self.read_settings()
+
+    def read_settings(self, timeout=None):
+        """
+        Read all settings, retrying until the device answers.
+
+        Args:
+            timeout (float, optional): Seconds to keep retrying, without limit if None.
+
+        Returns:
+            ParameterTable: The settings, empty if the device did not answer in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
         while not (response := self.send_command("settings", starttoken='Module', endtoken='/ >')):
+            if deadline is not None and time.monotonic() >= deadline:
+                return ParameterTable({})
             time.sleep(0.5)
         settings= {}
         for line in response[1:]:
@@ -432,7 +587,7 @@ class PS280:
                     settings[line[0]][line[1]] = line[-1]
                 elif len(line) > 1:
                     settings[line[0]][line[1]] =  ""
-        return(settings)
+        return(ParameterTable(settings))
         
 
     def info_dict(ps, group , parameter):
@@ -443,7 +598,7 @@ class PS280:
                   'minimumValue': '',
                   'maximumValue': '',
                   'allowedValues': ''}
-        if not [i for i in info if i.endswith('unknown setting\n')]:
+        if not [i for i in info if i.endswith('unknown setting')]:
             for i in info:
                 #print(i)
                 if i.startswith('Info:'):
@@ -460,6 +615,24 @@ class PS280:
                         infodict['allowedValues']=i[1].strip().strip('{}').split(',')
         return(infodict)
 
+    def parameter_spec(self, settings=None):
+        """
+        Query the specification of every parameter from the running firmware.
+
+        Args:
+            settings (Mapping, optional): Settings listing the parameters, read from the device if omitted.
+
+        Returns:
+            dict: {'GROUP.PARAMETER': {'shortDescription', 'minimumValue', 'maximumValue', 'allowedValues'}}
+        """
+        settings = settings if settings is not None else self.settings
+        spec = {}
+        for group, parameters in settings.items():
+            for parameter in parameters:
+                info = self.info_dict(group, parameter)
+                spec[f"{group}.{parameter}"] = {k: v for k, v in info.items() if k not in ('group', 'parameter')}
+        return spec
+
 
     def clear_buffers(self):
         self.connection.reset_input_buffer()
@@ -471,64 +644,121 @@ class PS280:
         self.clear_buffers()
         self.connection.write('reboot\r\n'.encode('utf_8'))
 
-    @staticmethod
-    def run_command_with_realtime_output(command):
-        # Set up environment to disable Python buffering (for Python subprocesses)
-        env = os.environ.copy()
-        if "python" in command[0].lower() or command[0] == sys.executable:
-            env["PYTHONUNBUFFERED"] = "1"
-        
-        # Start the subprocess with pipes for stdout and stderr
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env,
-            bufsize=1  # Line-buffered
-        )
-        
-        # Non-blocking read loop using select (works on Unix and Windows)
-        while True:
-
-            readable, _, _ = select.select([process.stdout, process.stderr], [], [])
-            stdout_line=''
-            # Check stdout
-            if process.stdout in readable:
-                stdout_line = process.stdout.readline()
-                if stdout_line:
-                    sys.stdout.write(stdout_line)
-        
-            # Check stderr
-            if process.stderr in readable:
-                stderr_line = process.stderr.readline()
-                if stderr_line:
-                    sys.stderr.write(stderr_line)
-        
-            # Exit the loop when the process is done and both streams are empty
-            if process.poll() is not None and not stdout_line and not stderr_line:
-                break
-        if process.returncode != 0:
-            raise Exception(f"esptool ould not finish commend execution {command}")
-        return process.returncode
+    def esptool_arguments(self, baud, *arguments):
+        """
+        Build the esptool arguments for this device and baud rate.
+        """
+        port = ["--port", self.port] if self.port else []
+        return [*port, "-b", str(baud), *arguments]
+
+    def run_esptool(self, *arguments, nbytes=0, output=None):
+        """
+        Run esptool with the fastest stable baud rate known for the port.
+
+        A run failing for a baud related reason is repeated with the next slower baud rate until
+        one works or none is left; other failures are raised at once.
+        The working baud rate and the throughput of the run are stored in the baud rate table.
 
-    @staticmethod
-    def firmware_erase():
+        Args:
+            arguments: esptool command and its arguments.
+            nbytes (int): Number of bytes written by the command, used for the throughput record.
+            output (list, optional): Collects the stdout lines of the successful run.
+
+        Returns:
+            bool: True, esptool finished successfully.
+
+        Raises:
+            EsptoolError: If esptool failed for another reason, or at every baud rate.
+        """
+        port = self.port or 'auto'
+        baud = self.baudrates.baud_for(port, self.bridge)
+        while baud:
+            logger.info(f"Running esptool {arguments[0]} on {port} at {baud} baud")
+            start = time.time()
+            try:
+                lines = esptool_output(*self.esptool_arguments(baud, *arguments), echo=True)
+            except EsptoolError as e:
+                printerror(f"esptool {arguments[0]} failed at {baud} baud: {e}")
+                if not is_baud_error(e.lines):
+                    # Missing device, image or the like, a slower baud rate would not help
+                    raise
+                baud = self.baudrates.report_failure(port, baud, self.bridge)
+                continue
+            seconds = time.time() - start
+            if output is not None:
+                output.extend(lines)
+            self.baudrates.report_success(port, baud, nbytes, seconds, self.bridge)
+            if nbytes:
+                logger.info(f"Flashed {nbytes} bytes in {seconds:.1f} s at {baud} baud ({nbytes / seconds / 1024:.1f} kB/s)")
+            return True
+        raise EsptoolError(f"esptool {arguments[0]} failed at every baud rate")
+
+    def firmware_erase(self):
         logger.info('Erasing flash... (This may take a while!)')
-        return not PS280.run_command_with_realtime_output([sys.executable, "-m", "esptool", "-b", "460800", "erase_flash"])
+        return self.run_esptool("erase_flash")
         
     
-    @staticmethod
-    def firmware_update(bootloader_file, partition_table_file,firmware_file):
+    def firmware_update(self, bootloader_file, partition_table_file,firmware_file):
         logger.info('Updating firmware')
-        return not PS280.run_command_with_realtime_output( 
-            [
-                sys.executable, "-m", "esptool", "-b", "460800", "write_flash",
+        nbytes = sum(os.path.getsize(f) for f in (bootloader_file, partition_table_file, firmware_file))
+        return self.run_esptool(
+                "write_flash",
                 "0x0000", bootloader_file,
                 "0x8000", partition_table_file,
-                "0x10000", firmware_file
-                ]
+                "0x10000", firmware_file,
+                nbytes=nbytes
             )
 
+    def firmware_verify(self, images):
+        """
+        Compare flash regions of the device with image files by their hash.
+
+        Args:
+            images (list): (offset, file) pairs to compare.
+
+        Returns:
+            bool: True if every region matches its image file.
+        """
+        logger.info('Verifying flash regions')
+        arguments = ["--after", "hard_reset", "verify_flash"]
+        for offset, filename in images:
+            arguments += [offset, filename]
+        baud = self.baudrates.baud_for(self.port or 'auto', self.bridge)
+        try:
+            output = esptool_output(*self.esptool_arguments(baud, *arguments), echo=True)
+        except EsptoolError:
+            return False
+        return sum(1 for line in output if 'verify OK' in line) >= len(images)
+
+    def firmware_provision(self, images, erase=False):
+        """
+        Identify, erase, write and verify the device in a single bootloader session.
+
+        esptool enters the ROM loader once, uploads the stub once, reports the chip identity,
+        erases the whole flash if requested, writes all images, verifies every region by its hash
+        and finally resets the chip into the application.
+
+        Args:
+            images (list): (offset, file) pairs to write, e.g. [("0x0000", "bootloader.bin")].
+            erase (bool): Erase the whole flash before writing.
+
+        Returns:
+            dict: Chip identity reported by esptool.
+        """
+        logger.info('Provisioning firmware in a single bootloader session')
+        arguments = ["--before", "default_reset", "--after", "hard_reset", "write_flash"]
+        if erase:
+            arguments.append("--erase-all")
+        for offset, filename in images:
+            arguments += [offset, filename]
+        nbytes = sum(os.path.getsize(filename) for _, filename in images)
+        output = []
+        self.run_esptool(*arguments, nbytes=nbytes, output=output)
+        verified = sum(1 for line in output if line.startswith('Hash of data verified'))
+        if verified < len(images):
+            raise Exception(f"Only {verified} of {len(images)} flash regions could be verified")
+        self.chip_info = parse_esptool_identity(output)
+        return self.chip_info
+
 # -
 
@@ -1 +1,2 @@
 from .PS_280 import *
+from .parameters import Parameter, ParameterTable, IGNORE, SUPERUSER, READONLY, NUMERIC, RUNTIME_GROUPS
@@ -0,0 +1,275 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module keeps track of the baud rates used by esptool when flashing PS-280 devices.
+For every serial port and every USB serial bridge type (CP210x, CH340, ...) it remembers the
+fastest baud rate that worked, steps down after a write failed for a baud related reason and
+records the flash throughput of every run, so the gain of a faster bridge can be seen.
+Failures are only recorded for the port they happened on and are forgotten after a while or
+once a run at the same or a higher baud rate succeeds.
+
+Dependencies:
+    - os: File system operations
+    - json: Persist the baud rate table
+    - time: Timestamps of flash runs
+    - threading: Guard the table against concurrent flash runs
+"""
+
+import os
+import json
+import time
+import threading
+
+# Baud rates tried for flashing, fastest first
+FLASH_BAUDRATES = [1500000, 921600, 460800, 230400, 115200]
+
+# Number of throughput records kept per port
+HISTORY_LENGTH = 20
+
+# Seconds after which a failed baud rate is tried again
+FAILURE_LIFETIME = 7 * 24 * 3600
+
+# esptool messages of transfers broken by a too fast baud rate
+BAUD_ERRORS = (
+    "Timed out waiting for packet",
+    "Invalid head of packet",
+    "Serial data stream stopped",
+    "Packet content transfer stopped",
+    "Failed to write compressed data",
+    "Failed to write to target RAM",
+    "Corrupt data",
+    "A serial exception error occurred",
+)
+
+# esptool messages of a device that never answered, e.g. one not entering the bootloader
+CONNECT_ERRORS = ("Failed to connect",)
+
+# esptool messages after which the transfer runs at the requested baud rate
+TRANSFER_STARTS = ("Changing baud rate", "Writing at")
+
+
+def is_baud_error(lines):
+    """
+    Tell whether esptool output shows a transfer broken by the baud rate, rather than e.g. a
+    missing device or image file.
+
+    Only errors after the baud rate was changed or the transfer started count. Before that
+    esptool talks to the ROM loader at its fixed rate, and a timeout there means the device did
+    not connect, whatever the baud rate.
+
+    Args:
+        lines (list): Output lines of the failed esptool run.
+    """
+    if any(error in line for line in lines for error in CONNECT_ERRORS):
+        return False
+    transferring = False
+    for line in lines:
+        if any(start in line for start in TRANSFER_STARTS):
+            transferring = True
+        elif transferring and any(error in line for error in BAUD_ERRORS):
+            return True
+    return False
+
+
+class FlashBaudRates:
+    """
+    Persistent table of the fastest stable flash baud rate per port and bridge type.
+    """
+
+    def __init__(self, filename=None, baudrates=FLASH_BAUDRATES):
+        """
+        Initialize the table and load previously stored results.
+
+        Args:
+            filename (str, optional): JSON file the table is stored in. Without a file the
+                table only lives in memory.
+            baudrates (list): Candidate baud rates, fastest first.
+        """
+        self.filename = filename
+        self.baudrates = sorted(baudrates, reverse=True)
+        self.lock = threading.Lock()
+        self.table = {'ports': {}, 'bridges': {}}
+        self.load()
+
+    def load(self):
+        """
+        Load the table from its file, keeping an empty table if the file is missing or broken.
+        """
+        if not self.filename or not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, "r", encoding="utf-8") as file:
+                table = json.load(file)
+            self.table['ports'] = table.get('ports', {})
+            self.table['bridges'] = table.get('bridges', {})
+            for kind in ('ports', 'bridges'):
+                for entry in self.table[kind].values():
+                    if isinstance(entry.get('failed'), list):
+                        # Tables of earlier versions listed the failed baud rates without time
+                        entry['failed'] = {str(baud): time.time() for baud in entry['failed']}
+        except (OSError, ValueError) as e:
+            print(f"Could not read flash baud rates from {self.filename}: {e}")
+
+    def save(self):
+        """
+        Write the table to its file.
+        """
+        if not self.filename:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        temp_file = f"{self.filename}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as file:
+            json.dump(self.table, file, indent=2)
+        os.replace(temp_file, self.filename)
+
+    def _entry(self, kind, key):
+        return self.table[kind].setdefault(key, {'baud': None, 'failed': {}})
+
+    @staticmethod
+    def _failed(entry):
+        """Return the baud rates that failed for an entry within the failure lifetime."""
+        now = time.time()
+        failed = entry.get('failed') or {}
+        for baud in [baud for baud, stamp in failed.items() if now - stamp > FAILURE_LIFETIME]:
+            del failed[baud]
+        return [int(baud) for baud in failed]
+
+    def _first_working(self, entry):
+        """Return the fastest candidate below every baud rate that failed for an entry."""
+        failed = self._failed(entry)
+        ceiling = min(failed) if failed else None
+        for baud in self.baudrates:
+            if ceiling is None or baud < ceiling:
+                return baud
+        return self.baudrates[-1]
+
+    def baud_for(self, port, bridge=None):
+        """
+        Return the baud rate to use for the next flash run on a port.
+
+        The remembered baud rate of the port wins. A port seen for the first time starts with the
+        baud rate known for its bridge type, otherwise with the fastest candidate.
+
+        Args:
+            port (str): Serial port of the device.
+            bridge (str, optional): Bridge type, e.g. 'CP210x' or 'CH340'.
+
+        Returns:
+            int: Baud rate.
+        """
+        with self.lock:
+            entry = self.table['ports'].get(port)
+            if entry:
+                return entry['baud'] or self._first_working(entry)
+            entry = self.table['bridges'].get(bridge) if bridge else None
+            if entry:
+                return entry['baud'] or self._first_working(entry)
+            return self.baudrates[0]
+
+    def next_lower(self, baud):
+        """
+        Return the next slower candidate, or None if the given baud rate is the slowest one.
+        """
+        lower = [b for b in self.baudrates if b < baud]
+        return lower[0] if lower else None
+
+    def report_failure(self, port, baud, bridge=None):
+        """
+        Record a flash run that failed for a baud related reason, see is_baud_error, and return
+        the baud rate to retry with.
+
+        The failure is recorded for the port only; other devices with the same bridge type keep
+        their baud rate.
+
+        Args:
+            port (str): Serial port of the device.
+            baud (int): Baud rate that failed.
+            bridge (str, optional): Bridge type of the port.
+
+        Returns:
+            int or None: Next slower baud rate, None if there is none left.
+        """
+        with self.lock:
+            entry = self._entry('ports', port)
+            entry['failed'][str(baud)] = time.time()
+            if bridge:
+                entry['bridge'] = bridge
+            if entry['baud'] is not None and entry['baud'] >= baud:
+                entry['baud'] = None
+            self.save()
+        return self.next_lower(baud)
+
+    def report_success(self, port, baud, nbytes=0, seconds=0.0, bridge=None):
+        """
+        Remember a working baud rate and record the throughput of the flash run.
+
+        Args:
+            port (str): Serial port of the device.
+            baud (int): Baud rate that worked.
+            nbytes (int): Number of bytes written.
+            seconds (float): Duration of the run.
+            bridge (str, optional): Bridge type of the port.
+        """
+        with self.lock:
+            entry = self._entry('ports', port)
+            entry['baud'] = baud
+            entry['bridge'] = bridge
+            # A working baud rate disproves failures at the same or a lower one
+            entry['failed'] = {failed: stamp for failed, stamp in entry['failed'].items() if int(failed) > baud}
+            if bridge:
+                bridge_entry = self._entry('bridges', bridge)
+                if bridge_entry['baud'] is None or baud > bridge_entry['baud']:
+                    bridge_entry['baud'] = baud
+            if nbytes and seconds > 0:
+                history = entry.setdefault('history', [])
+                history.append({
+                    'time': time.time(),
+                    'baud': baud,
+                    'bytes': nbytes,
+                    'seconds': round(seconds, 3),
+                    'bytes_per_second': round(nbytes / seconds),
+                })
+                del history[:-HISTORY_LENGTH]
+            self.save()
+
+    def throughput(self, port=None):
+        """
+        Summarize the recorded flash throughput per port and baud rate.
+
+        Args:
+            port (str, optional): Restrict the summary to one port.
+
+        Returns:
+            dict: {port: {baud: average bytes per second}}
+        """
+        summary = {}
+        with self.lock:
+            for name, entry in self.table['ports'].items():
+                if port and name != port:
+                    continue
+                rates = {}
+                for record in entry.get('history', []):
+                    rates.setdefault(record['baud'], []).append(record['bytes_per_second'])
+                summary[name] = {baud: round(sum(r) / len(r)) for baud, r in rates.items()}
+        return summary
+# -
@@ -0,0 +1,295 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module provides the typed parameter table of PS-280 settings.
+Every parameter is a compact record holding group, name, value, type, limits and flags.
+The type is fixed when the parameter is created, and whether a parameter is ignored, needs
+superuser rights, is read-only or numeric is decided once from the parameter lists and the
+firmware parameter specification. The table behaves like the nested {group: {parameter: value}}
+dict used so far; to_dict converts it back where records are stored.
+
+Dependencies:
+    - collections.abc: Mapping interface of table and groups
+"""
+
+from collections.abc import Mapping, MutableMapping
+
+# Parameter flags
+IGNORE = 1
+SUPERUSER = 2
+READONLY = 4
+NUMERIC = 8
+
+# Groups holding values measured at runtime rather than configured
+RUNTIME_GROUPS = ('RUNTIME',)
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class Parameter:
+    """
+    A single PS-280 parameter.
+    """
+
+    __slots__ = ('group', 'name', 'value', 'type', 'minimum', 'maximum', 'allowed', 'description', 'flags')
+
+    def __init__(self, group, name, value, minimum=None, maximum=None, allowed=None, description='', flags=0):
+        self.group = group
+        self.name = name
+        self.value = value
+        self.type = type(value)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.allowed = allowed
+        self.description = description
+        self.flags = flags
+
+    @property
+    def key(self):
+        return f"{self.group}.{self.name}"
+
+    @property
+    def ignored(self):
+        return bool(self.flags & IGNORE)
+
+    @property
+    def superuser(self):
+        return bool(self.flags & SUPERUSER)
+
+    @property
+    def readonly(self):
+        return bool(self.flags & READONLY)
+
+    @property
+    def numeric(self):
+        return bool(self.flags & NUMERIC)
+
+    def convert(self, value):
+        """
+        Convert a value, e.g. user input, to the type of the parameter.
+        """
+        if self.type is bool:
+            return str(value).lower() in ("true", "1", "yes")
+        elif self.type is int:
+            return int(value)
+        elif self.type is float:
+            return float(value)
+        return value
+
+    def validate(self, value=None):
+        """
+        Check a value, the value of the parameter by default, against its limits and allowed values.
+
+        Returns:
+            str or None: Description of the problem, None if the value is valid.
+        """
+        value = self.value if value is None else value
+        if self.minimum is not None or self.maximum is not None:
+            number = _number(value)
+            if number is None:
+                return f"{self.key}: {value!r} is not a number"
+            if self.minimum is not None and number < self.minimum:
+                return f"{self.key}: {value} is below the minimum {self.minimum:g}"
+            if self.maximum is not None and number > self.maximum:
+                return f"{self.key}: {value} is above the maximum {self.maximum:g}"
+        if self.allowed:
+            allowed = [str(option).strip() for option in self.allowed]
+            text = str(int(value)) if isinstance(value, bool) else str(value)
+            if text not in allowed:
+                return f"{self.key}: {value!r} is not one of {', '.join(allowed)}"
+        return None
+
+    def __repr__(self):
+        return f"Parameter({self.key}={self.value!r})"
+
+
+class GroupView(MutableMapping):
+    """
+    The parameters of one group as {parameter: value}.
+    """
+
+    __slots__ = ('table', 'group')
+
+    def __init__(self, table, group):
+        self.table = table
+        self.group = group
+
+    def __getitem__(self, name):
+        return self.table._groups[self.group][name].value
+
+    def __setitem__(self, name, value):
+        self.table.set_value(self.group, name, value)
+
+    def __delitem__(self, name):
+        self.table.remove(self.group, name)
+
+    def __iter__(self):
+        return iter(self.table._groups.get(self.group, ()))
+
+    def __len__(self):
+        return len(self.table._groups.get(self.group, ()))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ParameterTable(MutableMapping):
+    """
+    Parameters of a PS-280 configuration with O(1) lookup by group and name.
+    """
+
+    def __init__(self, data=None, ignore=(), superuser=(), readonly=(), spec=None, readonly_groups=()):
+        """
+        Create the table.
+
+        Args:
+            data (Mapping, optional): Settings as {group: {parameter: value}}.
+            ignore (list): 'GROUP.PARAMETER' entries not written to devices.
+            superuser (list): 'GROUP.PARAMETER' entries needing superuser rights.
+            readonly (list): 'GROUP.PARAMETER' entries that can not be set.
+            spec (dict, optional): Firmware parameter specification as returned by
+                PS280.parameter_spec, {'GROUP.PARAMETER': {'minimumValue', 'maximumValue', ...}}.
+            readonly_groups (list): Groups whose parameters are read-only.
+        """
+        self.ignore = frozenset(ignore)
+        self.superuser = frozenset(superuser)
+        self.readonly = frozenset(readonly)
+        self.readonly_groups = frozenset(readonly_groups)
+        self.spec = spec or {}
+        self._groups = {}
+        if data:
+            for group, parameters in data.items():
+                if isinstance(parameters, Mapping):
+                    self[group] = parameters
+
+    def _create(self, group, name, value):
+        key = f"{group}.{name}"
+        spec = self.spec.get(key, {})
+        minimum = _number(spec.get('minimumValue'))
+        maximum = _number(spec.get('maximumValue'))
+        flags = 0
+        if key in self.ignore:
+            flags |= IGNORE
+        if key in self.superuser:
+            flags |= SUPERUSER
+        if key in self.readonly or group in self.readonly_groups:
+            flags |= READONLY
+        if minimum is not None or maximum is not None:
+            flags |= NUMERIC
+        return Parameter(group, name, value, minimum, maximum, spec.get('allowedValues') or None,
+                         spec.get('shortDescription', ''), flags)
+
+    def parameter(self, group, name=None):
+        """
+        Return a parameter by group and name, or by 'GROUP.PARAMETER'.
+
+        Raises:
+            KeyError: If the table has no such parameter.
+        """
+        if name is None:
+            group, name = group.split(".", 1)
+        return self._groups[group][name]
+
+    def __contains__(self, group):
+        return group in self._groups
+
+    def has_parameter(self, group, name):
+        return name in self._groups.get(group, ())
+
+    def set_value(self, group, name, value):
+        """
+        Set the value of a parameter, converted to its type. Unknown parameters are added.
+        """
+        parameters = self._groups.setdefault(group, {})
+        parameter = parameters.get(name)
+        if parameter is None:
+            parameters[name] = self._create(group, name, value)
+        else:
+            parameter.value = parameter.convert(value)
+
+    def remove(self, group, name):
+        del self._groups[group][name]
+
+    def parameters(self, group=None, flag=0, exclude=0):
+        """
+        Iterate over the parameters, optionally of one group, with or without certain flags.
+
+        Args:
+            group (str, optional): Group of the parameters.
+            flag (int): Flags the parameters must all have.
+            exclude (int): Flags the parameters must not have.
+        """
+        groups = [self._groups.get(group, {})] if group else self._groups.values()
+        for parameters in groups:
+            for parameter in parameters.values():
+                if parameter.flags & flag == flag and not parameter.flags & exclude:
+                    yield parameter
+
+    def is_ignored(self, group, name):
+        parameter = self._groups.get(group, {}).get(name)
+        return parameter.ignored if parameter else f"{group}.{name}" in self.ignore
+
+    def is_superuser(self, group, name):
+        parameter = self._groups.get(group, {}).get(name)
+        return parameter.superuser if parameter else f"{group}.{name}" in self.superuser
+
+    def to_dict(self):
+        """
+        Return the settings as nested dicts, e.g. for storing or encoding them.
+        """
+        return {group: {name: parameter.value for name, parameter in parameters.items()}
+                for group, parameters in self._groups.items()}
+
+    def copy(self):
+        table = ParameterTable()
+        table.__dict__.update(self.__dict__)
+        table._groups = {group: {name: self._create(group, name, parameter.value)
+                                 for name, parameter in parameters.items()}
+                         for group, parameters in self._groups.items()}
+        return table
+
+    def __getitem__(self, group):
+        if group not in self._groups:
+            raise KeyError(group)
+        return GroupView(self, group)
+
+    def __setitem__(self, group, parameters):
+        self._groups[group] = {name: self._create(group, name, value) for name, value in parameters.items()}
+
+    def __delitem__(self, group):
+        del self._groups[group]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __repr__(self):
+        return f"ParameterTable({self.to_dict()!r})"
+# -
@@ -0,0 +1,103 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module holds the state of one PS-280 being worked on: the connection, the settings last
+read from it, the configuration to be written, the record the configuration belongs to and
+the firmware and template selected for the device.
+The backend keeps one session per device, so several devices can be read, edited and written
+at the same time; a session is only used by one thread at a time.
+
+Dependencies:
+    - threading: Serialize the use of a session
+"""
+
+import threading
+
+# Session of the device found first, used while no other session is selected
+DEFAULT_SESSION = "auto"
+
+
+class DeviceSession:
+    """
+    Connection, settings and record of one PS-280.
+    """
+
+    def __init__(self, name=DEFAULT_SESSION, port=None, firmware=None, template=None):
+        """
+        Initialize the session.
+
+        Args:
+            name (str): Name of the session, usually the serial port.
+            port (str, optional): Serial port of the device, the first PS-280 found if None.
+            firmware (dict, optional): Selected firmware version and its files, copied.
+            template (str, optional): Selected template.
+        """
+        self.name = name
+        self.port = port
+        # PS280 connection, None while not connected
+        self.device = None
+        # Settings read from the device before writing
+        self.snapshot = None
+        # Configuration to be written, as edited
+        self.config = None
+        # Record of the configuration and its content as last loaded or saved
+        self.record_path = ""
+        self.record_content = None
+        # (firmware key, running version matches) of the last firmware check
+        self.firmware_check = None
+        # Firmware version and files selected for the device
+        self.firmware = dict(firmware or {'version': '', 'bootloader': '', 'partitiontable': '', 'firmwarebin': ''})
+        # Template selected for the device
+        self.template = template
+        self.lock = threading.RLock()
+
+    @property
+    def connected(self):
+        return self.device is not None and getattr(self.device, 'connection', None) is not None
+
+    @property
+    def busy(self):
+        """
+        True if another thread is using the session.
+        """
+        if not self.lock.acquire(blocking=False):
+            return True
+        self.lock.release()
+        return False
+
+    def close(self):
+        """
+        Close the serial connection of the device.
+        """
+        connection = getattr(self.device, 'connection', None)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self.device = None
+        self.firmware_check = None
+
+    def __repr__(self):
+        return f"DeviceSession({self.name!r}, port={self.port!r}, record={self.record_path!r})"
+# -
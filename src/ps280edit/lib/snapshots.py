@@ -0,0 +1,247 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module keeps the history of the settings read from PS-280 devices.
+Every snapshot is stored once, zlib-compressed and addressed by the SHA-256 of its canonical
+JSON, so identical snapshots of thousands of provisioning runs take the space of one.
+A timeline per serial number lists when which snapshot was taken, which makes the history of
+a device a single small file read. Timeline entries carry the serial number, the file name is
+only a sanitized form of it.
+Settings also have a fingerprint, the SHA-256 of their normalized configurable values, so
+whether a device holds the configuration of its record is decided by comparing two digests.
+
+Dependencies:
+    - os: File system operations
+    - re: Safe timeline file names
+    - json: Canonical snapshot encoding and timelines
+    - zlib: Snapshot compression
+    - time: Snapshot timestamps
+    - hashlib: Content addresses
+    - tempfile: Atomic object writes
+    - threading: Serialize timeline appends
+"""
+
+import os
+import re
+import json
+import zlib
+import time
+import hashlib
+import tempfile
+import threading
+
+
+def canonical_json(settings):
+    """
+    Encode settings as canonical JSON, independent of group and parameter order.
+
+    Returns:
+        bytes: UTF-8 encoded JSON.
+    """
+    return json.dumps(settings, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def settings_fingerprint(settings, exclude=()):
+    """
+    Return the fingerprint of the configurable values of settings.
+
+    Values are compared as stripped strings, the way the device reports them, so a record and
+    the settings read from a device holding it have the same fingerprint.
+
+    Args:
+        settings (Mapping): Settings as {group: {parameter: value}}.
+        exclude (collection): 'GROUP.PARAMETER' entries or whole 'GROUP' names left out, e.g.
+            ignored, read-only and runtime parameters.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    normalized = {}
+    for group, parameters in settings.items():
+        if group in exclude or not hasattr(parameters, 'items'):
+            continue
+        for parameter, value in parameters.items():
+            name = f"{group}.{parameter}"
+            if name not in exclude:
+                normalized[name] = str(value).strip()
+    return hashlib.sha256(canonical_json(normalized)).hexdigest()
+
+
+def diff_settings(old, new, ignore=()):
+    """
+    Compare two settings dicts parameter by parameter.
+
+    Args:
+        old (dict): Settings as {group: {parameter: value}}.
+        new (dict): Settings in the same layout.
+        ignore (list): 'GROUP.PARAMETER' entries or whole 'GROUP' names left out.
+
+    Returns:
+        list: (parameter, old value, new value) tuples, None for missing values, sorted by parameter.
+    """
+    changes = []
+    for group in set(old) | set(new):
+        if group in ignore:
+            continue
+        old_group, new_group = old.get(group) or {}, new.get(group) or {}
+        for parameter in set(old_group) | set(new_group):
+            name = f"{group}.{parameter}"
+            if name in ignore:
+                continue
+            old_value, new_value = old_group.get(parameter), new_group.get(parameter)
+            if old_value != new_value:
+                changes.append((name, old_value, new_value))
+    return sorted(changes)
+
+
+class SnapshotStore:
+    """
+    Content-addressed store of device settings with a timeline per serial number.
+    """
+
+    def __init__(self, root):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory of the store, created on first write.
+        """
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.timelines_dir = os.path.join(self.root, "timelines")
+        self.lock = threading.Lock()
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def timeline_path(self, serial):
+        return os.path.join(self.timelines_dir, f"{re.sub(r'[^A-Za-z0-9._-]', '_', serial)}.jsonl")
+
+    def put(self, settings):
+        """
+        Store settings unless they are already stored.
+
+        Returns:
+            str: SHA-256 address of the settings.
+        """
+        data = canonical_json(settings)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(handle, "wb") as file:
+                file.write(zlib.compress(data, 9))
+            os.replace(temp_file, path)
+        return digest
+
+    def get(self, digest):
+        """
+        Load stored settings by their address.
+
+        Raises:
+            FileNotFoundError: If nothing is stored under the address.
+        """
+        with open(self.object_path(digest), "rb") as file:
+            return json.loads(zlib.decompress(file.read()))
+
+    def record(self, serial, settings, event="read", **details):
+        """
+        Store a snapshot of a device and append it to the timeline of its serial number.
+
+        Args:
+            serial (str): Serial number of the device.
+            settings (dict): Settings as {group: {parameter: value}}.
+            event (str): What the snapshot was taken at, e.g. 'read' or 'write'.
+            details: Further values stored in the timeline entry, e.g. version and fingerprint.
+
+        Returns:
+            dict: The timeline entry.
+        """
+        entry = {'time': time.time(), 'id': self.put(settings), 'event': event, **details, 'serial': serial}
+        with self.lock:
+            os.makedirs(self.timelines_dir, exist_ok=True)
+            with open(self.timeline_path(serial), "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+        return entry
+
+    def _read_timeline(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def timeline(self, serial):
+        """
+        Return the timeline of a device, oldest entry first.
+        """
+        # Serial numbers differing only in characters not allowed in file names share a file
+        return [entry for entry in self._read_timeline(self.timeline_path(serial))
+                if entry.get('serial', serial) == serial]
+
+    def latest(self, serial):
+        """
+        Return the latest snapshot of a device.
+
+        Returns:
+            tuple: (timeline entry, settings), or (None, None) if the device has no snapshot.
+        """
+        timeline = self.timeline(serial)
+        if not timeline:
+            return None, None
+        return timeline[-1], self.get(timeline[-1]['id'])
+
+    def serials(self):
+        """
+        List the serial numbers with a timeline.
+        """
+        if not os.path.isdir(self.timelines_dir):
+            return []
+        serials = set()
+        for name in os.listdir(self.timelines_dir):
+            if name.endswith(".jsonl"):
+                # Entries written before the serial was stored only have the file name
+                serials.update(entry.get('serial', name[:-len(".jsonl")])
+                               for entry in self._read_timeline(os.path.join(self.timelines_dir, name)))
+        return sorted(serials)
+
+    def history(self, serial, ignore=()):
+        """
+        List the changes between consecutive different snapshots of a device.
+
+        Returns:
+            list: One dict per change of settings with 'time', 'event' and 'changes'.
+        """
+        history = []
+        previous_id, previous = None, None
+        for entry in self.timeline(serial):
+            if entry['id'] == previous_id:
+                continue
+            settings = self.get(entry['id'])
+            if previous is not None:
+                history.append({'time': entry['time'], 'event': entry['event'],
+                                'changes': diff_settings(previous, settings, ignore)})
+            previous_id, previous = entry['id'], settings
+        return history
+# -
@@ -15,12 +15,9 @@
 
 # +
 import os,sys, yaml
-print(os.getcwd())
-print(sys.path)
 import segno
 from PIL import ImageFont, ImageDraw, Image, ImageOps
 import textwrap as tr
-from IPython.display import Image as dispImg
 
 
 
@@ -0,0 +1,379 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module provides the storage backends for PS-280 configuration records.
+DirectoryStorage keeps every record as config.toml in a tree of '.ps280' directories (default).
+Directory records are written atomically, optionally merging saves that arrive within a short
+window. SQLiteStorage keeps all records and their full history in a single SQLite file with
+transactional writes. Records are addressed by their config.toml path below the database root
+in both backends, so the rest of the editor does not care where they live. Records can be
+imported from and exported to the directory layout.
+
+Dependencies:
+    - os: File system operations
+    - time: Modification timestamps
+    - sqlite3: Single-file storage
+    - threading: Serialize access from UI and worker threads
+    - toml: Write TOML configuration records
+    - toml_loader: Parse TOML configuration records
+    - atomic_writer: Atomic, coalesced writes of config.toml files
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import toml
+from .toml_loader import load_toml, parse_toml, invalidate
+from .atomic_writer import CoalescingWriter
+
+CONFIG_FILE = "config.toml"
+
+STORAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    key TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (key, revision)
+);
+"""
+
+
+class DirectoryStorage:
+    """
+    Configuration records as config.toml files in a directory tree.
+    """
+
+    kind = "directory"
+
+    def __init__(self, database_root, save_delay=0.0, on_write=None, on_error=None):
+        """
+        Initialize the storage.
+
+        Args:
+            database_root (str): Root directory of the configuration database.
+            save_delay (float): Seconds saves are held back to merge them, 0 writes immediately.
+            on_write (callable, optional): Called with the path after a record was written.
+            on_error (callable, optional): Called with the path and the error when a held back
+                save could not be written. It stays pending and is retried.
+        """
+        self.database_root = os.path.abspath(database_root)
+        self.on_write = on_write
+        self.writer = CoalescingWriter(save_delay, self._written, on_error=on_error)
+
+    def __getstate__(self):
+        # Worker processes write immediately and report nothing back
+        return {'database_root': self.database_root}
+
+    def __setstate__(self, state):
+        self.__init__(state['database_root'])
+
+    def _written(self, path):
+        invalidate(path)
+        if self.on_write is not None:
+            self.on_write(path)
+
+    def load(self, path):
+        """
+        Load a configuration record, including saves not yet written.
+
+        Args:
+            path (str): Path of the config.toml file.
+
+        Returns:
+            dict: Configuration data.
+        """
+        pending = self.writer.pending_content(path)
+        if pending is not None:
+            return parse_toml(pending)
+        # Records are edited by the callers
+        return load_toml(path, copy=True)
+
+    def save(self, path, data):
+        """
+        Save a configuration record atomically, creating its directories.
+        Saving unchanged content does not touch the file.
+
+        Args:
+            path (str): Path of the config.toml file.
+            data (dict): Configuration data.
+        """
+        self.writer.write(path, toml.dumps(data))
+
+    def flush(self):
+        """
+        Write all held back saves now.
+        """
+        self.writer.flush()
+
+    def exists(self, path):
+        return self.writer.is_pending(path) or os.path.isfile(path)
+
+    def is_pending(self, path):
+        """
+        Return True if a save of the record has not reached the disk yet.
+        """
+        return self.writer.is_pending(path)
+
+    def records(self):
+        """
+        Iterate over the paths of all configuration records.
+        """
+        self.flush()
+        for directory, _, files in os.walk(self.database_root):
+            if CONFIG_FILE in files:
+                yield os.path.join(directory, CONFIG_FILE)
+
+    def close(self):
+        self.writer.close()
+
+
+class SQLiteStorage:
+    """
+    Configuration records and their history in a single SQLite file.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, database_root, database_file, on_write=None):
+        """
+        Open or create the storage file.
+
+        Args:
+            database_root (str): Root the record paths are relative to.
+            database_file (str): Path of the SQLite file.
+            on_write (callable, optional): Called with the path after a record was written.
+        """
+        self.database_root = os.path.abspath(database_root)
+        self.database_file = database_file
+        self.on_write = on_write
+        self.lock = threading.RLock()
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.database_file)), exist_ok=True)
+            self._connection = sqlite3.connect(self.database_file, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(STORAGE_SCHEMA)
+        return self._connection
+
+    def __getstate__(self):
+        # Worker processes open their own connection
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['on_write'] = None
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def key(self, path):
+        """
+        Return the storage key of a record path, its path relative to the database root.
+        """
+        return os.path.relpath(os.path.abspath(path), self.database_root).replace(os.sep, '/')
+
+    def path(self, key):
+        """
+        Return the record path of a storage key.
+        """
+        return os.path.join(self.database_root, *key.split('/'))
+
+    def load(self, path):
+        """
+        Load a configuration record.
+
+        Args:
+            path (str): Record path below the database root.
+
+        Returns:
+            dict: Configuration data.
+
+        Raises:
+            FileNotFoundError: If no record is stored under the path.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT content FROM records WHERE key = ?", (self.key(path),)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No record stored for {path}")
+        return parse_toml(row[0])
+
+    def save(self, path, data):
+        """
+        Save a configuration record as a new revision in one transaction.
+        Saving unchanged content does not create a revision.
+
+        Args:
+            path (str): Record path below the database root.
+            data (dict): Configuration data.
+        """
+        self.save_content(path, toml.dumps(data))
+
+    def save_content(self, path, content, modified=None):
+        key = self.key(path)
+        modified = modified or time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT content, revision FROM records WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == content:
+                return
+            revision = row[1] + 1 if row else 1
+            self.connection.execute("INSERT INTO history VALUES (?, ?, ?, ?)", (key, revision, content, modified))
+            self.connection.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                                    (key, content, revision, modified))
+        if self.on_write is not None:
+            self.on_write(path)
+
+    def flush(self):
+        pass
+
+    def exists(self, path):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM records WHERE key = ?", (self.key(path),)).fetchone() is not None
+
+    def is_pending(self, path):
+        # Saves are committed before save returns
+        return False
+
+    def records(self):
+        """
+        Iterate over the paths of all configuration records.
+        """
+        with self.lock:
+            keys = [row[0] for row in self.connection.execute("SELECT key FROM records ORDER BY key")]
+        return (self.path(key) for key in keys)
+
+    def scan(self):
+        """
+        Iterate over (path, revision, size) of all records, used to refresh the index.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT key, revision, LENGTH(content) FROM records").fetchall()
+        return ((self.path(key), revision, size) for key, revision, size in rows)
+
+    def history(self, path):
+        """
+        List the stored revisions of a record.
+
+        Returns:
+            list: (revision, modified) tuples, oldest first.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT revision, modified FROM history WHERE key = ? ORDER BY revision",
+                                           (self.key(path),)).fetchall()
+
+    def load_revision(self, path, revision):
+        """
+        Load an older revision of a record.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT content FROM history WHERE key = ? AND revision = ?",
+                                          (self.key(path), revision)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No revision {revision} stored for {path}")
+        return parse_toml(row[0])
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def import_tree(storage, source_root):
+    """
+    Import all config.toml records of a '.ps280' directory tree into a storage.
+
+    Args:
+        storage: Target storage.
+        source_root (str): Root of the directory tree, records keep their relative paths.
+
+    Returns:
+        int: Number of imported records.
+    """
+    count = 0
+    for path in DirectoryStorage(source_root).records():
+        target = os.path.join(storage.database_root, os.path.relpath(path, source_root))
+        with open(path, "r") as file:
+            content = file.read()
+        if hasattr(storage, 'save_content'):
+            storage.save_content(target, content, os.path.getmtime(path))
+        else:
+            storage.save(target, parse_toml(content))
+        count += 1
+    return count
+
+
+def export_tree(storage, target_root):
+    """
+    Export all records of a storage into a '.ps280' directory tree.
+
+    Args:
+        storage: Source storage.
+        target_root (str): Root of the directory tree.
+
+    Returns:
+        int: Number of exported records.
+    """
+    count = 0
+    target = DirectoryStorage(target_root)
+    for path in storage.records():
+        target.save(os.path.join(target_root, os.path.relpath(path, storage.database_root)), storage.load(path))
+        count += 1
+    return count
+
+
+def open_storage(database_root, kind="directory", database_file=None, save_delay=0.0, on_write=None,
+                 on_error=None):
+    """
+    Create the storage backend for a database root.
+
+    Args:
+        database_root (str): Root of the configuration database.
+        kind (str): 'directory' or 'sqlite'.
+        database_file (str, optional): SQLite file, relative paths are taken from the database root.
+        save_delay (float): Seconds directory saves are held back to merge them.
+        on_write (callable, optional): Called with the path after a record was written.
+        on_error (callable, optional): Called with the path and the error when a held back
+            directory save could not be written.
+
+    Returns:
+        DirectoryStorage or SQLiteStorage
+    """
+    if kind == "sqlite":
+        database_file = os.path.join(database_root, database_file or "ps280.sqlite")
+        return SQLiteStorage(database_root, database_file, on_write)
+    if kind != "directory":
+        raise ValueError(f"Unknown storage backend '{kind}'")
+    return DirectoryStorage(database_root, save_delay, on_write, on_error)
+# -
@@ -0,0 +1,416 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module compiles and applies configuration templates to PS-280 configuration records.
+Templates can be layered: a template naming others in 'extends' of its [TEMPLATE] group
+overrides them, e.g. base, then site, then building, then device. compile_template resolves
+the layers once into a flat patch, memoized by modification time and size of the layer files.
+merge_template is a pure function merging a template into a record. apply_template converts the
+template to the data types of the records once and merges it over many records in worker
+processes, saves changed records through the storage backend and summarizes the changed,
+unchanged and failed records.
+TemplateCatalog lists, compiles and checks the templates of a directory once and keeps the
+results until a template file changes, so the UI and bulk tools can show whether a template
+fits a firmware before it is applied.
+
+Dependencies:
+    - os: File system operations and CPU count
+    - threading: Guard the compiled templates
+    - collections: LRU order of the compiled templates
+    - collections.abc: Accept any mapping as record
+    - concurrent.futures: Worker processes
+    - toml_loader: Parse template files
+    - ps280_toolbox: Parameter limits of a firmware
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from .toml_loader import load_toml
+from .ps280_toolbox import ParameterTable
+
+# Group of a template holding its layer settings instead of parameters
+TEMPLATE_SECTION = "TEMPLATE"
+
+# Number of compiled templates kept in the memo
+CACHE_SIZE = 128
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def convert_value(value, original):
+    """
+    Convert a value to the data type of the value it replaces.
+
+    Args:
+        value: The input value.
+        original: The reference value.
+
+    Returns:
+        Converted value in the type of the original.
+    """
+    if isinstance(original, bool):
+        return str(value).lower() in ("true", "1", "yes")
+    elif isinstance(original, int):
+        return int(value)
+    elif isinstance(original, float):
+        return float(value)
+    return value
+
+
+def template_layers(template_dir, name, _chain=()):
+    """
+    Resolve the layers of a template, the most general first and the template itself last.
+
+    Args:
+        template_dir (str): Directory of the templates.
+        name (str): File name of the template.
+
+    Returns:
+        list: Paths of the layer files.
+
+    Raises:
+        ValueError: If templates extend each other in a cycle.
+    """
+    path = os.path.abspath(os.path.join(template_dir, name))
+    if path in _chain:
+        raise ValueError(f"Templates extend each other in a cycle at {name}")
+    extends = load_toml(path).get(TEMPLATE_SECTION, {}).get('extends', [])
+    if isinstance(extends, str):
+        extends = [extends]
+    layers = []
+    for parent in extends:
+        for layer in template_layers(template_dir, parent, _chain + (path,)):
+            if layer not in layers:
+                layers.append(layer)
+    return layers + [path]
+
+
+def layer_stamps(layers):
+    """
+    Stamp template layers by path, modification time and size, the way toml_loader recognizes changed files.
+
+    Args:
+        layers (iterable): Paths of the layer files.
+
+    Returns:
+        tuple: (path, mtime_ns, size) per layer.
+    """
+    stamps = []
+    for layer in layers:
+        stat = os.stat(layer)
+        stamps.append((layer, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def compile_template(template_dir, name):
+    """
+    Compile a layered template into a flat patch {group: {parameter: value}}.
+
+    Later layers override earlier ones. The result is memoized by the stamps of the layer
+    files, the CACHE_SIZE most recently used, and must not be modified.
+
+    Args:
+        template_dir (str): Directory of the templates.
+        name (str): File name of the template.
+
+    Returns:
+        dict: Flat template without the [TEMPLATE] group.
+    """
+    layers = template_layers(template_dir, name)
+    key = layer_stamps(layers)
+    with _compiled_lock:
+        patch = _compiled.get(key)
+        if patch is not None:
+            _compiled.move_to_end(key)
+    if patch is None:
+        patch = {}
+        for layer in layers:
+            for section, values in load_toml(layer).items():
+                if section != TEMPLATE_SECTION and hasattr(values, 'items'):
+                    patch.setdefault(section, {}).update(values)
+        with _compiled_lock:
+            _compiled[key] = patch
+            _compiled.move_to_end(key)
+            while len(_compiled) > CACHE_SIZE:
+                _compiled.popitem(last=False)
+    return patch
+
+
+def convert_template(template, record):
+    """
+    Convert the values of a template to the data types of the values they replace in a record.
+
+    Records of one firmware share their data types, a template converted against one of them
+    can be merged into all of them without converting again.
+
+    Args:
+        template (dict): Template as {group: {parameter: value}}.
+        record (dict): Configuration in the same layout.
+
+    Returns:
+        tuple: (converted template, list of error messages). Values that can not be converted
+            are left out.
+    """
+    converted, errors = {}, []
+    for section, values in template.items():
+        originals = record.get(section)
+        if not isinstance(originals, Mapping):
+            converted[section] = dict(values)
+            continue
+        converted[section] = {}
+        for key, value in values.items():
+            if key in originals:
+                try:
+                    value = convert_value(value, originals[key])
+                except (TypeError, ValueError) as e:
+                    errors.append(f"Invalid value for {section}.{key}: {e}")
+                    continue
+            converted[section][key] = value
+    return converted, errors
+
+
+def merge_template(record, template, converted=False):
+    """
+    Merge a template into a configuration record without modifying either.
+
+    Only parameters present in the record are set. Template parameters the record does not
+    have are skipped with a warning, values that can not be converted are errors.
+
+    Args:
+        record (dict): Configuration as {group: {parameter: value}}.
+        template (dict): Template in the same layout.
+        converted (bool): The template is already converted, see convert_template.
+
+    Returns:
+        tuple: (merged record, list of changed 'GROUP.PARAMETER', list of error messages,
+            list of warnings)
+    """
+    errors = []
+    if not converted:
+        template, errors = convert_template(template, record)
+    merged = {section: dict(values) if isinstance(values, Mapping) else values for section, values in record.items()}
+    changes, warnings = [], []
+    for section, values in template.items():
+        current = merged.get(section)
+        if not isinstance(current, Mapping):
+            warnings.append(f"Unknown group {section}")
+            continue
+        warnings += [f"Unknown parameter {section}.{key}" for key in values if key not in current]
+        updates = {key: value for key, value in values.items() if key in current and current[key] != value}
+        current.update(updates)
+        changes += [f"{section}.{key}" for key in updates]
+    return merged, changes, errors, warnings
+
+
+def check_template(template, spec):
+    """
+    Check a compiled template against the parameter specification of a firmware.
+
+    Args:
+        template (dict): Template as {group: {parameter: value}}.
+        spec (dict): Parameter specification, {'GROUP.PARAMETER': {'minimumValue', ...}}.
+
+    Returns:
+        list: Problems, parameters the firmware does not know and values outside its limits.
+    """
+    problems = []
+    for parameter in ParameterTable(template, spec=spec).parameters():
+        if parameter.key not in spec:
+            problems.append(f"{parameter.key}: unknown to the firmware")
+        elif (problem := parameter.validate()):
+            problems.append(problem)
+    return problems
+
+
+class TemplateCatalog:
+    """
+    Compiled templates of a directory and their compatibility with firmware versions.
+    """
+
+    def __init__(self, template_dir):
+        """
+        Args:
+            template_dir (str): Directory of the templates.
+        """
+        self.template_dir = os.path.abspath(template_dir)
+        self.lock = threading.RLock()
+        self._names = (None, [])
+        self._entries = {}
+        self._checks = {}
+
+    def names(self):
+        """
+        Returns the sorted file names of the templates, listed again only if the directory changed.
+        """
+        stamp = os.stat(self.template_dir).st_mtime_ns
+        with self.lock:
+            if self._names[0] != stamp:
+                self._names = (stamp, sorted(name for name in os.listdir(self.template_dir) if name.endswith('.toml')))
+            return self._names[1]
+
+    def entry(self, name):
+        """
+        Compile a template, or return it from the catalog if none of its layers changed.
+
+        Returns:
+            dict: 'template' (compiled, None on error), 'error' (message or None) and 'stamp'.
+        """
+        with self.lock:
+            cached = self._entries.get(name)
+        try:
+            if cached and cached['stamp'] and layer_stamps(layer for layer, _, _ in cached['stamp']) == cached['stamp']:
+                return cached
+            layers = template_layers(self.template_dir, name)
+            entry = {'stamp': layer_stamps(layers), 'template': compile_template(self.template_dir, name), 'error': None}
+        except Exception as e:
+            entry = {'stamp': None, 'template': None, 'error': str(e)}
+        with self.lock:
+            self._entries[name] = entry
+        return entry
+
+    def template(self, name):
+        """
+        Returns a compiled template.
+
+        Raises:
+            ValueError: If the template can not be compiled.
+        """
+        entry = self.entry(name)
+        if entry['error']:
+            raise ValueError(f"Template {name}: {entry['error']}")
+        return entry['template']
+
+    def check(self, name, spec):
+        """
+        Check a template against the parameter specification of a firmware.
+
+        Results are kept as long as template and specification are unchanged; the
+        specification is recognized by identity, pass the same dict for the same firmware.
+
+        Returns:
+            list: Problems, see check_template. A template that can not be compiled has its error as only problem.
+        """
+        entry = self.entry(name)
+        with self.lock:
+            cached = self._checks.get(name)
+            if cached and cached[0] is entry and cached[1] is spec:
+                return cached[2]
+        problems = [entry['error']] if entry['error'] else check_template(entry['template'], spec)
+        with self.lock:
+            self._checks[name] = (entry, spec, problems)
+        return problems
+
+    def compatibility(self, spec):
+        """
+        Check all templates against the parameter specification of a firmware.
+
+        Returns:
+            dict: {template name: list of problems}
+        """
+        return {name: self.check(name, spec) for name in self.names()}
+
+    def invalidate(self):
+        """
+        Forget all templates, e.g. after the directory changed on disk.
+        """
+        with self.lock:
+            self._names = (None, [])
+            self._entries.clear()
+            self._checks.clear()
+
+
+def apply_template_to_record(storage, path, template, errors=()):
+    """
+    Apply a converted template to one stored record. Records with errors are not saved,
+    parameters the record does not have are skipped with a warning.
+
+    Args:
+        storage: Storage backend of the records.
+        path (str): Path of the record.
+        template (dict): Template converted by convert_template.
+        errors (list): Errors converting the template, they fail the record.
+
+    Returns:
+        dict: Result with 'path', 'status' ('changed', 'unchanged' or 'failed'), 'changes', 'errors'
+            and 'warnings'.
+    """
+    result = {'path': path, 'status': 'failed', 'changes': [], 'errors': [], 'warnings': []}
+    try:
+        merged, result['changes'], _, result['warnings'] = merge_template(storage.load(path), template, converted=True)
+        result['errors'] += errors
+        if not result['errors']:
+            if result['changes']:
+                storage.save(path, merged)
+                storage.flush()
+                result['status'] = 'changed'
+            else:
+                result['status'] = 'unchanged'
+    except Exception as e:
+        result['errors'].append(str(e))
+    return result
+
+
+def apply_template(storage, paths, template, workers=None):
+    """
+    Apply a template to many stored records in worker processes.
+
+    The template is converted once, to the data types of the first record.
+
+    Args:
+        storage: Storage backend of the records.
+        paths (list): Paths of the records.
+        template (dict): Template as {group: {parameter: value}}.
+        workers (int, optional): Number of worker processes, the CPU count by default.
+
+    Returns:
+        dict: {'changed': [...], 'unchanged': [...], 'failed': [...]} with one result per record.
+    """
+    summary = {'changed': [], 'unchanged': [], 'failed': []}
+    paths = list(paths)
+    if not paths:
+        return summary
+    reference = {}
+    for path in paths:
+        try:
+            reference = storage.load(path)
+            break
+        except Exception:
+            # The record fails on its own when it is applied
+            continue
+    template, errors = convert_template(template, reference)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers == 1:
+        results = [apply_template_to_record(storage, path, template, errors) for path in paths]
+    else:
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(apply_template_to_record, [storage] * len(paths), paths,
+                                        [template] * len(paths), [errors] * len(paths), chunksize=chunksize))
+    for result in results:
+        summary[result['status']].append(result)
+    return summary
+# -
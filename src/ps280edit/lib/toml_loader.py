@@ -0,0 +1,153 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module is the shared TOML loader of the editor.
+Files are parsed with the stdlib tomllib (or tomli on older Pythons) and fall back to the
+toml package. Parsed documents are kept in an LRU cache keyed by path, modification time
+and size, so loading an unchanged record or template again costs a stat call. Documents are
+returned as read-only views of the cache, callers that modify them ask for a copy.
+
+Dependencies:
+    - os: File system operations
+    - threading: Guard the cache
+    - collections: LRU order of the cache
+    - types: Read-only document views
+    - tomllib / tomli (optional): Fast TOML parser
+    - toml: Fallback parser
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+import toml
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Number of parsed documents kept in the cache
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def parse_toml(text):
+    """
+    Parse a TOML document.
+
+    Args:
+        text (str): TOML document.
+
+    Returns:
+        dict: Parsed document.
+    """
+    if tomllib is not None:
+        try:
+            return tomllib.loads(text)
+        except tomllib.TOMLDecodeError:
+            # The toml package accepts some documents tomllib rejects
+            pass
+    return toml.loads(text)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def load_toml(path, copy=False):
+    """
+    Load a TOML file through the parse cache.
+
+    Args:
+        path (str): Path of the TOML file.
+        copy (bool): Return a mutable copy instead of the cached read-only view.
+
+    Returns:
+        MappingProxyType or dict: Parsed document, lists as tuples in the view.
+
+    Raises:
+        OSError: If the file can not be read.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(path)
+            _stats['hits'] += 1
+            document = entry[1]
+        else:
+            document = None
+    if document is None:
+        with open(path, "r", encoding="utf-8") as file:
+            document = _freeze(parse_toml(file.read()))
+        with _lock:
+            _stats['misses'] += 1
+            _cache[path] = (stamp, document)
+            _cache.move_to_end(path)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return _thaw(document) if copy else document
+
+
+def invalidate(path=None):
+    """
+    Drop a file, or all files, from the parse cache.
+
+    Args:
+        path (str, optional): Path of the TOML file, the whole cache if omitted.
+    """
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)
+
+
+def cache_info():
+    """
+    Return hits, misses and size of the parse cache.
+    """
+    with _lock:
+        return {**_stats, 'size': len(_cache)}
+# -
@@ -0,0 +1,191 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module provides a prefix trie of the MQTT topics used in the configuration database.
+Topics are split into their '/' separated levels, so checking whether a topic is taken costs one
+dictionary lookup per level, independent of the number of records. The trie also completes
+partial topics and suggests free topics next to a taken one, e.g. 'Wall2' next to 'Wall'.
+
+Dependencies:
+    - re: Split level names into stem and number
+    - threading: Serialize updates
+"""
+
+import re
+import threading
+
+# Separator of MQTT topic levels
+SEPARATOR = "/"
+
+
+class TopicNode:
+    """
+    A topic level with the records using exactly this topic.
+    """
+
+    __slots__ = ('children', 'owners', 'count')
+
+    def __init__(self):
+        self.children = {}
+        self.owners = set()
+        self.count = 0
+
+
+class TopicTrie:
+    """
+    Prefix trie of MQTT topics and the records using them.
+    """
+
+    def __init__(self):
+        self.root = TopicNode()
+        self.topics = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def levels(topic):
+        return topic.strip().strip(SEPARATOR).split(SEPARATOR)
+
+    def _node(self, topic):
+        node = self.root
+        for level in self.levels(topic):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node
+
+    def set(self, owner, topic):
+        """
+        Set the topic of a record, replacing its previous one.
+
+        Args:
+            owner (str): Record using the topic, e.g. the path of its config.toml.
+            topic (str): The topic, None or empty to remove the record.
+        """
+        topic = (topic or "").strip()
+        with self.lock:
+            previous = self.topics.pop(owner, None)
+            if previous is not None:
+                self._remove(previous, owner)
+            if topic:
+                self.topics[owner] = topic
+                node = self.root
+                node.count += 1
+                for level in self.levels(topic):
+                    node = node.children.setdefault(level, TopicNode())
+                    node.count += 1
+                node.owners.add(owner)
+
+    def _remove(self, topic, owner):
+        path = [self.root]
+        for level in self.levels(topic):
+            path.append(path[-1].children[level])
+        path[-1].owners.discard(owner)
+        for parent, level, node in zip(reversed(path[:-1]), reversed(self.levels(topic)), reversed(path[1:])):
+            node.count -= 1
+            if not node.count:
+                del parent.children[level]
+        self.root.count -= 1
+
+    def owners(self, topic):
+        """
+        Return the records using a topic.
+        """
+        with self.lock:
+            node = self._node(topic)
+            return set(node.owners) if node else set()
+
+    def collisions(self, topic, owner=None):
+        """
+        Return the records other than the given one using a topic.
+        """
+        return sorted(self.owners(topic) - {owner})
+
+    def complete(self, prefix, limit=10):
+        """
+        Complete a partial topic.
+
+        Args:
+            prefix (str): Beginning of a topic, the last level may be incomplete.
+            limit (int): Maximum number of completions.
+
+        Returns:
+            list: Used topics starting with the prefix, sorted.
+        """
+        levels = prefix.lstrip(SEPARATOR).split(SEPARATOR)
+        partial = levels.pop()
+        with self.lock:
+            node = self._node(SEPARATOR.join(levels)) if levels else self.root
+            if node is None:
+                return []
+            completions = []
+            base = SEPARATOR.join(levels)
+            stack = [(f"{base}{SEPARATOR}{name}" if base else name, child)
+                     for name, child in sorted(node.children.items(), reverse=True) if name.startswith(partial)]
+            while stack and len(completions) < limit:
+                topic, node = stack.pop()
+                if node.owners:
+                    completions.append(topic)
+                stack.extend((f"{topic}{SEPARATOR}{name}", child) for name, child in sorted(node.children.items(), reverse=True))
+            return completions
+
+    def next_levels(self, prefix):
+        """
+        Return the levels used below a topic prefix with the number of topics below each.
+        """
+        with self.lock:
+            node = self._node(prefix) if prefix.strip(SEPARATOR) else self.root
+            return sorted((name, child.count) for name, child in node.children.items()) if node else []
+
+    def suggest(self, topic, count=3):
+        """
+        Suggest free topics next to a topic by numbering its last level.
+
+        The last level keeps its stem and the width of its number, e.g. 'R07' leads to 'R08',
+        'Wall' to 'Wall2'.
+
+        Returns:
+            list: Free topics, the topic itself if it is free.
+        """
+        levels = self.levels(topic)
+        with self.lock:
+            if not self._node(topic) or not self._node(topic).owners:
+                return [SEPARATOR.join(levels)]
+            parent = self._node(SEPARATOR.join(levels[:-1])) if len(levels) > 1 else self.root
+            taken = {name for name, child in parent.children.items() if child.owners}
+        stem, number = re.match(r"(.*?)(\d*)$", levels[-1]).groups()
+        width = len(number)
+        n = int(number) if number else 1
+        suggestions = []
+        while len(suggestions) < count:
+            n += 1
+            name = f"{stem}{n:0{width}d}"
+            if name not in taken:
+                suggestions.append(SEPARATOR.join(levels[:-1] + [name]))
+        return suggestions
+
+    def __contains__(self, topic):
+        return bool(self.owners(topic))
+
+    def __len__(self):
+        return len(self.topics)
+# -
@@ -0,0 +1,284 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This module watches directory trees, e.g. database, templates and firmware, for changes made by
+other stations or tools. On Linux the kernel reports changes through inotify; elsewhere, or if
+inotify is unavailable, the trees are polled for changed modification times and sizes.
+Changes are collected until the trees have been quiet for a short time and are then reported
+as one event per batch, so a tool writing hundreds of records causes one update, not hundreds.
+
+Dependencies:
+    - os: File system operations
+    - sys: Detect the platform
+    - time: Debouncing and polling
+    - struct: Decode inotify events
+    - select: Wait for inotify events
+    - ctypes: inotify system calls of the C library
+    - threading: Watcher thread
+"""
+
+import os
+import sys
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+import threading
+
+# Files written and removed again by atomic saves and SQLite, never reported
+IGNORED_SUFFIXES = ('.tmp', '-journal', '-wal', '-shm')
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def ignored(path):
+    return path.endswith(IGNORED_SUFFIXES)
+
+
+class InotifySource:
+    """
+    Change source using the inotify interface of the Linux kernel.
+    """
+
+    def __init__(self, roots):
+        """
+        Watch all directories below the roots.
+
+        Args:
+            roots (dict): {name: directory}
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.roots = {name: os.path.abspath(root) for name, root in roots.items()}
+        for name, root in self.roots.items():
+            self.add_tree(name, root)
+
+    def add_tree(self, name, root):
+        for directory, _, _ in os.walk(root):
+            self.add_watch(name, directory)
+
+    def add_watch(self, name, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if errno == 28:
+                raise OSError(errno, "inotify watch limit reached, see /proc/sys/fs/inotify/max_user_watches")
+            return
+        self.watches[wd] = (name, directory)
+
+    def wait(self, timeout):
+        """
+        Wait for changes.
+
+        Returns:
+            list: (name, path) of the changed files and directories, a path of None if the
+                whole tree has to be considered changed.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            filename = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changes.extend((name, None) for name in self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            name, directory = self.watches[wd]
+            path = os.path.join(directory, filename) if filename else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Files created before the watch was added are reported by walking the new directory
+                self.add_tree(name, path)
+                changes.extend((name, os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+            changes.append((name, path))
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """
+    Change source comparing modification times and sizes of all files at an interval.
+    """
+
+    def __init__(self, roots, interval=2.0):
+        """
+        Args:
+            roots (dict): {name: directory}
+            interval (float): Seconds between scans.
+        """
+        self.roots = {name: os.path.abspath(root) for name, root in roots.items()}
+        self.interval = interval
+        self.stamps = {name: self.scan(root) for name, root in self.roots.items()}
+        self.stop_event = threading.Event()
+
+    @staticmethod
+    def scan(root):
+        stamps = {}
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def wait(self, timeout):
+        if self.stop_event.wait(min(timeout, self.interval) if timeout is not None else self.interval):
+            return []
+        changes = []
+        for name, root in self.roots.items():
+            stamps = self.scan(root)
+            old = self.stamps[name]
+            changes.extend((name, path) for path in stamps.keys() | old.keys() if stamps.get(path) != old.get(path))
+            self.stamps[name] = stamps
+        return changes
+
+    def close(self):
+        self.stop_event.set()
+
+
+class DirectoryWatcher:
+    """
+    Reports debounced batches of changes in directory trees to a callback.
+    """
+
+    def __init__(self, roots, callback, debounce=0.5, interval=2.0, polling=False):
+        """
+        Initialize the watcher.
+
+        Args:
+            roots (dict): Directories to watch by name, e.g. {'database': ..., 'templates': ...}.
+            callback (callable): Called from the watcher thread with {name: set of paths}, a set
+                holding None if the whole tree has to be considered changed.
+            debounce (float): Seconds the trees have to be quiet before a batch is reported.
+            interval (float): Seconds between scans of the polling fallback.
+            polling (bool): Poll even if inotify is available.
+        """
+        self.roots = {name: root for name, root in roots.items() if root and os.path.isdir(root)}
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.polling = polling
+        self.source = None
+        self.thread = None
+        self.running = False
+
+    @property
+    def mode(self):
+        return 'inotify' if isinstance(self.source, InotifySource) else 'polling'
+
+    def start(self):
+        """
+        Start watching in a background thread.
+        """
+        if self.running:
+            return
+        self.source = None
+        if not self.polling:
+            try:
+                self.source = InotifySource(self.roots)
+            except (OSError, AttributeError) as e:
+                print(f"Watching directories by polling: {e}")
+        if self.source is None:
+            self.source = PollingSource(self.roots, self.interval)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="directory-watcher", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        pending = {}
+        deadline = None
+        while self.running:
+            timeout = max(deadline - time.monotonic(), 0) if deadline else 1.0
+            try:
+                changes = self.source.wait(timeout)
+            except OSError as e:
+                print(f"Stopped watching directories: {e}", file=sys.stderr)
+                break
+            for name, path in changes:
+                if path is None or not ignored(path):
+                    pending.setdefault(name, set()).add(path)
+            if changes and pending:
+                deadline = time.monotonic() + self.debounce
+            elif deadline and time.monotonic() >= deadline:
+                batch, pending, deadline = pending, {}, None
+                try:
+                    self.callback(batch)
+                except Exception as e:
+                    print(f"Error handling changes of {', '.join(batch)}: {e}", file=sys.stderr)
+        self.source.close()
+
+    def stop(self):
+        """
+        Stop watching and wait for the watcher thread to finish.
+        """
+        if not self.running:
+            return
+        self.running = False
+        if isinstance(self.source, PollingSource):
+            self.source.stop_event.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+# -
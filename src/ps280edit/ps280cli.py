@@ -0,0 +1,437 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+Command-line interface of the PS-280 editor for scripted provisioning without a display.
+Every subcommand runs one or more stages on top of PS280EditorBackend, writes the console
+output of the backend to stderr and prints a single JSON document to stdout with the result
+and the duration of every stage. flet is never imported.
+
+Usage:
+    python ps280cli.py detect
+    python ps280cli.py provision --firmware 0.12.0.35.34ae7f5a.20250502_111913 --record <config.toml>
+    python ps280cli.py apply-template udk_defaults.toml --search udk.playground
+    python ps280cli.py ota --firmware 0.12.0.35.34ae7f5a.20250502_111913 --filter broker=194.94.110.169
+    python ps280cli.py lint --firmware 0.12.0.35.34ae7f5a.20250502_111913
+
+Exit codes:
+    0: Success
+    1: A stage failed
+    2: Invalid arguments
+    3: No PS-280 connected
+    4: Unexpected error
+
+Dependencies:
+- argparse
+- json
+- lib.appconfig (configuration, directories and backend arguments)
+- lib.asset_sync (sync of updated defaults)
+- lib.backend (PS280EditorBackend)
+"""
+
+import os, sys
+import time
+import json
+import argparse
+from contextlib import redirect_stdout
+from lib.appconfig import load_config, app_dirs, data_dir, app_files, defaults_root, ensure_workdirs, backend_kwargs
+from lib.asset_sync import sync_assets
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DEVICE = 3
+EXIT_ERROR = 4
+
+
+class NoDevice(Exception):
+    pass
+
+
+class UsageError(Exception):
+    """
+    Invalid arguments of a subcommand, reported with EXIT_USAGE.
+    """
+
+
+class Stages:
+    """
+    Runs backend calls as timed stages and collects their results.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name, function, *args, **kwargs):
+        """
+        Run a stage with the backend output redirected to stderr.
+
+        A stage fails if the function raises, returns False or returns (False, ...); backend
+        setters returning nothing succeed.
+
+        Returns:
+            The result of the function.
+        """
+        start = time.perf_counter()
+        stage = {'stage': name, 'ok': False}
+        self.stages.append(stage)
+        try:
+            with redirect_stdout(sys.stderr):
+                result = function(*args, **kwargs)
+        except Exception as e:
+            stage['error'] = str(e)
+            raise
+        finally:
+            stage['seconds'] = round(time.perf_counter() - start, 3)
+        if isinstance(result, tuple) and result and isinstance(result[0], bool):
+            stage['ok'] = result[0]
+            if len(result) > 1 and isinstance(result[1], str):
+                stage['message'] = result[1]
+        else:
+            stage['ok'] = result is not False
+        return result
+
+    @property
+    def ok(self):
+        return all(stage['ok'] for stage in self.stages)
+
+
+def create_backend(args):
+    import lib.backend
+    # The device driver writes to the streams given at connect, keep stdout for the JSON result
+    lib.backend.stdoutstream = sys.stderr
+    # Its INFO log handler bound sys.stdout when the toolbox was first imported
+    from lib.ps280_toolbox.PS_280 import stdout_handler
+    stdout_handler.setStream(sys.stderr)
+    config = load_config(args.config)
+    dirs = app_dirs(config)
+    files = app_files(config, dirs, data_dir(config))
+    with redirect_stdout(sys.stderr):
+        ensure_workdirs(dirs, verbose=False)
+        sync_assets(dirs, defaults_root(config), files['asset_state'])
+    kwargs = backend_kwargs(config, dirs, files)
+    if args.database:
+        kwargs['database_root'] = os.path.abspath(args.database)
+    backend = lib.backend.PS280EditorBackend(**kwargs)
+    if args.port:
+        backend.select_session(args.port)
+    return backend
+
+
+def connect(backend, stages):
+    try:
+        stages.run('connect', backend.connect)
+    except Exception as e:
+        raise NoDevice(str(e)) from e
+
+
+def select_firmware(backend, stages, args):
+    if args.firmware not in backend.firmware_versions:
+        raise UsageError(f"Unknown firmware version '{args.firmware}', available: {', '.join(sorted(backend.firmware_versions))}")
+    stages.run('select_firmware', backend.set_firmware_version, args.firmware)
+    if args.skip_current is not None:
+        backend.skip_current_firmware = args.skip_current
+    if args.verify_current is not None:
+        backend.verify_current_firmware = args.verify_current
+
+
+def load_record(backend, stages, path):
+    if not os.path.isfile(path):
+        raise UsageError(f"No record '{path}'")
+    success, message = stages.run('load_record', backend.load_toml_file, os.path.abspath(path))
+    if not success:
+        raise Exception(message)
+
+
+def device_info(backend):
+    device = backend.PS280
+    return {'port': getattr(device, 'port', None), 'bridge': getattr(device, 'bridge', None),
+            'chip': getattr(device, 'chip_info', {})}
+
+
+def cmd_detect(backend, stages, args):
+    connect(backend, stages)
+    info = device_info(backend)
+    if args.settings:
+        stages.run('read_settings', backend.read_settings)
+        info['serial'] = backend.serial_number
+        info['version'] = backend.firmware_version
+    return info
+
+
+def cmd_read(backend, stages, args):
+    connect(backend, stages)
+    stages.run('read_settings', backend.read_settings)
+    result = {'serial': backend.serial_number, 'version': backend.firmware_version,
+              'fingerprint': backend.fingerprint(), 'settings': backend.toml_data.to_dict()}
+    if args.save:
+        stages.run('set_path', backend.set_file_path_to_topic)
+        stages.run('save_record', backend.save_toml_file)
+        result['record'] = backend.current_file_path
+    return result
+
+
+def cmd_write(backend, stages, args):
+    load_record(backend, stages, args.record)
+    connect(backend, stages)
+    stages.run('write_settings', backend.write_configuration, args.force)
+    return {'serial': backend.serial_number, 'record': backend.current_file_path}
+
+
+def cmd_apply_template(backend, stages, args):
+    if args.record:
+        load_record(backend, stages, args.record)
+        stages.run('apply_template', backend.update_configuration_from_template, args.template)
+        stages.run('save_record', backend.save_toml_file)
+        return {'record': backend.current_file_path}
+    if args.firmware:
+        select_firmware(backend, stages, args)
+    success, summary = stages.run('apply_template', backend.apply_template_to_records, args.template,
+                                  text=args.search, workers=args.workers, force=args.force, **dict(args.filter or []))
+    return {name: [result['path'] for result in results] for name, results in summary.items()}
+
+
+def cmd_templates(backend, stages, args):
+    if args.firmware:
+        select_firmware(backend, stages, args)
+        return stages.run('check_templates', backend.template_compatibility)
+    return {name: [] for name in backend.templates}
+
+
+def cmd_flash(backend, stages, args):
+    select_firmware(backend, stages, args)
+    connect(backend, stages)
+    stages.run('flash', backend.firmware_flash)
+    return {**device_info(backend), 'firmware': args.firmware}
+
+
+def cmd_erase(backend, stages, args):
+    connect(backend, stages)
+    stages.run('erase', backend.firmware_erase)
+    return device_info(backend)
+
+
+def cmd_provision(backend, stages, args):
+    select_firmware(backend, stages, args)
+    if args.record:
+        load_record(backend, stages, args.record)
+    connect(backend, stages)
+    stages.run('provision', backend.firmware_provision, not args.no_erase)
+    result = {**device_info(backend), 'firmware': args.firmware}
+    if args.record and args.write:
+        connect(backend, stages)
+        stages.run('write_settings', backend.write_configuration)
+        result['record'] = backend.current_file_path
+    return result
+
+
+def cmd_sticker(backend, stages, args):
+    load_record(backend, stages, args.record)
+    path = stages.run('sticker', backend.create_stickers, open_viewer=False)
+    return {'serial': backend.serial_number, 'sticker': path}
+
+
+def cmd_export(backend, stages, args):
+    stages.run('export', backend.export_records, os.path.abspath(args.file), args.format, text=args.search,
+               **dict(args.filter or []))
+    return {'file': os.path.abspath(args.file)}
+
+
+def cmd_import_manifest(backend, stages, args):
+    success, summary = stages.run('import_manifest', backend.import_manifest, os.path.abspath(args.manifest),
+                                  args.template, args.overwrite)
+    return summary
+
+
+def cmd_drift(backend, stages, args):
+    report = stages.run('drift', backend.drift_report, text=args.search, **dict(args.filter or []))
+    return {'devices': report.get('devices', []), 'parameters': report.get('parameters', []),
+            'in_sync': report.get('in_sync', []), 'without_snapshot': report.get('without_snapshot', [])}
+
+
+def cmd_lint(backend, stages, args):
+    if args.firmware:
+        select_firmware(backend, stages, args)
+    if args.template and args.template not in backend.templates:
+        raise UsageError(f"Unknown template '{args.template}', available: {', '.join(backend.templates)}")
+    if args.template or backend.templates:
+        backend.set_template(args.template or backend.templates[-1])
+    success, report = stages.run('lint', backend.lint_database, text=args.search, workers=args.workers,
+                                 **dict(args.filter or []))
+    return report
+
+
+def cmd_ota(backend, stages, args):
+    select_firmware(backend, stages, args)
+    if not (args.search or args.filter or args.all):
+        raise UsageError("Select the devices with --search or --filter, or roll out to every record with --all")
+    records = backend.search_records(args.search) if args.search else backend.find_records(**dict(args.filter or []))
+    if not records:
+        raise UsageError("No records match the query")
+    success, results = stages.run('ota', backend.ota_rollout, [record['path'] for record in records])
+    return {'firmware': args.firmware, 'devices': results}
+
+
+def cmd_spec(backend, stages, args):
+    select_firmware(backend, stages, args)
+    connect(backend, stages)
+    stages.run('parameter_spec', backend.save_parameter_spec)
+    return {'file': backend.parameter_spec_file, 'parameters': len(backend.parameter_spec)}
+
+
+def column_filter(text):
+    if '=' not in text:
+        raise argparse.ArgumentTypeError("Filters are given as column=value, e.g. broker=194.94.110.169")
+    return tuple(text.split('=', 1))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ps280cli', description=__doc__.split('Usage:')[0].split('Description:')[-1].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', help="Configuration file, ps280edit.yaml by default")
+    parser.add_argument('--database', help="Database root instead of the configured one")
+    parser.add_argument('--port', help="Serial port of the device, the first PS-280 found by default")
+    parser.add_argument('--indent', type=int, default=None, help="Indent the JSON output")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def firmware_arguments(command):
+        command.add_argument('--firmware', required=True, help="Firmware version directory")
+        command.add_argument('--skip-current', dest='skip_current', action='store_true', default=None,
+                             help="Skip erase and flash if the version is already running")
+        command.add_argument('--verify-current', dest='verify_current', action='store_true', default=None,
+                             help="Confirm a running version by a flash hash check")
+
+    def query_arguments(command):
+        command.add_argument('--search', help="Search text for serial, topics or broker")
+        command.add_argument('--filter', type=column_filter, action='append',
+                             help="Index filter column=value, glob patterns allowed, repeatable")
+
+    command = commands.add_parser('detect', help="Find the connected device")
+    command.add_argument('--settings', action='store_true', help="Also read serial number and firmware version")
+    command.set_defaults(function=cmd_detect)
+
+    command = commands.add_parser('read', help="Read the settings of the device")
+    command.add_argument('--save', action='store_true', help="Save them as record under their topic")
+    command.set_defaults(function=cmd_read)
+
+    command = commands.add_parser('write', help="Write a record to the device")
+    command.add_argument('record', help="config.toml of the device")
+    command.add_argument('--force', action='store_true', help="Write the record even if it has problems")
+    command.set_defaults(function=cmd_write)
+
+    command = commands.add_parser('apply-template', help="Apply a template to one or many records")
+    command.add_argument('template', help="Template file name")
+    command.add_argument('--record', help="Only this config.toml")
+    command.add_argument('--workers', type=int, help="Number of worker processes")
+    command.add_argument('--firmware', help="Check the template against the parameters of this firmware version first")
+    command.add_argument('--force', action='store_true', help="Apply the template even if it does not fit the firmware")
+    query_arguments(command)
+    command.set_defaults(function=cmd_apply_template, skip_current=None, verify_current=None)
+
+    command = commands.add_parser('templates', help="List the templates and their problems with a firmware version")
+    command.add_argument('--firmware', help="Firmware version with a parameter specification")
+    command.set_defaults(function=cmd_templates, skip_current=None, verify_current=None)
+
+    command = commands.add_parser('flash', help="Flash a firmware version")
+    firmware_arguments(command)
+    command.set_defaults(function=cmd_flash)
+
+    command = commands.add_parser('erase', help="Erase the flash of the device")
+    command.set_defaults(function=cmd_erase, skip_current=None, verify_current=None)
+
+    command = commands.add_parser('provision', help="Erase, flash and verify in one bootloader session")
+    firmware_arguments(command)
+    command.add_argument('--record', help="config.toml to write with --write")
+    command.add_argument('--write', action='store_true', help="Write the record to the device afterwards")
+    command.add_argument('--no-erase', dest='no_erase', action='store_true', help="Do not erase the flash first")
+    command.set_defaults(function=cmd_provision)
+
+    command = commands.add_parser('sticker', help="Create the sticker of a record")
+    command.add_argument('record', help="config.toml of the device")
+    command.set_defaults(function=cmd_sticker)
+
+    command = commands.add_parser('export', help="Export records to JSONL or CSV")
+    command.add_argument('file', help="Output file, .jsonl or .csv")
+    command.add_argument('--format', choices=['jsonl', 'csv'])
+    query_arguments(command)
+    command.set_defaults(function=cmd_export)
+
+    command = commands.add_parser('import-manifest', help="Create records from a CSV manifest")
+    command.add_argument('manifest', help="CSV with serial, topic, broker, template")
+    command.add_argument('--template', help="Template for rows without one")
+    command.add_argument('--overwrite', action='store_true', help="Replace existing records")
+    command.set_defaults(function=cmd_import_manifest)
+
+    command = commands.add_parser('drift', help="Compare records with the latest device snapshots")
+    query_arguments(command)
+    command.set_defaults(function=cmd_drift)
+
+    command = commands.add_parser('lint', help="Check records for values and topics a device would reject")
+    command.add_argument('--firmware', help="Check limits against the parameters of this firmware version")
+    command.add_argument('--template', help="Template whose value types are expected, the last one by default")
+    command.add_argument('--workers', type=int, help="Number of worker processes")
+    query_arguments(command)
+    command.set_defaults(function=cmd_lint, skip_current=None, verify_current=None)
+
+    command = commands.add_parser('ota', help="Roll out a firmware version over the air via MQTT")
+    command.add_argument('--firmware', required=True, help="Firmware version directory")
+    command.add_argument('--all', action='store_true', help="Update the devices of all records")
+    query_arguments(command)
+    command.set_defaults(function=cmd_ota, skip_current=None, verify_current=None)
+
+    command = commands.add_parser('spec', help="Store the parameter specification of a firmware version")
+    firmware_arguments(command)
+    command.set_defaults(function=cmd_spec)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    stages = Stages()
+    output = {'command': args.command, 'ok': False}
+    start = time.perf_counter()
+    try:
+        backend = stages.run('setup', create_backend, args)
+        output['result'] = args.function(backend, stages, args)
+        # Held back saves are written now, a write that fails fails the command
+        backend.close()
+        output['ok'] = stages.ok
+        code = EXIT_OK if output['ok'] else EXIT_FAILED
+    except NoDevice as e:
+        output['error'] = f"No PS-280 connected: {e}"
+        code = EXIT_NO_DEVICE
+    except UsageError as e:
+        output['error'] = str(e)
+        code = EXIT_USAGE
+    except Exception as e:
+        output['error'] = f"{type(e).__name__}: {e}"
+        code = EXIT_ERROR
+    output['seconds'] = round(time.perf_counter() - start, 3)
+    output['stages'] = stages.stages
+    print(json.dumps(output, indent=args.indent, default=str))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -
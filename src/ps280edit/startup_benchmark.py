@@ -0,0 +1,141 @@
+# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:light
+#     text_representation:
+#       extension: .py
+#       format_name: light
+#       format_version: '1.5'
+#       jupytext_version: 1.16.7
+#   kernelspec:
+#     display_name: Python 3 (ipykernel)
+#     language: python
+#     name: python3
+# ---
+
+# ## Run with Python
+#
+#
+
+# !python startup_benchmark.py
+
+# +
+"""
+Author: Werner Kaul-Gothe
+Department: VPT
+Organisation: Universität der Künste Berlin IAS
+Date: 2026-10-19
+
+Description:
+This script measures how long the modules of the editor take to import at startup using the
+import time report of the Python interpreter (python -X importtime). Each module is imported in a
+fresh interpreter; the first run counts as cold start and is checked against the budget of
+ps280edit.yaml. Dependencies that must only be loaded on first use, e.g. esptool or Pillow, fail
+the benchmark when they are imported at startup.
+
+Dependencies:
+- sys: Interpreter of the measurements
+- yaml: Loads budget and modules from ps280edit.yaml
+- argparse: Command-line arguments
+- subprocess: Runs the measured interpreters
+
+Usage:
+Run this script from the directory of ps280edit.py:
+    python startup_benchmark.py
+    python startup_benchmark.py --budget 800 --runs 5 lib.backend
+
+Exit codes:
+    0: All modules within budget
+    1: Budget exceeded or a deferred dependency imported at startup
+    2: A module could not be imported
+"""
+
+import os
+import sys
+import yaml
+import argparse
+import subprocess
+
+# Path to the YAML configuration file
+CFG_FILE = 'ps280edit.yaml'
+
+
+def measure(module, cwd=None):
+    """
+    Import a module in a fresh interpreter and collect its import time report.
+
+    Returns:
+        list: (package, self µs, cumulative µs, nesting level) per imported module.
+
+    Raises:
+        RuntimeError: If the module can not be imported.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=cwd, capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"Exit code {process.returncode}")
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        package = name.lstrip()
+        level = (len(name) - len(package) - 1) // 2
+        imports.append((package, int(fields[0]), int(fields[1]), level))
+    return imports
+
+
+def total_time(imports):
+    """
+    Return the cumulative import time of the top-level imports in ms.
+    """
+    return sum(cumulative for _, _, cumulative, level in imports if level == 0) / 1000
+
+
+def deferred_imports(imports, deferred):
+    """
+    Return the imported modules belonging to packages that must be loaded on first use.
+    """
+    return sorted({package for package, _, _, _ in imports if package.split(".")[0] in deferred})
+
+
+def main():
+    with open(CFG_FILE, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file).get('startup', {})
+    parser = argparse.ArgumentParser(description="Check the startup import time of the editor against a budget.")
+    parser.add_argument('modules', nargs='*', default=config.get('modules', ['lib.backend']),
+                        help="Modules to measure")
+    parser.add_argument('--budget', type=float, default=config.get('budget_ms', 1500),
+                        help="Cold start budget per module in ms")
+    parser.add_argument('--runs', type=int, default=config.get('runs', 3), help="Number of runs per module")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest imports shown")
+    args = parser.parse_args()
+    deferred = set(config.get('deferred', []))
+
+    code = 0
+    for module in args.modules:
+        try:
+            runs = [measure(module, os.getcwd()) for _ in range(max(args.runs, 1))]
+        except RuntimeError as e:
+            print(f"❌ {module}: {e}")
+            code = max(code, 2)
+            continue
+        cold, warm = total_time(runs[0]), min(total_time(imports) for imports in runs)
+        within = cold <= args.budget
+        print(f"{'✅' if within else '❌'} {module}: cold {cold:.0f} ms, warm {warm:.0f} ms, budget {args.budget:.0f} ms")
+        for package, _, cumulative, _ in sorted((i for i in runs[0] if i[3] <= 1), key=lambda i: -i[2])[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {package}")
+        loaded = deferred_imports(runs[0], deferred)
+        if loaded:
+            print(f"❌ {module} imports at startup: {', '.join(loaded)}")
+        if not within or loaded:
+            code = max(code, 1)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -
@@ -0,0 +1,35 @@
+import os
+import shutil
+
+import pytest
+
+DEFAULTS = os.path.join(os.path.dirname(__file__), os.pardir, "src", "ps280edit", "defaults")
+FIRMWARE = "0.12.0.35.34ae7f5a.20250502_111913"
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Copy of the default database."""
+    root = tmp_path / "database"
+    shutil.copytree(os.path.join(DEFAULTS, "database"), root)
+    return str(root)
+
+
+@pytest.fixture
+def backend(tmp_path, database):
+    from lib.backend import PS280EditorBackend
+    templates = tmp_path / "templates"
+    shutil.copytree(os.path.join(DEFAULTS, "templates"), templates)
+    backend = PS280EditorBackend(
+        database_root=database,
+        firmware_dir=os.path.join(DEFAULTS, "firmware"),
+        template_dir=str(templates),
+        sticker_config_file=str(tmp_path / "stickertool.yaml"),
+        sticker_template_file=str(tmp_path / "sticker.png"),
+        parameters_ignore=["CORE.VERSION"],
+        index_file=str(tmp_path / "index.sqlite"),
+        snapshot_dir=str(tmp_path / "snapshots"),
+    )
+    yield backend
+    backend.stop_watching()
+    backend.storage.close()
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from lib.asset_sync import sync_assets, write_manifest, build_manifest, MANIFEST_FILE
+
+
+@pytest.fixture
+def assets(tmp_path):
+    defaults = tmp_path / "defaults"
+    (defaults / "templates").mkdir(parents=True)
+    (defaults / "templates" / "a.toml").write_text("a = 1\n")
+    (defaults / "templates" / "b.toml").write_text("b = 1\n")
+    (defaults / "templates" / "x.tmp").write_text("")
+    dirs = {'templates': {'workdir': str(tmp_path / "work" / "templates"), 'default': str(defaults / "templates")}}
+    return defaults, dirs, str(tmp_path / "state.json")
+
+
+def update_default(defaults, name, content):
+    (defaults / "templates" / name).write_text(content)
+    write_manifest(str(defaults))
+
+
+def test_manifest_leaves_out_temporary_files(assets):
+    defaults, _, _ = assets
+    assert write_manifest(str(defaults)) == 2
+    with open(defaults / MANIFEST_FILE) as file:
+        assert json.load(file) == build_manifest(str(defaults))
+
+
+def test_first_sync_copies_and_second_does_nothing(assets):
+    defaults, dirs, state = assets
+    assert sorted(sync_assets(dirs, str(defaults), state)['copied']) == ["templates/a.toml", "templates/b.toml"]
+    assert sync_assets(dirs, str(defaults), state) == {'copied': [], 'updated': [], 'kept': [], 'failed': []}
+
+
+def test_updated_defaults_replace_unmodified_copies_only(assets):
+    defaults, dirs, state = assets
+    sync_assets(dirs, str(defaults), state)
+    work = dirs['templates']['workdir']
+    with open(os.path.join(work, "b.toml"), "w") as file:
+        file.write("b = 'mine'\n")
+    update_default(defaults, "a.toml", "a = 2\n")
+    update_default(defaults, "b.toml", "b = 2\n")
+    summary = sync_assets(dirs, str(defaults), state)
+    assert summary['updated'] == ["templates/a.toml"] and summary['kept'] == ["templates/b.toml"]
+    assert open(os.path.join(work, "a.toml")).read() == "a = 2\n"
+    assert open(os.path.join(work, "b.toml")).read() == "b = 'mine'\n"
+
+
+def test_deleted_copies_come_back_only_with_a_new_default(assets):
+    defaults, dirs, state = assets
+    sync_assets(dirs, str(defaults), state)
+    target = os.path.join(dirs['templates']['workdir'], "a.toml")
+    os.remove(target)
+    assert not sync_assets(dirs, str(defaults), state)['copied'] and not os.path.exists(target)
+    update_default(defaults, "a.toml", "a = 3\n")
+    assert sync_assets(dirs, str(defaults), state)['copied'] == ["templates/a.toml"]
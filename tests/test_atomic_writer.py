@@ -0,0 +1,121 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from lib import atomic_writer
+from lib.atomic_writer import atomic_write, CoalescingWriter
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_unchanged_content_is_not_written(tmp_path):
+    path = str(tmp_path / "a" / "config.toml")
+    assert atomic_write(path, "x = 1\n")
+    assert not atomic_write(path, "x = 1\n")
+    assert open(path).read() == "x = 1\n"
+    assert os.listdir(tmp_path / "a") == ["config.toml"]
+
+
+def test_new_files_get_the_umask_default(tmp_path):
+    path = str(tmp_path / "config.toml")
+    umask = os.umask(0o022)
+    try:
+        atomic_write(path, "x = 1\n")
+    finally:
+        os.umask(umask)
+    assert mode(path) == 0o644
+
+
+def test_replaced_files_keep_their_mode(tmp_path):
+    path = tmp_path / "config.toml"
+    path.write_text("x = 1\n")
+    os.chmod(path, 0o640)
+    atomic_write(str(path), "x = 2\n")
+    assert mode(path) == 0o640 and path.read_text() == "x = 2\n"
+
+
+def test_writes_are_coalesced(tmp_path):
+    written = []
+    writer = CoalescingWriter(60, written.append)
+    path = str(tmp_path / "config.toml")
+    writer.write(path, "x = 1\n")
+    writer.write(path, "x = 2\n")
+    assert writer.pending_content(path) == "x = 2\n" and not os.path.exists(path)
+    writer.flush()
+    assert written == [path] and open(path).read() == "x = 2\n"
+
+
+def test_write_callbacks_run_without_the_lock(tmp_path):
+    # The callback of the storage takes the index lock, whose holders may flush this writer
+    free = []
+
+    def acquire():
+        free.append(writer.lock.acquire(timeout=1))
+        if free[-1]:
+            writer.lock.release()
+
+    def on_write(path):
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+
+    writer = CoalescingWriter(60, on_write)
+    writer.write(str(tmp_path / "config.toml"), "x = 1\n")
+    writer.flush()
+    assert free == [True]
+
+
+def test_failed_writes_stay_pending(tmp_path, monkeypatch):
+    writer = CoalescingWriter(60)
+    path = str(tmp_path / "config.toml")
+    writer.write(path, "x = 1\n")
+
+    def fail(path, content, encoding="utf-8"):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(atomic_writer, "atomic_write", fail)
+    with pytest.raises(OSError):
+        writer.flush()
+    assert writer.pending_content(path) == "x = 1\n"
+    monkeypatch.undo()
+    writer.flush()
+    assert writer.pending_content(path) is None and open(path).read() == "x = 1\n"
+
+
+def test_steady_writes_are_flushed_after_the_maximum_delay(tmp_path):
+    writer = CoalescingWriter(0.2, max_delay=0.4)
+    path = str(tmp_path / "config.toml")
+    start = time.monotonic()
+    while not os.path.exists(path) and time.monotonic() - start < 3:
+        writer.write(path, f"x = {time.monotonic()}\n")
+        time.sleep(0.05)
+    writer.flush()
+    assert time.monotonic() - start < 1.5
+
+
+def test_failed_background_writes_are_reported_and_retried(tmp_path, monkeypatch):
+    errors = []
+    writer = CoalescingWriter(0.05, on_error=lambda path, error: errors.append(path))
+    path = str(tmp_path / "config.toml")
+    write = atomic_writer.atomic_write
+
+    def fail(path, content, encoding="utf-8"):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(atomic_writer, "atomic_write", fail)
+    writer.write(path, "x = 1\n")
+    start = time.monotonic()
+    while not errors and time.monotonic() - start < 3:
+        time.sleep(0.05)
+    assert errors == [path] and writer.is_pending(path)
+    monkeypatch.setattr(atomic_writer, "atomic_write", write)
+    start = time.monotonic()
+    while writer.is_pending(path) and time.monotonic() - start < 5:
+        time.sleep(0.05)
+    assert open(path).read() == "x = 1\n"
+    writer.close()
@@ -0,0 +1,71 @@
+import json
+import time
+
+from lib.ps280_toolbox import baudrates
+from lib.ps280_toolbox.baudrates import FlashBaudRates, is_baud_error
+
+
+def test_new_port_starts_with_fastest_rate():
+    rates = FlashBaudRates()
+    assert rates.baud_for("/dev/ttyUSB0") == 1500000
+
+
+def test_failure_steps_down_for_the_port_only():
+    rates = FlashBaudRates()
+    assert rates.report_failure("/dev/ttyUSB0", 1500000, bridge="CH340") == 921600
+    assert rates.baud_for("/dev/ttyUSB0", "CH340") == 921600
+    # Another device on the same bridge type is not demoted
+    assert rates.baud_for("/dev/ttyUSB1", "CH340") == 1500000
+    assert "CH340" not in rates.table['bridges']
+
+
+def test_success_clears_failures_at_or_below_the_working_rate():
+    rates = FlashBaudRates()
+    rates.report_failure("/dev/ttyUSB0", 1500000)
+    rates.report_failure("/dev/ttyUSB0", 921600)
+    rates.report_success("/dev/ttyUSB0", 921600)
+    assert rates.table['ports']["/dev/ttyUSB0"]['failed'].keys() == {"1500000"}
+    assert rates.baud_for("/dev/ttyUSB0") == 921600
+
+
+def test_failures_age_out(monkeypatch):
+    rates = FlashBaudRates()
+    rates.report_failure("/dev/ttyUSB0", 1500000)
+    rates.report_failure("/dev/ttyUSB0", 921600)
+    assert rates.baud_for("/dev/ttyUSB0") == 460800
+    now = time.time()
+    monkeypatch.setattr(baudrates.time, "time", lambda: now + baudrates.FAILURE_LIFETIME + 1)
+    assert rates.baud_for("/dev/ttyUSB0") == 1500000
+
+
+def test_bridge_rate_learned_from_successes():
+    rates = FlashBaudRates()
+    rates.report_success("/dev/ttyUSB0", 460800, bridge="CP210x")
+    assert rates.baud_for("/dev/ttyUSB1", "CP210x") == 460800
+
+
+def test_throughput_history(tmp_path):
+    rates = FlashBaudRates(str(tmp_path / "baud.json"))
+    rates.report_success("/dev/ttyUSB0", 921600, nbytes=1000, seconds=2.0)
+    assert FlashBaudRates(str(tmp_path / "baud.json")).throughput() == {"/dev/ttyUSB0": {921600: 500}}
+
+
+def test_loads_tables_of_earlier_versions(tmp_path):
+    path = tmp_path / "baud.json"
+    path.write_text(json.dumps({'ports': {'COM3': {'baud': None, 'failed': [1500000]}}, 'bridges': {}}))
+    assert FlashBaudRates(str(path)).baud_for('COM3') == 921600
+
+
+def test_baud_errors():
+    assert is_baud_error(["Changing baud rate to 1500000", "Changed.",
+                          "A fatal error occurred: Timed out waiting for packet header"])
+    assert is_baud_error(["Writing at 0x00010000... (3 %)", "A fatal error occurred: Corrupt data"])
+    assert not is_baud_error(["A fatal error occurred: Could not open /dev/ttyUSB0, the port doesn't exist"])
+    assert not is_baud_error(["esptool write_flash: error: argument <address> <filename>: [Errno 2] No such file"])
+
+
+def test_connect_failures_are_no_baud_errors():
+    assert not is_baud_error(["Connecting......................................",
+                              "A fatal error occurred: Failed to connect to ESP32: "
+                              "Timed out waiting for packet header"])
+    assert not is_baud_error(["A fatal error occurred: Timed out waiting for packet header"])
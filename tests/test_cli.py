@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import ps280cli
+from conftest import DEFAULTS, FIRMWARE
+
+
+@pytest.fixture
+def cli(tmp_path, database, monkeypatch):
+    """Runs ps280cli with working and data directories below tmp_path."""
+    monkeypatch.chdir(os.path.dirname(DEFAULTS))
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_DOCUMENTS_DIR", str(tmp_path / "Documents"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    # The CLI moves the toolbox log handler to stderr, give it back afterwards
+    from lib.ps280_toolbox.PS_280 import stdout_handler
+    monkeypatch.setattr(stdout_handler, "stream", stdout_handler.stream)
+
+    def run(*argv, capsys=None):
+        code = ps280cli.main(["--database", database, *argv])
+        return code, json.loads(capsys.readouterr().out)
+
+    return run
+
+
+def test_firmware_selection_succeeds(cli, capsys):
+    code, output = cli("templates", "--firmware", FIRMWARE, capsys=capsys)
+    assert code == ps280cli.EXIT_OK and output['ok']
+    assert [stage['stage'] for stage in output['stages']] == ['setup', 'select_firmware', 'check_templates']
+    assert all(stage['ok'] for stage in output['stages'])
+
+
+def test_lint_exit_code_follows_the_records(cli, capsys):
+    code, output = cli("lint", "--firmware", FIRMWARE, "--workers", "1", capsys=capsys)
+    stages = {stage['stage']: stage['ok'] for stage in output['stages']}
+    assert stages['select_firmware'] and stages['setup']
+    assert stages['lint'] == (not output['result']['records'])
+    assert code == (ps280cli.EXIT_OK if stages['lint'] else ps280cli.EXIT_FAILED)
+
+
+def test_unknown_firmware_is_a_usage_error(cli, capsys):
+    code, output = cli("templates", "--firmware", "0.0.0", capsys=capsys)
+    assert code == ps280cli.EXIT_USAGE and not output['ok'] and "0.0.0" in output['error']
+
+
+def test_failed_stage(cli, capsys, monkeypatch):
+    from lib.backend import PS280EditorBackend
+    monkeypatch.setattr(PS280EditorBackend, "export_records", lambda self, *args, **kwargs: (False, "disk full"))
+    code, output = cli("export", "out.jsonl", capsys=capsys)
+    assert code == ps280cli.EXIT_FAILED
+    assert output['stages'][-1] == {'stage': 'export', 'ok': False, 'message': "disk full",
+                                    'seconds': output['stages'][-1]['seconds']}
+
+
+def test_backend_value_errors_are_no_usage_errors(cli, capsys, monkeypatch):
+    from lib.backend import PS280EditorBackend
+
+    def broken(self, *args, **kwargs):
+        raise ValueError("invalid TOML")
+
+    monkeypatch.setattr(PS280EditorBackend, "export_records", broken)
+    code, output = cli("export", "out.jsonl", capsys=capsys)
+    assert code == ps280cli.EXIT_ERROR and "invalid TOML" in output['error']
+
+
+def test_device_driver_logs_stay_off_stdout(cli, capsys):
+    from lib.ps280_toolbox.PS_280 import logger
+    code, output = cli("templates", "--firmware", FIRMWARE, capsys=capsys)
+    logger.info("driver message")
+    captured = capsys.readouterr()
+    assert "driver message" not in captured.out and "driver message" in captured.err
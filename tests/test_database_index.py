@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+
+from lib.database_index import DatabaseIndex
+
+RECORD = "PS-280.ps280/udk.production.ps280/UdK.ps280/BL.ps280/HA33.ps280/R208.ps280/Wall.ps280/config.toml"
+
+
+@pytest.fixture
+def index(tmp_path, database):
+    index = DatabaseIndex(database, str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def test_refresh_is_incremental(index, database):
+    assert index.refresh() == {'added': 17, 'updated': 0, 'removed': 0, 'unchanged': 0}
+    assert index.refresh() == {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 17}
+    path = os.path.join(database, RECORD)
+    with open(path, "a") as file:
+        file.write("\n[EXTRA]\nX = 1\n")
+    shutil.rmtree(os.path.join(database, "PS-280.ps280", "up.ps280"))
+    assert index.refresh() == {'added': 0, 'updated': 1, 'removed': 1, 'unchanged': 15}
+    assert len(index) == 16
+
+
+def test_index_survives_reopening(index, tmp_path, database):
+    index.refresh()
+    reopened = DatabaseIndex(database, str(tmp_path / "index.sqlite"))
+    try:
+        assert reopened.refresh()['unchanged'] == 17
+    finally:
+        reopened.close()
+
+
+def test_queries(index, database):
+    index.refresh()
+    record = index.query(path=os.path.join(database, RECORD))[0]
+    assert record['serial'] and record['topic_up']
+    assert record in index.find_by_serial(record['serial'])
+    assert record in index.query(topic_up="PS-280/udk.production/*")
+    assert all(r['topic_up'].startswith("PS-280/udk.production/") for r in index.query(topic_up="PS-280/udk.production/*"))
+    assert record in index.search(record['serial'][-4:])
+    with pytest.raises(ValueError):
+        index.query(colour="red")
+
+
+def test_refresh_record_after_save(index, database):
+    index.refresh()
+    path = os.path.join(database, RECORD)
+    with open(path) as file:
+        content = file.read()
+    serial = index.query(path=path)[0]['serial']
+    with open(path, "w") as file:
+        file.write(content.replace(serial, "PS280-NEW"))
+    index.refresh_record(path)
+    assert index.find_by_serial("PS280-NEW")[0]['path'] == path
+    os.remove(path)
+    index.refresh_record(path)
+    assert not index.find_by_serial("PS280-NEW")
@@ -0,0 +1,34 @@
+from lib.drift import compare_settings, detect_drift
+from lib.snapshots import SnapshotStore
+from lib.storage import DirectoryStorage
+
+SETTINGS = {'CORE': {'MSI': '900', 'VERSION': '0.12'}, 'RUNTIME': {'RSSI': '-70'}}
+
+
+def test_compare_settings_ignores_extra_and_runtime_values():
+    intended = {'CORE': {'MSI': 600, 'NAME': 'a'}, 'RUNTIME': {'RSSI': 0}}
+    assert compare_settings(intended, SETTINGS) == [('CORE.MSI', 600, '900'), ('CORE.NAME', 'a', None)]
+    assert compare_settings(intended, SETTINGS, ignore={'CORE.MSI', 'CORE.NAME'}) == []
+
+
+def test_drift_report(tmp_path):
+    storage = DirectoryStorage(str(tmp_path / "db"))
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    records = []
+    for serial, msi in (("PS280-1", '900'), ("PS280-2", '600'), ("PS280-3", '600')):
+        path = str(tmp_path / "db" / f"{serial}.ps280" / "config.toml")
+        storage.save(path, {'CORE': {'MSI': msi}})
+        records.append((serial, path))
+    store.record("PS280-1", SETTINGS)
+    store.record("PS280-2", SETTINGS)
+    report = detect_drift(storage, store, records)
+    assert report['in_sync'] == ["PS280-1"] and report['without_snapshot'] == ["PS280-3"]
+    assert [device['serial'] for device in report['devices']] == ["PS280-2"]
+    assert report['parameters'] == [('CORE.MSI', 1)]
+
+
+def test_matching_fingerprints_skip_loading(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.record("PS280-1", SETTINGS, fingerprint="abc")
+    report = detect_drift(None, store, [("PS280-1", "missing/config.toml", "abc")])
+    assert report['in_sync'] == ["PS280-1"] and not report['failed']
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+
+import pytest
+
+from lib.export import export_records, flatten_record, iter_records
+from lib.storage import DirectoryStorage
+
+
+@pytest.fixture
+def records(tmp_path):
+    storage = DirectoryStorage(str(tmp_path))
+    paths = []
+    for n in range(5):
+        path = str(tmp_path / f"room{n}.ps280" / "config.toml")
+        storage.save(path, {'CORE': {'SERIAL': f"PS280-{n}"}, 'MQTT': {'PORT': 1883 + n}})
+        paths.append(path)
+    return storage, paths
+
+
+def test_records_keep_their_order(records):
+    storage, paths = records
+    missing = paths[0].replace("room0", "gone")
+    read = list(iter_records(storage, paths + [missing], workers=3, window=2))
+    assert [path for path, _ in read] == paths + [missing]
+    assert read[-1][1] is None and read[2][1]['CORE']['SERIAL'] == "PS280-2"
+
+
+def test_jsonl(records):
+    storage, paths = records
+    output = io.StringIO()
+    assert export_records(storage, paths, output) == 5
+    documents = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert documents[1] == {'path': paths[1], 'CORE': {'SERIAL': "PS280-1"}, 'MQTT': {'PORT': 1884}}
+
+
+def test_csv_collects_the_columns(records):
+    storage, paths = records
+    output = io.StringIO(newline='')
+    assert export_records(storage, paths, output, format='csv') == 5
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert list(rows[0]) == ['path', 'CORE.SERIAL', 'MQTT.PORT']
+    assert rows[4]['MQTT.PORT'] == '1887'
+
+
+def test_csv_with_given_columns(records):
+    storage, paths = records
+    output = io.StringIO(newline='')
+    export_records(storage, paths, output, format='csv', columns=['MQTT.PORT'])
+    assert output.getvalue().splitlines()[0] == "path,MQTT.PORT"
+
+
+def test_unknown_format(records):
+    with pytest.raises(ValueError):
+        export_records(*records, io.StringIO(), format='xml')
+    assert flatten_record({'A': {'X': 1}, 'B': 2}) == {'A.X': 1}
@@ -0,0 +1,128 @@
+import pytest
+
+from lib.ps280_toolbox import PS_280
+from lib.ps280_toolbox.PS_280 import PS280, EsptoolError
+from lib.ps280_toolbox.baudrates import FlashBaudRates
+from conftest import FIRMWARE
+
+IDENTITY = ["Chip is ESP32-D0WD-V3 (revision v3.1)", "MAC: 24:ec:4a:00:00:01", "Crystal is 40MHz"]
+
+
+def device(verified, calls):
+    def run_esptool(*arguments, nbytes=0, output=None):
+        calls.append((arguments, nbytes))
+        output.extend(IDENTITY + ["Hash of data verified."] * verified)
+        return True
+
+    ps = PS280.__new__(PS280)
+    ps.run_esptool = run_esptool
+    return ps
+
+
+@pytest.fixture
+def images(tmp_path):
+    pairs = []
+    for offset, name in (("0x1000", "bootloader.bin"), ("0x8000", "partition-table.bin")):
+        (tmp_path / name).write_bytes(b"\xff" * 100)
+        pairs.append((offset, str(tmp_path / name)))
+    return pairs
+
+
+def test_provisioning_is_a_single_esptool_run(images):
+    calls = []
+    identity = device(2, calls).firmware_provision(images, erase=True)
+    assert identity == {'chip': "ESP32-D0WD-V3 (revision v3.1)", 'mac': "24:ec:4a:00:00:01", 'crystal': "40MHz"}
+    (arguments, nbytes), = calls
+    assert arguments[arguments.index("write_flash"):] == ("write_flash", "--erase-all", *images[0], *images[1])
+    assert nbytes == 200
+
+
+def test_erase_all_only_when_requested(images):
+    calls = []
+    device(2, calls).firmware_provision(images)
+    assert "--erase-all" not in calls[0][0]
+
+
+def test_every_region_must_be_verified(images):
+    with pytest.raises(Exception, match="1 of 2"):
+        device(1, []).firmware_provision(images)
+
+
+class RunningDevice:
+    def __init__(self, version):
+        self.version = version
+        self.provisioned = False
+
+    def firmware_provision(self, images, erase=False):
+        self.provisioned = True
+        return {}
+
+
+@pytest.mark.parametrize("running, skipped", [
+    (FIRMWARE, True),
+    (FIRMWARE + ".1", True),
+    (FIRMWARE[:-1], False),
+    ("0.12.0.3", False),
+    ("", False),
+])
+def test_flashing_is_skipped_for_the_running_version(backend, running, skipped):
+    backend.set_firmware_version(FIRMWARE)
+    backend.skip_current_firmware = True
+    backend.PS280 = RunningDevice(running)
+    assert backend.firmware_provision()
+    assert backend.PS280.provisioned is not skipped
+
+
+def test_prefix_of_another_version_is_not_current(backend):
+    backend.set_firmware_version("0.3.13.73.42372a1")
+    backend.PS280 = RunningDevice("0.3.13.73.42372a10")
+    assert not backend.firmware_is_current()
+
+
+class UnreachableDevice(RunningDevice):
+    @property
+    def version(self):
+        raise OSError("device disconnected")
+
+    @version.setter
+    def version(self, value):
+        pass
+
+
+def test_failed_version_check_fails_the_stage(backend):
+    backend.set_firmware_version(FIRMWARE)
+    backend.skip_current_firmware = True
+    backend.PS280 = UnreachableDevice(FIRMWARE)
+    assert not backend.firmware_provision()
+    assert not backend.PS280.provisioned
+
+
+def flashing_device(monkeypatch, failures):
+    """Device whose first in-process esptool run fails with the given output lines."""
+    runs = []
+
+    def esptool(*arguments, echo=False):
+        runs.append(arguments)
+        if len(runs) == 1 and failures:
+            raise EsptoolError("esptool failed", failures)
+        return ["Hash of data verified."]
+
+    monkeypatch.setattr(PS_280, "esptool_output", esptool)
+    ps = PS280.__new__(PS280)
+    ps.port, ps.bridge, ps.baudrates = "/dev/ttyUSB0", None, FlashBaudRates()
+    return ps, runs
+
+
+def test_baud_errors_step_down_in_process(monkeypatch):
+    ps, runs = flashing_device(monkeypatch, ["Changing baud rate to 1500000",
+                                             "A fatal error occurred: Timed out waiting for packet header"])
+    assert ps.run_esptool("erase_flash") is True
+    assert [run[run.index("-b") + 1] for run in runs] == ["1500000", "921600"]
+
+
+def test_other_esptool_errors_are_raised(monkeypatch):
+    ps, runs = flashing_device(monkeypatch, ["Connecting......", "A fatal error occurred: Failed to connect to "
+                                             "ESP32: Timed out waiting for packet header"])
+    with pytest.raises(EsptoolError):
+        ps.run_esptool("erase_flash")
+    assert len(runs) == 1 and ps.baudrates.baud_for("/dev/ttyUSB0") == 1500000
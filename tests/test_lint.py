@@ -0,0 +1,92 @@
+import os
+
+from lib.lint import lint_settings, lint_records, check_bands, topic_of_path
+from lib.storage import DirectoryStorage
+
+SPEC = {'CORE.MSI': {'minimumValue': '60', 'maximumValue': '3600', 'allowedValues': ''}}
+
+
+def test_value_problems():
+    settings = {'CORE': {'MSI': 30, 'NAME': 5}, 'THRESH': {'TEM_LO': 25, 'TEM_HI': 20},
+                'MODEM': {'BANDS_LTE': "[8,20,8]"}}
+    problems = lint_settings(settings, reference={'CORE': {'NAME': "a"}})
+    assert sorted(problems) == ["CORE.NAME: int value 5, expected str", "MODEM.BANDS_LTE: '[8,20,8]' lists bands more than once",
+                        "THRESH.TEM_LO: 25 is above THRESH.TEM_HI 20"]
+    problems = lint_settings({'CORE': {'MSI': 30, 'X': 1}}, spec=SPEC)
+    assert len(problems) == 2 and problems[1] == "CORE.X: unknown to the firmware"
+    assert lint_settings({'CORE': {'MSI': 30}}, spec=SPEC, ignore=['CORE.MSI']) == []
+
+
+def test_band_lists():
+    assert check_bands("MODEM.BANDS", "[8, 20]") == []
+    assert check_bands("MODEM.BANDS", "8,20") == ["MODEM.BANDS: '8,20' is not a band list like [8,20]"]
+    assert check_bands("MODEM.BANDS", "[8,999]") == ["MODEM.BANDS: unknown band(s) 999"]
+
+
+def test_topics_of_records(tmp_path):
+    storage = DirectoryStorage(str(tmp_path))
+    paths = [str(tmp_path / "site.ps280" / f"{room}.ps280" / "config.toml") for room in ("a", "b", "c")]
+    storage.save(paths[0], {'MQTT': {'TOPIC_UP': "site/a", 'TOPIC_DOWN': "site/a/dl"}})
+    storage.save(paths[1], {'MQTT': {'TOPIC_UP': "site/a", 'TOPIC_DOWN': "site/b/dl"}})
+    storage.save(paths[2], {'MQTT': {}})
+    assert topic_of_path(paths[1], str(tmp_path)) == "site/b"
+    report = lint_records(storage, paths, database_root=str(tmp_path), workers=1)
+    assert report['checked'] == 3 and len(report['records']) == 3
+    problems = {os.path.basename(os.path.dirname(result['path'])): result['problems'] for result in report['records']}
+    assert problems['a.ps280'] == [f"MQTT.TOPIC_UP: 'site/a' is also used by {paths[1]}"]
+    assert len(problems['b.ps280']) == 3 and problems['c.ps280'] == ["MQTT.TOPIC_UP: no topic set"]
+    assert report['problems'][0] == ("MQTT.TOPIC_UP", 4)
+
+
+class FakeDevice:
+    connection = object()
+
+    def __init__(self, settings):
+        self.reads = 0
+        self._settings = settings
+
+    @property
+    def settings(self):
+        self.reads += 1
+        return self._settings
+
+
+def test_lint_gate_is_opt_in(backend):
+    record = backend.find_records()[0]['path']
+    assert backend.load_toml_file(record)[0]
+    backend.toml_data = {**backend.toml_data.to_dict(), 'MODEM': {'BANDS_LTE': "8,20"}}
+    backend.PS280 = FakeDevice(backend.toml_data.to_dict())
+    backend.lint_before_write = True
+    assert not backend.write_configuration()
+    assert backend.PS280.reads == 0
+    assert backend.write_configuration(force=True)
+    backend.lint_before_write = False
+    assert backend.write_configuration()
+
+
+class WritableDevice(FakeDevice):
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.written = []
+
+    def set(self, group, parameter, value, superuser=False):
+        self.written.append(f"{group}.{parameter}")
+        self._settings[group][parameter] = value
+        return ['stored']
+
+    def get(self, group, parameter):
+        return self._settings[group][parameter]
+
+
+def test_writable_runtime_values_are_written(backend):
+    record = backend.find_records()[0]['path']
+    assert backend.load_toml_file(record)[0]
+    backend.toml_data = {**backend.toml_data.to_dict(), 'RUNTIME': {'RSSI': "-70"}}
+    device = {**backend.toml_data.to_dict(), 'RUNTIME': {'RSSI': "-60"}}
+    # The settings fingerprint leaves runtime groups out, the write check must not
+    assert backend.fingerprint(device) == backend.fingerprint()
+    backend.PS280 = WritableDevice(device)
+    assert backend.write_configuration(force=True)
+    assert backend.PS280.written == ["RUNTIME.RSSI"]
+    assert backend.write_configuration(force=True)
+    assert backend.PS280.written == ["RUNTIME.RSSI"]
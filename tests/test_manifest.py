@@ -0,0 +1,37 @@
+import pytest
+
+from lib.manifest import read_manifest, build_record
+
+PARAMETERS = {'serial': "CORE.SERIAL", 'topic_up': "MQTT.TOPIC_UP", 'topic_down': "MQTT.TOPIC_DOWN",
+              'broker': "HUB.REMOTE_IP", 'client_id': "MQTT.CLIENT_ID"}
+
+
+def manifest(tmp_path, text):
+    path = tmp_path / "manifest.csv"
+    path.write_text(text, encoding="utf-8-sig")
+    return str(path)
+
+
+def test_rows_are_read_and_cleaned(tmp_path):
+    rows = read_manifest(manifest(tmp_path, "Serial, Topic ,broker\nPS280-1, /site/room/ ,10.0.0.1\n,,\nPS280-2,site/hall,\n"))
+    assert rows == [{'serial': "PS280-1", 'topic': "site/room", 'broker': "10.0.0.1", 'line': 2},
+                    {'serial': "PS280-2", 'topic': "site/hall", 'broker': "", 'line': 4}]
+
+
+@pytest.mark.parametrize("text", [
+    "serial,broker\nPS280-1,10.0.0.1\n",
+    "serial,topic\nPS280-1,\n",
+    "serial,topic\nPS280-1,site/a\nPS280-1,site/b\n",
+    "serial,topic\nPS280-1,site/a\nPS280-2,site/a/\n",
+])
+def test_invalid_manifests(tmp_path, text):
+    with pytest.raises(ValueError):
+        read_manifest(manifest(tmp_path, text))
+
+
+def test_build_record():
+    base = {'CORE': {'SERIAL': '', 'MSI': 900}, 'MQTT': {}, 'HUB': {'REMOTE_IP': '1.2.3.4'}}
+    record = build_record(base, {'serial': "PS280-1", 'topic': "site/room"}, PARAMETERS)
+    assert record['CORE'] == {'SERIAL': "PS280-1", 'MSI': 900} and base['CORE']['SERIAL'] == ''
+    assert record['MQTT'] == {'TOPIC_UP': "site/room", 'TOPIC_DOWN': "site/room/dl", 'CLIENT_ID': "PS280-1"}
+    assert record['HUB']['REMOTE_IP'] == '1.2.3.4'
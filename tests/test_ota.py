@@ -0,0 +1,227 @@
+import threading
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from lib import ota
+from lib.ota import FirmwareServer, OTARollout, EmulatedDevice
+
+
+class FakeBroker:
+    """In-process MQTT broker delivering messages synchronously, retained messages included."""
+
+    def __init__(self):
+        self.clients = []
+        self.retained = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def matches(pattern, topic):
+        if pattern.endswith("/#"):
+            return topic == pattern[:-2] or topic.startswith(pattern[:-1])
+        return pattern == topic
+
+    def publish(self, topic, payload, retain=False):
+        message = SimpleNamespace(topic=topic, payload=payload.encode(), retain=False)
+        with self.lock:
+            if retain:
+                self.retained[topic] = payload
+            receivers = [client for client in self.clients
+                         if any(self.matches(pattern, topic) for pattern in client.subscriptions)]
+        for client in receivers:
+            client.deliver(message)
+
+
+class FakeClient:
+    def __init__(self, broker):
+        self.broker = broker
+        self.subscriptions = set()
+        self.on_message = None
+        self.on_subscribe = None
+        self.mid = 0
+
+    def username_pw_set(self, username, password):
+        pass
+
+    def connect(self, host, port):
+        self.broker.clients.append(self)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.broker.clients.remove(self)
+
+    def subscribe(self, topics, qos=0):
+        topics = [topics] if isinstance(topics, str) else [topic for topic, _ in topics]
+        self.subscriptions.update(topics)
+        for topic, payload in list(self.broker.retained.items()):
+            if any(FakeBroker.matches(pattern, topic) for pattern in topics):
+                self.deliver(SimpleNamespace(topic=topic, payload=payload.encode(), retain=True))
+        self.mid += 1
+        if self.on_subscribe:
+            self.acknowledge(self.mid)
+        return 0, self.mid
+
+    def acknowledge(self, mid):
+        self.on_subscribe(self, None, mid, (1,))
+
+    def unsubscribe(self, topics):
+        self.subscriptions.difference_update(topics)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.broker.publish(topic, payload, retain)
+
+    def deliver(self, message):
+        if self.on_message:
+            self.on_message(self, None, message)
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = FakeBroker()
+    monkeypatch.setattr(ota, "mqtt_client", lambda client_id="": FakeClient(broker))
+    return broker
+
+
+@pytest.fixture
+def server(tmp_path):
+    version = tmp_path / "1.0.0"
+    version.mkdir()
+    (version / "app.bin").write_bytes(bytes(range(256)) * 300)
+    with FirmwareServer(str(tmp_path), host="127.0.0.1", port=0) as server:
+        yield server
+
+
+def test_range_requests(server):
+    request = urllib.request.Request(server.url_for("1.0.0", "app.bin"), headers={'Range': "bytes=10-19"})
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 206
+        assert response.headers['Content-Range'] == f"bytes 10-19/{256 * 300}"
+        assert response.read() == bytes(range(10, 20))
+
+
+def test_rollout_to_emulated_devices(broker, server):
+    devices = [EmulatedDevice("broker", f"site/room{n}", serial=f"PS280-{n}", chunk_size=8192).start()
+               for n in range(3)]
+    try:
+        results = OTARollout("broker", concurrency=2, timeout=10).run(
+            [{'serial': d.serial, 'topic_up': d.topic_up, 'topic_down': d.topic_down} for d in devices],
+            server.url_for("1.0.0", "app.bin"))
+    finally:
+        for device in devices:
+            device.stop()
+    assert [result['status'] for result in results] == ['reported'] * 3
+    assert [result['result'] for result in results] == ['1'] * 3
+    assert all(device.downloaded == 256 * 300 for device in devices)
+
+
+def test_stale_results_are_ignored(broker, server):
+    # Retained and foreign results from earlier rollouts are on the topic before the update
+    broker.publish("site/room", "OTA.RESULT -1", retain=True)
+    device = EmulatedDevice("broker", "site/room", serial="PS280-1").start()
+    rollout = OTARollout("broker", timeout=10)
+    rollout.connect()
+    try:
+        rollout.client.subscribe("site/room")
+        broker.publish("site/room", "OTA.RESULT -1 request=0123456789ab")
+        record = rollout.update_device({'serial': device.serial, 'topic_up': device.topic_up,
+                                        'topic_down': device.topic_down}, server.url_for("1.0.0", "app.bin"))
+    finally:
+        rollout.disconnect()
+        device.stop()
+    assert record['status'] == 'reported' and record['result'] == '1'
+    assert record['request'] == rollout.request_id
+
+
+def test_update_waits_for_the_subscription(broker, server, monkeypatch):
+    events = []
+
+    def acknowledge_later(self, mid):
+        events.append('subscribe')
+        threading.Timer(0.2, lambda: (events.append('suback'), self.on_subscribe(self, None, mid, (1,)))).start()
+
+    monkeypatch.setattr(FakeClient, "acknowledge", acknowledge_later)
+    rollout = OTARollout("broker", timeout=0.2, commands=["settings set OTA UPDATE 1"])
+    rollout.connect()
+    publish = rollout.client.publish
+    rollout.client.publish = lambda *args, **kwargs: (events.append('publish'), publish(*args, **kwargs))
+    try:
+        record = rollout.update_device({'serial': 'PS280-1', 'topic_up': 'x/y', 'topic_down': 'x/y/dl'},
+                                       server.url_for("1.0.0", "app.bin"))
+    finally:
+        rollout.disconnect()
+    assert events == ['subscribe', 'suback', 'publish'] and record['status'] == 'timeout'
+
+
+def test_no_update_without_subscription(broker, server, monkeypatch):
+    monkeypatch.setattr(ota, "SUBSCRIBE_TIMEOUT", 0.1)
+    monkeypatch.setattr(FakeClient, "acknowledge", lambda self, mid: None)
+    rollout = OTARollout("broker", timeout=10)
+    rollout.connect()
+    try:
+        record = rollout.update_device({'serial': 'PS280-1', 'topic_up': 'x/y', 'topic_down': 'x/y/dl'},
+                                       server.url_for("1.0.0", "app.bin"))
+    finally:
+        rollout.disconnect()
+    assert record['status'] == 'not subscribed' and record['seconds'] < 5
+
+
+def test_timeout_without_device(broker, server):
+    rollout = OTARollout("broker", timeout=0.2)
+    results = rollout.run([{'serial': 'PS280-9', 'topic_up': 'x/y', 'topic_down': 'x/y/dl'}],
+                          server.url_for("1.0.0", "app.bin"))
+    assert results[0]['status'] == 'timeout' and results[0]['result'] is None
+
+
+def test_results_are_matched_by_request_id():
+    rollout = OTARollout("broker")
+    waiter = {'event': threading.Event(), 'result': None, 'armed': True}
+    rollout.pending["site/room"] = waiter
+
+    def message(payload, retain=False):
+        rollout.on_message(None, None, SimpleNamespace(topic="site/room", payload=payload.encode(), retain=retain))
+
+    message("OTA.RESULT -1 request=0123456789ab")
+    message(f"OTA.RESULT -1 request={rollout.request_id}", retain=True)
+    assert not waiter['event'].is_set()
+    message(f"OTA.RESULT 1 request={rollout.request_id}")
+    assert waiter['event'].is_set() and waiter['result'] == '1'
+
+
+def test_backend_reports_failed_devices(backend, monkeypatch):
+    monkeypatch.setattr(OTARollout, "run", lambda self, devices, url: [
+        {'serial': device['serial'], 'topic': device['topic_up'], 'status': 'reported', 'result': '-1'}
+        for device in devices])
+    backend.set_firmware_version(backend.firmware_versions[0])
+    records = backend.find_records()[:2]
+    success, results = backend.ota_rollout([record['path'] for record in records])
+    assert not success and len(results) == 2
+
+
+def test_backend_rollout_keeps_the_selection(backend, monkeypatch):
+    rollouts = []
+
+    def run(self, devices, url):
+        rollouts.append((self.broker, self.port, url, [device['serial'] for device in devices]))
+        return [{'serial': device['serial'], 'topic': device['topic_up'], 'status': 'reported', 'result': '1'}
+                for device in devices]
+
+    monkeypatch.setattr(OTARollout, "run", run)
+    selected, other = backend.firmware_versions[0], backend.firmware_versions[-1]
+    backend.set_firmware_version(selected)
+    first, second = [record['path'] for record in backend.find_records()[:2]]
+    data = backend.storage.load(first)
+    data['HUB']['REMOTE_PORT'] = "8883"
+    backend.storage.save(first, data)
+    data = backend.storage.load(second)
+    del data['HUB']
+    backend.storage.save(second, data)
+    success, results = backend.ota_rollout([first, second], version=other)
+    assert backend.firmware['version'] == selected
+    assert len(rollouts) == 1 and rollouts[0][1] == 8883 and f"/{other}/" in rollouts[0][2]
+    assert not success and [result['status'] for result in results] == ['not configured', 'reported']
@@ -0,0 +1,65 @@
+from lib.ps280_toolbox.PS_280 import PS280
+
+INFO = {
+    "CORE MSI": ["Info: Measurement interval in seconds", "Min. value: 60", "Max. value: 86400"],
+    "LORA SF": ["Info: Spreading factor", "Allowed: {7,8,9}"],
+}
+
+
+class FakeSerial:
+    """Serial connection of a PS-280 shell answering 'settings info'."""
+
+    def __init__(self):
+        self.lines = []
+
+    @property
+    def in_waiting(self):
+        return len(self.lines)
+
+    def reset_input_buffer(self):
+        self.lines = []
+
+    def reset_output_buffer(self):
+        pass
+
+    def write(self, data):
+        command = data.decode().strip()
+        reply = INFO.get(command.replace("settings info ", ""), ["\x1b[31mERROR: unknown setting\x1b[0m"])
+        self.lines += [f"/ > {command}"] + reply + ["/ > ", "/ > "]
+
+    def readline(self):
+        return (self.lines.pop(0) + "\r\n").encode()
+
+
+def device():
+    ps = PS280.__new__(PS280)
+    ps.connection = FakeSerial()
+    return ps
+
+
+def test_info_dict():
+    assert device().info_dict("LORA", "SF") == {
+        'group': "LORA", 'parameter': "SF", 'shortDescription': "Spreading factor",
+        'minimumValue': '', 'maximumValue': '', 'allowedValues': ['7', '8', '9']}
+
+
+def test_parameter_spec():
+    spec = device().parameter_spec({'CORE': {'MSI': '900', 'NAME': 'a'}})
+    assert spec['CORE.MSI'] == {'shortDescription': "Measurement interval in seconds", 'minimumValue': '60',
+                                'maximumValue': '86400', 'allowedValues': ''}
+    assert spec['CORE.NAME'] == {'shortDescription': '', 'minimumValue': '', 'maximumValue': '',
+                                 'allowedValues': ''}
+
+
+class SilentSerial(FakeSerial):
+    """Serial connection of a device that does not answer, e.g. a blank one."""
+
+    def write(self, data):
+        pass
+
+
+def test_silent_device_runs_no_version(monkeypatch):
+    ps = device()
+    ps.connection = SilentSerial()
+    monkeypatch.setattr(PS280, "VERSION_TIMEOUT", 0.5)
+    assert ps.version == ''
@@ -0,0 +1,102 @@
+import sys
+import threading
+
+import pytest
+
+from lib.ps280_toolbox import PS_280
+from lib.ps280_toolbox.PS_280 import PS280, esptool_output
+from conftest import FIRMWARE
+
+
+def test_firmware_and_template_belong_to_the_session(backend):
+    templates = backend.templates
+    backend.set_template(templates[0])
+    with backend.use_session("/dev/ttyUSB0"):
+        assert backend.template == templates[0] and not backend.firmware['version']
+        backend.set_firmware_version(FIRMWARE)
+        backend.set_template(templates[-1])
+        assert backend.firmware['bootloader']
+    assert not backend.firmware['version'] and backend.template == templates[0]
+    backend.select_session("/dev/ttyUSB0")
+    assert backend.firmware['version'] == FIRMWARE and backend.template == templates[-1]
+
+
+def test_sessions_run_side_by_side(backend):
+    barrier = threading.Barrier(2)
+    ports = {"/dev/ttyUSB0": backend.templates[0], "/dev/ttyUSB1": backend.templates[-1]}
+
+    def work():
+        port = backend.session.port
+        backend.set_template(ports[port])
+        barrier.wait(timeout=5)
+        return backend.template
+
+    assert backend.run_sessions(work, ports=list(ports)) == ports
+
+
+def test_ports_are_probed_without_capturing_the_console(monkeypatch):
+    probed = []
+
+    def esptool(*arguments, timeout=60):
+        probed.append(arguments)
+        assert sys.stdout is stdout
+        return ["Chip is ESP32-S3 (QFN56) (revision v0.2)", "MAC: 24:ec:4a:00:00:01"]
+
+    stdout = sys.stdout
+    monkeypatch.setattr(PS_280, "esp_ports", lambda: {"/dev/ttyUSB0": "CH340", "/dev/ttyUSB1": "CP210x"})
+    monkeypatch.setattr(PS_280, "esptool_output", esptool)
+    device = PS280.__new__(PS280)
+    device.port, device.exclude_ports, device.chip_info = None, {"/dev/ttyUSB0"}, {}
+    assert device.find_esp_port(retries=1)
+    assert probed == [("--port", "/dev/ttyUSB1", "--no-stub", "read_mac")]
+    assert device.port == "/dev/ttyUSB1" and device.bridge == "CP210x"
+    assert device.chip_info['mac'] == "24:ec:4a:00:00:01"
+
+
+@pytest.mark.parametrize("installed", [False, True])
+def test_esptool_output_stays_with_its_thread(capsys, monkeypatch, installed):
+    if installed:
+        monkeypatch.setattr(sys, "stdout", sys.stdout)
+        PS_280.install_thread_output()
+    stdout = sys.stdout
+    outputs = []
+    threads = [threading.Thread(target=lambda: outputs.append(esptool_output("version"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    print("console")
+    for thread in threads:
+        thread.join()
+    assert len(outputs) == 2 and all(any("esptool" in line for line in output) for output in outputs)
+    assert "esptool" not in capsys.readouterr().out
+    assert sys.stdout is stdout
+
+
+def test_esptool_failures_are_raised():
+    with pytest.raises(Exception, match="esptool"):
+        esptool_output("--port", "/dev/nonexistent", "--connect-attempts", "1", "read_mac")
+
+
+def test_records_in_locked_sessions_are_not_reloaded(backend):
+    path = backend.find_records()[0]['path']
+    assert backend.load_toml_file(path)[0]
+    data = backend.toml_data.to_dict()
+    data['CORE']['MSI'] = "1234"
+    backend.storage.save(path, data)
+    held, release = threading.Event(), threading.Event()
+
+    def edit():
+        with backend.lock_session():
+            held.set()
+            release.wait(5)
+
+    editor = threading.Thread(target=edit)
+    editor.start()
+    held.wait(5)
+    try:
+        # The watcher skips the busy session instead of waiting for it
+        assert not backend._files_changed({'database': {path}})
+    finally:
+        release.set()
+        editor.join()
+    assert backend._files_changed({'database': {path}})
+    assert backend.toml_data['CORE']['MSI'] == "1234"
@@ -0,0 +1,49 @@
+import json
+import os
+
+from lib.snapshots import SnapshotStore, settings_fingerprint, diff_settings
+
+SETTINGS = {'CORE': {'MSI': '900', 'VERSION': '0.12'}, 'RUNTIME': {'RSSI': '-70'}}
+
+
+def test_fingerprint_ignores_order_types_and_excluded_values():
+    same = {'RUNTIME': {'RSSI': -50}, 'CORE': {'VERSION': '0.13', 'MSI': 900}}
+    exclude = {'RUNTIME', 'CORE.VERSION'}
+    assert settings_fingerprint(SETTINGS, exclude) == settings_fingerprint(same, exclude)
+    assert settings_fingerprint(SETTINGS) != settings_fingerprint(same)
+
+
+def test_identical_snapshots_are_stored_once(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    first = store.record("PS280-1", SETTINGS)
+    second = store.record("PS280-2", dict(reversed(list(SETTINGS.items()))))
+    assert first['id'] == second['id'] and store.get(first['id']) == SETTINGS
+    objects = [name for _, _, names in os.walk(store.objects_dir) for name in names]
+    assert len(objects) == 1
+
+
+def test_serials_come_from_the_timeline_entries(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.record("PS280/1", SETTINGS)
+    store.record("PS280:1", SETTINGS)
+    assert store.serials() == ["PS280/1", "PS280:1"]
+    assert len(store.timeline("PS280/1")) == 1 and store.latest("PS280:1")[0]['serial'] == "PS280:1"
+
+
+def test_timelines_of_earlier_versions(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    digest = store.put(SETTINGS)
+    os.makedirs(store.timelines_dir)
+    with open(store.timeline_path("PS280-7"), "w") as file:
+        file.write(json.dumps({'time': 1.0, 'id': digest, 'event': 'read'}) + "\n")
+    assert store.serials() == ["PS280-7"] and store.latest("PS280-7")[1] == SETTINGS
+
+
+def test_history_lists_changes(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.record("PS280-1", SETTINGS)
+    store.record("PS280-1", SETTINGS)
+    store.record("PS280-1", {**SETTINGS, 'CORE': {'MSI': '600', 'VERSION': '0.12'}}, event="write")
+    history = store.history("PS280-1", ignore=('RUNTIME',))
+    assert [(change['event'], change['changes']) for change in history] == [('write', [('CORE.MSI', '900', '600')])]
+    assert diff_settings({'A': {'X': 1}}, {'A': {}}) == [('A.X', 1, None)]
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from lib.database_index import DatabaseIndex
+from lib.storage import DirectoryStorage, open_storage, import_tree, export_tree
+
+RECORD = {'CORE': {'SERIAL': 'PS280-1', 'MSI': 900}, 'MQTT': {'TOPIC_UP': 'site/room'}}
+
+
+@pytest.fixture(params=["directory", "sqlite"])
+def storage(request, tmp_path):
+    storage = open_storage(str(tmp_path / "db"), request.param)
+    yield storage
+    storage.close()
+
+
+def test_save_and_load(storage, tmp_path):
+    path = str(tmp_path / "db" / "site.ps280" / "room.ps280" / "config.toml")
+    assert not storage.exists(path)
+    storage.save(path, RECORD)
+    assert storage.exists(path) and storage.load(path) == RECORD
+    assert list(storage.records()) == [path]
+    with pytest.raises(FileNotFoundError):
+        storage.load(str(tmp_path / "db" / "other.ps280" / "config.toml"))
+
+
+def test_sqlite_keeps_revisions(tmp_path):
+    storage = open_storage(str(tmp_path / "db"), "sqlite")
+    path = str(tmp_path / "db" / "site.ps280" / "config.toml")
+    storage.save(path, RECORD)
+    storage.save(path, RECORD)
+    storage.save(path, {**RECORD, 'CORE': {'SERIAL': 'PS280-1', 'MSI': 600}})
+    assert [revision for revision, _ in storage.history(path)] == [1, 2]
+    assert storage.load_revision(path, 1) == RECORD
+    assert os.path.isfile(tmp_path / "db" / "ps280.sqlite")
+    storage.close()
+
+
+def test_import_and_export(tmp_path, database):
+    storage = open_storage(str(tmp_path / "db"), "sqlite")
+    assert import_tree(storage, database) == 17
+    assert export_tree(storage, str(tmp_path / "export")) == 17
+    exported = sorted(os.path.relpath(path, tmp_path / "export")
+                      for path in DirectoryStorage(str(tmp_path / "export")).records())
+    assert exported == sorted(os.path.relpath(path, database) for path in DirectoryStorage(database).records())
+    storage.close()
+
+
+def test_index_of_sqlite_storage(tmp_path, database):
+    storage = open_storage(str(tmp_path / "db"), "sqlite")
+    import_tree(storage, database)
+    index = DatabaseIndex(storage.database_root, str(tmp_path / "index.sqlite"), storage=storage)
+    assert index.refresh()['added'] == 17
+    assert index.refresh()['unchanged'] == 17
+    index.close()
+    storage.close()
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        open_storage(str(tmp_path), "cloud")
+
+
+def test_held_back_saves_are_not_reported_as_saved(backend, database):
+    saved = []
+    backend.save_delay = 60
+    backend.on_record_saved = lambda path, error: saved.append((path, error))
+    path = backend.storage.records().__next__()
+    assert backend.load_toml_file(path)[0]
+    backend.toml_data['CORE']['MSI'] = 901
+    assert backend.save_toml_file() == (True, "Saving file...")
+    assert backend.storage.is_pending(path) and not saved
+    backend.close()
+    assert saved == [(os.path.abspath(path), None)] and not backend.storage.is_pending(path)
+    assert "901" in open(path).read()
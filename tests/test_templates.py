@@ -0,0 +1,133 @@
+import ast
+import os
+
+import pytest
+
+from lib import templates
+from lib.storage import DirectoryStorage
+from lib.templates import (merge_template, apply_template, template_layers, compile_template,
+                           TemplateCatalog)
+
+from conftest import DEFAULTS
+
+RECORD = {'CORE': {'MSI': 900, 'NAME': 'a'}, 'MQTT': {'PORT': 1883}}
+
+
+def test_merge_sets_known_parameters_only():
+    merged, changes, errors, warnings = merge_template(RECORD, {'CORE': {'MSI': '600', 'EXTRA': 1},
+                                                                'LORA': {'SF': 7}})
+    assert merged['CORE'] == {'MSI': 600, 'NAME': 'a'} and RECORD['CORE']['MSI'] == 900
+    assert changes == ['CORE.MSI'] and not errors
+    assert warnings == ['Unknown parameter CORE.EXTRA', 'Unknown group LORA']
+
+
+def test_merge_reports_invalid_values():
+    merged, changes, errors, warnings = merge_template(RECORD, {'MQTT': {'PORT': 'many'}})
+    assert merged['MQTT']['PORT'] == 1883 and not changes and len(errors) == 1
+
+
+def test_apply_skips_unknown_parameters(tmp_path):
+    storage = DirectoryStorage(str(tmp_path))
+    path = str(tmp_path / "a.ps280" / "config.toml")
+    storage.save(path, RECORD)
+    summary = apply_template(storage, [path], {'CORE': {'MSI': 600, 'EXTRA': 1}}, workers=1)
+    assert [result['path'] for result in summary['changed']] == [path]
+    assert summary['changed'][0]['warnings'] == ['Unknown parameter CORE.EXTRA']
+    assert storage.load(path)['CORE']['MSI'] == 600
+
+
+def test_apply_does_not_save_records_with_errors(tmp_path):
+    storage = DirectoryStorage(str(tmp_path))
+    path = str(tmp_path / "a.ps280" / "config.toml")
+    storage.save(path, RECORD)
+    summary = apply_template(storage, [path], {'CORE': {'MSI': 600}, 'MQTT': {'PORT': 'many'}}, workers=1)
+    assert len(summary['failed']) == 1 and storage.load(path)['CORE']['MSI'] == 900
+
+
+def test_apply_converts_the_template_once(tmp_path, monkeypatch):
+    storage = DirectoryStorage(str(tmp_path))
+    paths = [str(tmp_path / f"{n}.ps280" / "config.toml") for n in range(3)]
+    for path in paths:
+        storage.save(path, RECORD)
+    conversions = []
+    convert_value = templates.convert_value
+    monkeypatch.setattr(templates, "convert_value", lambda *args: conversions.append(args) or convert_value(*args))
+    summary = apply_template(storage, paths, {'CORE': {'MSI': '600'}}, workers=1)
+    assert len(summary['changed']) == 3 and len(conversions) == 1
+    assert all(storage.load(path)['CORE']['MSI'] == 600 for path in paths)
+
+
+@pytest.fixture
+def layered(tmp_path):
+    (tmp_path / "base.toml").write_text('[CORE]\nMSI = 900\nNAME = "base"\n')
+    (tmp_path / "site.toml").write_text('[TEMPLATE]\nextends = "base.toml"\n[CORE]\nMSI = 600\n')
+    (tmp_path / "room.toml").write_text('[TEMPLATE]\nextends = ["site.toml", "base.toml"]\n[MQTT]\nPORT = 8883\n')
+    return tmp_path
+
+
+def test_layers_are_resolved_most_general_first(layered):
+    assert [os.path.basename(path) for path in template_layers(str(layered), "room.toml")] == \
+        ["base.toml", "site.toml", "room.toml"]
+
+
+def test_later_layers_override_earlier_ones(layered):
+    assert compile_template(str(layered), "room.toml") == {'CORE': {'MSI': 600, 'NAME': 'base'},
+                                                           'MQTT': {'PORT': 8883}}
+    (layered / "site.toml").write_text('[TEMPLATE]\nextends = "base.toml"\n[CORE]\nMSI = 3000\n')
+    assert compile_template(str(layered), "room.toml")['CORE']['MSI'] == 3000
+
+
+def test_compiled_templates_are_kept_while_the_layers_are_unchanged(layered, monkeypatch):
+    patch = compile_template(str(layered), "room.toml")
+    # Unchanged layers are recognized by their stamps, not by reading them again
+    monkeypatch.setattr(templates, "open", lambda *args, **kwargs: pytest.fail("layer read"), raising=False)
+    assert compile_template(str(layered), "room.toml") is patch
+
+
+def test_cycles_are_rejected(tmp_path):
+    (tmp_path / "a.toml").write_text('[TEMPLATE]\nextends = "b.toml"\n')
+    (tmp_path / "b.toml").write_text('[TEMPLATE]\nextends = "a.toml"\n')
+    with pytest.raises(ValueError):
+        template_layers(str(tmp_path), "a.toml")
+
+
+def test_compiled_templates_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(templates, "CACHE_SIZE", 2)
+    for n in range(4):
+        (tmp_path / f"{n}.toml").write_text(f"[CORE]\nMSI = {n}\n")
+        assert compile_template(str(tmp_path), f"{n}.toml") == {'CORE': {'MSI': n}}
+    assert len(templates._compiled) == 2
+
+
+def test_catalog_keeps_templates_until_they_change(layered):
+    catalog = TemplateCatalog(str(layered))
+    assert catalog.names() == ["base.toml", "room.toml", "site.toml"]
+    entry = catalog.entry("room.toml")
+    assert catalog.entry("room.toml") is entry
+    (layered / "base.toml").write_text('[CORE]\nMSI = 900\nNAME = "changed"\n')
+    assert catalog.template("room.toml")['CORE']['NAME'] == "changed"
+    (layered / "new.toml").write_text('[CORE]\n')
+    assert "new.toml" in catalog.names()
+
+
+def test_catalog_checks_against_the_firmware(layered):
+    catalog = TemplateCatalog(str(layered))
+    spec = {'CORE.MSI': {'minimumValue': '60', 'maximumValue': '3600', 'allowedValues': ''},
+            'CORE.NAME': {'minimumValue': '', 'maximumValue': '', 'allowedValues': ''}}
+    compatibility = catalog.compatibility(spec)
+    assert compatibility['base.toml'] == [] and compatibility['site.toml'] == []
+    assert compatibility['room.toml'] == ["MQTT.PORT: unknown to the firmware"]
+    assert catalog.check("room.toml", spec) is compatibility['room.toml']
+    (layered / "broken.toml").write_text('[TEMPLATE]\nextends = "missing.toml"\n')
+    assert len(catalog.check("broken.toml", spec)) == 1
+    with pytest.raises(ValueError):
+        catalog.template("broken.toml")
+
+
+def test_worker_processes_can_import_the_app_script():
+    """Spawned workers import ps280edit.py as __mp_main__, only definitions may run at import."""
+    with open(os.path.join(os.path.dirname(DEFAULTS), "ps280edit.py"), encoding="utf-8") as file:
+        module = ast.parse(file.read())
+    allowed = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef, ast.If)
+    statements = [node for node in module.body[1:] if not isinstance(node, allowed)]
+    assert not statements, [ast.unparse(node) for node in statements]
@@ -0,0 +1,52 @@
+import os
+from types import MappingProxyType
+
+import pytest
+
+from lib import toml_loader
+from lib.toml_loader import load_toml, invalidate, cache_info
+
+
+@pytest.fixture
+def config(tmp_path):
+    invalidate()
+    path = tmp_path / "config.toml"
+    path.write_text('[CORE]\nMSI = 900\nLIST = [1, 2]\n')
+    return path
+
+
+def test_unchanged_files_come_from_the_cache(config):
+    before = cache_info()
+    assert load_toml(str(config), copy=True) == {'CORE': {'MSI': 900, 'LIST': [1, 2]}}
+    load_toml(str(config))
+    after = cache_info()
+    assert after['misses'] - before['misses'] == 1 and after['hits'] - before['hits'] == 1
+
+
+def test_changed_files_are_parsed_again(config):
+    load_toml(str(config))
+    config.write_text('[CORE]\nMSI = 600\n')
+    os.utime(config, ns=(0, 10 ** 9))
+    assert load_toml(str(config), copy=True) == {'CORE': {'MSI': 600}}
+
+
+def test_read_only_views_and_copies(config):
+    view = load_toml(str(config))
+    assert isinstance(view, MappingProxyType) and view['CORE']['LIST'] == (1, 2)
+    with pytest.raises(TypeError):
+        view['CORE']['MSI'] = 1
+    assert load_toml(str(config)) is view
+    document = load_toml(str(config), copy=True)
+    document['CORE']['MSI'] = 1
+    assert document['CORE']['LIST'] == [1, 2] and load_toml(str(config))['CORE']['MSI'] == 900
+
+
+def test_cache_is_bounded(tmp_path, monkeypatch):
+    invalidate()
+    monkeypatch.setattr(toml_loader, "CACHE_SIZE", 2)
+    for n in range(4):
+        path = tmp_path / f"{n}.toml"
+        path.write_text(f"n = {n}\n")
+        load_toml(str(path))
+    assert cache_info()['size'] == 2
+
@@ -0,0 +1,67 @@
+import threading
+
+from lib.topic_trie import TopicTrie
+
+
+def trie():
+    trie = TopicTrie()
+    trie.set("a", "site/ha33/R07/Wall")
+    trie.set("b", "site/ha33/R08/Wall")
+    trie.set("c", "/site/ha33/R07/Door/")
+    trie.set("d", "site/bl")
+    return trie
+
+
+def test_collisions():
+    topics = trie()
+    topics.set("e", "site/ha33/R07/Wall")
+    assert topics.collisions("site/ha33/R07/Wall", owner="a") == ["e"]
+    assert "site/ha33/R07/Door" in topics and "site/ha33/R07" not in topics
+    assert len(topics) == 5
+
+
+def test_moving_and_removing_records_prunes_the_trie():
+    topics = trie()
+    topics.set("a", "site/other")
+    topics.set("c", None)
+    assert "site/ha33/R07/Wall" not in topics
+    assert topics.next_levels("site/ha33") == [("R08", 1)]
+    assert topics.next_levels("site") == [("bl", 1), ("ha33", 1), ("other", 1)]
+    assert topics.root.count == 3
+
+
+def test_complete():
+    topics = trie()
+    assert topics.complete("site/ha33/R0") == ["site/ha33/R07/Door", "site/ha33/R07/Wall", "site/ha33/R08/Wall"]
+    assert topics.complete("site/b") == ["site/bl"]
+    assert topics.complete("site/ha33/R", limit=1) == ["site/ha33/R07/Door"]
+    assert topics.complete("other/x") == []
+
+
+def test_suggest():
+    topics = trie()
+    assert topics.suggest("site/ha33/R07/Wall", 2) == ["site/ha33/R07/Wall2", "site/ha33/R07/Wall3"]
+    assert topics.suggest("site/ha33/R07") == ["site/ha33/R07"]
+    topics.set("e", "site/ha33/R09")
+    assert topics.suggest("site/ha33/R09", 1) == ["site/ha33/R10"]
+    topics.set("f", "site/ha33/R08")
+    assert topics.suggest("site/ha33/R08", 1) == ["site/ha33/R10"]
+
+
+def test_backend_refreshes_the_index_before_locking_it(backend, monkeypatch):
+    # Refreshing flushes the storage, whose write callbacks take the index lock in the writer thread
+    index, refresh_index, free = backend.index, backend.refresh_index, []
+
+    def acquire():
+        free.append(index.lock.acquire(timeout=1))
+        if free[-1]:
+            index.lock.release()
+
+    def refresh():
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+        return refresh_index()
+
+    monkeypatch.setattr(backend, "refresh_index", refresh)
+    assert len(backend.topic_trie) and free == [True]